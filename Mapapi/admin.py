@@ -4,8 +4,11 @@ from .models import (
     User, Organisation, Incident, Collaboration, DiscussionMessage,
     IncidentTask, PartnerSuggestion, Category, Indicateur, Zone,
     Message, ResponseMessage, Evenement, Communaute, Rapport,
-    Notification, FieldReport, IncidentAssignment, PasswordReset, PhoneOTP
+    Notification, FieldReport, IncidentAssignment, PasswordReset, PhoneOTP,
+    OutboundEmail, StorageOrphan, AnalysisDeadLetter,
 )
+from .services import dead_letters
+from .services.mail import retry_failed, schedule_flush
 
 
 @admin.register(IVRCall)
@@ -236,3 +239,45 @@ class PhoneOTPAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     search_fields = ['phone_number', 'otp_code']
     readonly_fields = ['created_at']
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['id', 'to_email', 'subject', 'category', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['status', 'category', 'digest', 'created_at']
+    search_fields = ['to_email', 'subject']
+    readonly_fields = ['created_at', 'sent_at', 'attempts', 'last_error']
+    actions = ['retry_emails']
+
+    @admin.action(description="Renvoyer les emails en échec")
+    def retry_emails(self, request, queryset):
+        count = retry_failed(queryset)
+        if count:
+            schedule_flush()
+        self.message_user(request, f"{count} email(s) remis en file.")
+
+
+@admin.register(StorageOrphan)
+class StorageOrphanAdmin(admin.ModelAdmin):
+    list_display = ['bucket', 'name', 'size', 'first_seen_at', 'last_seen_at']
+    list_filter = ['bucket']
+    search_fields = ['name']
+    readonly_fields = ['bucket', 'name', 'size', 'first_seen_at', 'last_seen_at']
+
+
+@admin.register(AnalysisDeadLetter)
+class AnalysisDeadLetterAdmin(admin.ModelAdmin):
+    list_display = ['prediction', 'task_name', 'attempts', 'replay_count', 'failed_at', 'replayed_at']
+    list_filter = ['task_name', 'failed_at']
+    search_fields = ['prediction__id', 'prediction__incident__id', 'last_error']
+    readonly_fields = ['prediction', 'task_name', 'payload', 'attempts', 'last_error',
+                       'created_at', 'failed_at', 'replay_count', 'replayed_at']
+    actions = ['replay_analyses']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Relancer les analyses sélectionnées")
+    def replay_analyses(self, request, queryset):
+        count = dead_letters.replay(queryset)
+        self.message_user(request, f"{count} analyse(s) remise(s) en file.")
@@ -6,19 +6,38 @@
   d'un incident en temps réel. Groupe ``discussion_<incident_id>``.
 - TaskConsumer : /ws/incidents/<id>/tasks/ — créations/màj de tâches en temps réel.
   Groupe ``tasks_<incident_id>``.
+- MapConsumer : /ws/map/ — deltas de marqueurs de la carte. Groupe ``incident_map``.
 
 Les serveurs (signals) poussent via channel_layer.group_send(group, {'type': 'broadcast', 'payload': {...}}).
+Un payload peut être une trame groupée ``{'event': 'batch', 'items': [...]}``
+(cf. services.broadcast) : elle est dépliée ici, filtrée événement par événement,
+puis relayée unitairement — ou telle quelle aux clients qui se connectent avec
+``?batch=1``.
+
+Notifications et tâches sont rejouables : reconnexion avec ``?last_event_id=``
+(cf. services.replay).
 """
 import json
+from urllib.parse import parse_qs
 
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from django.core.serializers.json import DjangoJSONEncoder
 
+from .services.activity_feed import register_viewer, unregister_viewer, viewer_group
+from .services.broadcast import BATCH_EVENT, iter_payload_items
+from .services.map_stream import MAP_GROUP, MarkerFilter
+from .services.replay import RESYNC_EVENT, events_since
+
 
 class _GroupConsumer(AsyncJsonWebsocketConsumer):
     """Base : rejoint un groupe si l'utilisateur est authentifié, relaie les
-    messages 'broadcast' tels quels au client."""
+    messages 'broadcast' tels quels au client.
+
+    ``replayable`` : le groupe est journalisé (services.replay) ; à la connexion
+    avec ``?last_event_id=``, le consumer renvoie les événements manqués, ou
+    ``{"event": "resync_required"}`` si la reprise est impossible."""
     group_name = None
+    replayable = False
 
     @classmethod
     async def encode_json(cls, content):
@@ -39,6 +58,19 @@ class _GroupConsumer(AsyncJsonWebsocketConsumer):
             return
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
+        if self.replayable:
+            await self.replay_missed()
+
+    async def replay_missed(self):
+        last_event_id = self.query_params().get('last_event_id', [None])[0]
+        if not last_event_id:
+            return
+        events = await events_since(self.group_name, last_event_id)
+        if events is None:
+            await self.send_json({'event': RESYNC_EVENT, 'last_event_id': last_event_id})
+            return
+        for item in filter(None, map(self.prepare, events)):
+            await self.send_json(item)
 
     async def disconnect(self, code):
         if self.group_name:
@@ -47,12 +79,36 @@ class _GroupConsumer(AsyncJsonWebsocketConsumer):
     async def resolve_group(self):
         raise NotImplementedError
 
+    def query_params(self):
+        return parse_qs((self.scope.get('query_string') or b'').decode())
+
+    def wants_batches(self):
+        return self.query_params().get('batch', ['0'])[0] in ('1', 'true')
+
+    def accepts(self, payload):
+        """Filtre par événement (surchargé par les consumers qui trient)."""
+        return True
+
+    def prepare(self, payload):
+        """Événement à transmettre au client (éventuellement réécrit), ou None."""
+        return payload if self.accepts(payload) else None
+
     async def broadcast(self, event):
-        # event = {'type': 'broadcast', 'payload': {...}}
-        await self.send_json(event['payload'])
+        # event = {'type': 'broadcast', 'payload': {...}} ; payload éventuellement groupé.
+        items = [item for item in map(self.prepare, iter_payload_items(event['payload']))
+                 if item is not None]
+        if not items:
+            return
+        if len(items) > 1 and self.wants_batches():
+            await self.send_json({'event': BATCH_EVENT, 'items': items})
+            return
+        for item in items:
+            await self.send_json(item)
 
 
 class NotificationConsumer(_GroupConsumer):
+    replayable = True
+
     async def resolve_group(self):
         return f"notifications_{self.scope['user'].id}"
 
@@ -64,6 +120,8 @@ class DiscussionConsumer(_GroupConsumer):
 
 
 class TaskConsumer(_GroupConsumer):
+    replayable = True
+
     async def resolve_group(self):
         incident_id = self.scope['url_route']['kwargs'].get('incident_id')
         return f"tasks_{incident_id}" if incident_id else None
@@ -78,15 +136,60 @@ class CollaborationConsumer(_GroupConsumer):
 
 class ActivityFeedConsumer(_GroupConsumer):
     """/ws/activity-feed/ — flux d'activité de la plateforme en temps réel.
-    Groupe global ``activity_feed``. Comme le REST /activity-feed/, on n'affiche
-    PAS au viewer l'activité de sa PROPRE organisation : on filtre chaque broadcast
-    selon l'organisation du viewer (connue via ``scope['user']``)."""
+    Comme le REST /activity-feed/, on n'affiche PAS au viewer l'activité de sa
+    PROPRE organisation : le viewer rejoint le groupe de son organisation
+    (``activity_feed_org_<org_id>``, ``activity_feed_all`` sans org), que le
+    relais alimente avec l'activité de toutes les AUTRES organisations
+    (cf. services.activity_feed). Le filtre ``accepts`` reste un garde-fou."""
+    def _org_id(self):
+        return getattr(self.scope.get('user'), 'organisation_member_id', None)
+
     async def resolve_group(self):
-        return "activity_feed"
+        return viewer_group(self._org_id())
 
-    async def broadcast(self, event):
-        payload = event['payload']
-        my_org = getattr(self.scope.get('user'), 'organisation_member_id', None)
-        if my_org is not None and str(payload.get('organisation_id')) == str(my_org):
-            return  # activité de ma propre org -> ignorée (cohérent avec le REST)
-        await self.send_json(payload)
+    async def connect(self):
+        await super().connect()
+        if self.group_name:
+            await register_viewer(self._org_id())
+
+    async def disconnect(self, code):
+        await super().disconnect(code)
+        if self.group_name:
+            await unregister_viewer(self._org_id())
+
+    def accepts(self, payload):
+        my_org = self._org_id()
+        # activité de ma propre org -> ignorée (cohérent avec le REST)
+        return my_org is None or str(payload.get('organisation_id')) != str(my_org)
+
+
+class MapConsumer(_GroupConsumer):
+    """/ws/map/ — deltas de marqueurs de la carte (created/updated/deleted).
+    Groupe ``incident_map``. Le client peut restreindre le flux à tout moment :
+    ``{"action": "subscribe", "bbox": [ouest, sud, est, nord], "scope": "unresolved"}``
+    (scopes all / resolved / unresolved, comme /incident-filter/). Sans
+    abonnement explicite, tous les deltas sont relayés."""
+    marker_filter = None
+
+    async def resolve_group(self):
+        return MAP_GROUP
+
+    async def receive_json(self, content, **kwargs):
+        if not isinstance(content, dict) or content.get('action') != 'subscribe':
+            await self.send_json({'event': 'error', 'detail': "Action inconnue."})
+            return
+        try:
+            self.marker_filter = MarkerFilter(bbox=content.get('bbox'),
+                                              scope=content.get('scope') or 'all')
+        except (TypeError, ValueError):
+            await self.send_json({'event': 'error',
+                                  'detail': "bbox [ouest, sud, est, nord] ou scope invalide."})
+            return
+        await self.send_json({'event': 'map_subscribed',
+                              'bbox': content.get('bbox'),
+                              'scope': self.marker_filter.scope})
+
+    def prepare(self, payload):
+        if self.marker_filter is None:
+            return payload
+        return self.marker_filter.apply(payload)
@@ -54,3 +54,20 @@ class OrganisationFromSubdomainMiddleware(MiddlewareMixin):
             request.organisation = organisation
         except Organisation.DoesNotExist:
             request.organisation = None
+
+
+class BroadcastBufferMiddleware:
+    """Regroupe les diffusions WebSocket émises pendant la requête.
+
+    Les signaux (tâches, notifications, collaborations…) n'envoient plus un
+    ``group_send`` par ligne : les événements sont coalescés par groupe et
+    expédiés en une trame groupée au commit (cf. ``services.broadcast``).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from .services.broadcast import broadcast_buffer
+        with broadcast_buffer():
+            return self.get_response(request)
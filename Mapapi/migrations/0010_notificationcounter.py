@@ -0,0 +1,24 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Ajoute NotificationCounter : compteurs lu/non-lu dénormalisés par
+    utilisateur. Pas de backfill : chaque ligne est calculée à la première
+    lecture (cf. services.notification_counts)."""
+
+    dependencies = [
+        ('Mapapi', '0009_user_activity_seen_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('total_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
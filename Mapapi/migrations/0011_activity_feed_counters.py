@@ -0,0 +1,36 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Ajoute ActivityFeedCounter (totaux d'actions par périmètre) et
+    ActivityFeedWatermark (dernière consultation du flux en compteurs) pour des
+    compteurs total / non-vus O(1) sur /activity-feed/. Pas de backfill : les
+    totaux sont calculés à la première lecture, les watermarks au prochain
+    « mark-seen » (repli sur activity_seen_at en attendant)."""
+
+    dependencies = [
+        ('Mapapi', '0010_notificationcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityFeedCounter',
+            fields=[
+                ('scope', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('total', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ActivityFeedWatermark',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='activity_watermark', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('seen_total', models.PositiveBigIntegerField(default=0)),
+                ('seen_org_total', models.PositiveBigIntegerField(default=0)),
+                ('seen_at', models.DateTimeField()),
+                ('organisation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='Mapapi.organisation')),
+            ],
+        ),
+    ]
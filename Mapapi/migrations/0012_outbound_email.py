@@ -0,0 +1,40 @@
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Ajoute l'outbox des emails (OutboundEmail, envoi par lots) et la
+    préférence User.email_digest (emails immédiats, ou résumé horaire /
+    quotidien pour les notifications à fort volume)."""
+
+    dependencies = [
+        ('Mapapi', '0011_activity_feed_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_digest',
+            field=models.CharField(blank=True, choices=[('', 'Immédiat'), ('hourly', 'Résumé horaire'), ('daily', 'Résumé quotidien')], default='', help_text='Fréquence de regroupement des emails de notification (vide = immédiat).', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='OutboundEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('to_email', models.EmailField(max_length=254)),
+                ('subject', models.CharField(max_length=255)),
+                ('template_name', models.CharField(max_length=255)),
+                ('context', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('category', models.CharField(blank=True, default='', max_length=50)),
+                ('summary', models.CharField(blank=True, default='', max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('sending', "En cours d'envoi"), ('sent', 'Envoyé'), ('failed', 'Échec'), ('digest', 'En attente de résumé'), ('digested', 'Inclus dans un résumé')], default='pending', max_length=10)),
+                ('digest', models.CharField(blank=True, choices=[('', 'Immédiat'), ('hourly', 'Résumé horaire'), ('daily', 'Résumé quotidien')], default='', max_length=10)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='outbound_email_status_idx')],
+            },
+        ),
+    ]
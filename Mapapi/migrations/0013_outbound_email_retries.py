@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Suivi des tentatives d'envoi de l'outbox : compteur, date de la
+    prochaine tentative (backoff) / fin de bail du worker."""
+
+    dependencies = [
+        ('Mapapi', '0012_outbound_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundemail',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='outboundemail',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='outboundemail',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_retry_idx'),
+        ),
+    ]
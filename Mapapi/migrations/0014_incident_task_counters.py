@@ -0,0 +1,48 @@
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_task_counters(apps, schema_editor):
+    """Initialise les compteurs depuis les tâches existantes (même règle que
+    Incident.update_progress : seules les tâches confirmées comptent)."""
+    Incident = apps.get_model('Mapapi', 'Incident')
+    closed = ('resolved', 'resolved_definitive')
+    rows = Incident.objects.annotate(
+        confirmed=Count('tasks', filter=Q(tasks__is_confirmed=True)),
+        done=Count('tasks', filter=Q(tasks__is_confirmed=True, tasks__state='done')),
+    ).filter(Q(confirmed__gt=0) | Q(etat__in=closed)).values_list('pk', 'etat', 'confirmed', 'done')
+    batch = []
+    for pk, etat, confirmed, done in rows.iterator():
+        if etat in closed:
+            progress = 100
+        else:
+            progress = int(done * 100 / confirmed + 0.5) if confirmed else 0
+        batch.append(Incident(pk=pk, tasks_confirmed_count=confirmed, tasks_done_count=done,
+                              progress=progress))
+        if len(batch) >= 500:
+            Incident.objects.bulk_update(batch, ['tasks_confirmed_count', 'tasks_done_count', 'progress'])
+            batch = []
+    Incident.objects.bulk_update(batch, ['tasks_confirmed_count', 'tasks_done_count', 'progress'])
+
+
+class Migration(migrations.Migration):
+    """Compteurs dénormalisés des tâches sur Incident (confirmées / terminées),
+    maintenus par incréments F() : la progression ne demande plus de COUNT."""
+
+    dependencies = [
+        ('Mapapi', '0013_outbound_email_retries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incident',
+            name='tasks_confirmed_count',
+            field=models.PositiveIntegerField(default=0, help_text='Nombre de tâches confirmées.'),
+        ),
+        migrations.AddField(
+            model_name='incident',
+            name='tasks_done_count',
+            field=models.PositiveIntegerField(default=0, help_text="Nombre de tâches confirmées terminées ('done')."),
+        ),
+        migrations.RunPython(backfill_task_counters, migrations.RunPython.noop),
+    ]
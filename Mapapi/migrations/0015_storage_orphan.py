@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Suivi des objets de stockage non référencés (balayage périodique des buckets)."""
+
+    dependencies = [
+        ('Mapapi', '0014_incident_task_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageOrphan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=63)),
+                ('name', models.CharField(max_length=1024)),
+                ('size', models.BigIntegerField(default=0)),
+                ('first_seen_at', models.DateTimeField(auto_now_add=True)),
+                ('last_seen_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'name'), name='storage_orphan_unique')],
+            },
+        ),
+    ]
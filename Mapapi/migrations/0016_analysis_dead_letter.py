@@ -0,0 +1,43 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Statut 'retrying' des prédictions et lettres mortes des analyses IA."""
+
+    dependencies = [
+        ('Mapapi', '0015_storage_orphan'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='prediction',
+            name='status',
+            field=models.CharField(
+                choices=[
+                    ('pending', 'Pending'), ('processing', 'Processing'), ('retrying', 'Retrying'),
+                    ('completed', 'Completed'), ('completed_with_warning', 'Completed with warning'),
+                    ('failed', 'Failed'),
+                ],
+                default='pending', max_length=32,
+            ),
+        ),
+        migrations.CreateModel(
+            name='AnalysisDeadLetter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_name', models.CharField(max_length=255)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('failed_at', models.DateTimeField(auto_now=True)),
+                ('replay_count', models.PositiveIntegerField(default=0)),
+                ('replayed_at', models.DateTimeField(blank=True, null=True)),
+                ('prediction', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='dead_letter',
+                    to='Mapapi.prediction',
+                )),
+            ],
+        ),
+    ]
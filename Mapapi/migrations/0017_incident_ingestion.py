@@ -0,0 +1,28 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Suivi par étapes du traitement différé des incidents déclarés."""
+
+    dependencies = [
+        ('Mapapi', '0016_analysis_dead_letter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncidentIngestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stages', models.JSONField(blank=True, default=dict)),
+                ('errors', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('incident', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='ingestion',
+                    to='Mapapi.incident',
+                )),
+            ],
+        ),
+    ]
@@ -0,0 +1,55 @@
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+SYNCED_MODELS = ('Incident', 'Collaboration', 'Notification')
+
+
+def backfill_updated_at(apps, schema_editor):
+    """Les lignes existantes prennent leur date de création comme dernière modification."""
+    for name in SYNCED_MODELS:
+        apps.get_model('Mapapi', name).objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+    """Flux des changements (GET /sync/changes/?since=) : ``updated_at`` sur les
+    incidents, collaborations et notifications, et traces des suppressions."""
+
+    dependencies = [
+        ('Mapapi', '0017_incident_ingestion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incident',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='collaboration',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(max_length=32)),
+                ('object_id', models.UUIDField()),
+                ('owner_id', models.UUIDField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['entity', 'deleted_at'], name='sync_tombstone_entity_idx')],
+            },
+        ),
+    ]
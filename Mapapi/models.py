@@ -5,6 +5,7 @@ from django.contrib.auth.models import (
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from datetime import datetime, timedelta
+import copy
 import uuid
 import random
 # 
@@ -15,6 +16,8 @@ from django.utils.html import format_html
 # Import the custom storage classes
 from backend.supabase_storage import ImageStorage, VideoStorage, VoiceStorage, DocumentStorage
 from django.core.validators import FileExtensionValidator
+from django.db.models.fields.files import FieldFile
+from django.core.serializers.json import DjangoJSONEncoder
 
 ADMIN = 'admin'
 VISITOR = 'visitor'
@@ -48,6 +51,8 @@ ANTI_GEL_DEADLINE_DAYS = {
     SEVERITY_MEDIUM: 60,
     SEVERITY_LOW: 90,
 }
+# Anti-gel (spec T3) : délai de repli quand la sévérité de l'Incident est nulle/inconnue.
+ANTI_GEL_DEFAULT_DAYS = 60
 
 USER_TYPES = (
     (ADMIN, ADMIN),
@@ -212,6 +217,30 @@ INTERVENTION_COUNTRIES = (
     (COUNTRY_MAURITANIA, 'Mauritanie'),
 )
 
+EMAIL_DIGEST_NONE = ''
+EMAIL_DIGEST_HOURLY = 'hourly'
+EMAIL_DIGEST_DAILY = 'daily'
+EMAIL_DIGEST_CHOICES = (
+    (EMAIL_DIGEST_NONE, 'Immédiat'),
+    (EMAIL_DIGEST_HOURLY, 'Résumé horaire'),
+    (EMAIL_DIGEST_DAILY, 'Résumé quotidien'),
+)
+
+EMAIL_PENDING = 'pending'      # à envoyer au prochain lot (ou à réessayer)
+EMAIL_SENDING = 'sending'      # réservé par un worker (bail jusqu'à next_attempt_at)
+EMAIL_SENT = 'sent'
+EMAIL_FAILED = 'failed'
+EMAIL_DIGEST = 'digest'        # en attente du prochain résumé
+EMAIL_DIGESTED = 'digested'    # inclus dans un résumé envoyé
+EMAIL_STATUSES = (
+    (EMAIL_PENDING, 'En attente'),
+    (EMAIL_SENDING, "En cours d'envoi"),
+    (EMAIL_SENT, 'Envoyé'),
+    (EMAIL_FAILED, 'Échec'),
+    (EMAIL_DIGEST, 'En attente de résumé'),
+    (EMAIL_DIGESTED, 'Inclus dans un résumé'),
+)
+
 PARTNER_STATUS_ACTIVE = 'active'
 PARTNER_STATUS_INACTIVE = 'inactive'
 PARTNER_STATUSES = (
@@ -252,6 +281,99 @@ class UUIDModel(models.Model):
         abstract = True
 
 
+class TrackedFieldsMixin:
+    """Suivi des champs modifiés depuis le chargement (ou la dernière sauvegarde).
+
+    Les valeurs chargées sont mémorisées dans ``from_db`` : ``has_changed``,
+    ``changed_fields`` et ``previous_value`` répondent sans requête (plus de
+    re-lecture en ``pre_save``). Sans ``update_fields`` explicite, ``save()``
+    d'une instance existante n'écrit que les champs modifiés, plus les champs
+    ``auto_now``. À placer AVANT la classe de base du modèle.
+    """
+
+    @staticmethod
+    def _tracked(value):
+        if isinstance(value, FieldFile):
+            return value.name
+        if isinstance(value, (dict, list)):
+            return copy.deepcopy(value)
+        return value
+
+    def _snapshot_fields(self, attnames=None):
+        loaded = self.__dict__.setdefault('_loaded_values', {})
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__ and (attnames is None or field.attname in attnames):
+                loaded[field.attname] = self._tracked(self.__dict__[field.attname])
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_fields()
+        return instance
+
+    def _attname(self, field_name):
+        return self._meta.get_field(field_name).attname
+
+    @property
+    def changed_fields(self):
+        """Noms des champs modifiés (tous les champs chargés si l'instance est nouvelle)."""
+        loaded = self.__dict__.get('_loaded_values', {})
+        return {
+            field.name for field in self._meta.concrete_fields
+            if field.attname in self.__dict__ and (
+                self._state.adding or field.attname not in loaded
+                or loaded[field.attname] != self._tracked(self.__dict__[field.attname]))
+        }
+
+    def has_changed(self, field_name):
+        return self._meta.get_field(field_name).name in self.changed_fields
+
+    def previous_value(self, field_name):
+        """Valeur chargée (None pour une instance nouvelle ou un champ non chargé)."""
+        if self._state.adding:
+            return None
+        return self.__dict__.get('_loaded_values', {}).get(self._attname(field_name))
+
+    def save(self, *args, **kwargs):
+        if (not args and kwargs.get('update_fields') is None and not kwargs.get('force_insert')
+                and not self._state.adding and '_loaded_values' in self.__dict__):
+            dirty = self.changed_fields | {
+                field.name for field in self._meta.concrete_fields if getattr(field, 'auto_now', False)
+            }
+            dirty.discard(self._meta.pk.name)
+            if dirty:
+                kwargs['update_fields'] = dirty
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        self._snapshot_fields(
+            None if update_fields is None else {self._attname(name) for name in update_fields})
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._snapshot_fields(None if fields is None else {self._attname(name) for name in fields})
+
+
+class ChangeTrackedQuerySet(models.QuerySet):
+    """QuerySet dont ``update()`` horodate aussi ``updated_at`` : une mise à jour
+    en masse reste visible du flux des changements (cf. services/delta_sync.py)."""
+
+    def update(self, **kwargs):
+        kwargs.setdefault('updated_at', timezone.now())
+        return super().update(**kwargs)
+
+
+class ChangeTrackedMixin:
+    """Écrit ``updated_at`` à chaque sauvegarde, y compris avec un ``update_fields``
+    explicite (``auto_now`` n'y serait pas persisté). À placer AVANT la classe de
+    base du modèle, avec ``objects = ChangeTrackedQuerySet.as_manager()``."""
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'updated_at'}
+        super().save(*args, **kwargs)
+
+
 # Modèle d'organisation pour gérer les organisations liées aux utilisateurs
 class Organisation(UUIDModel):
     name = models.CharField(max_length=255, unique=True)
@@ -428,6 +550,12 @@ class User(AbstractBaseUser, PermissionsMixin):
     # Dernière consultation du flux d'activité (vues/non-vues) : tout élément du
     # flux postérieur à cette date est considéré « non vu » par l'utilisateur.
     activity_seen_at = models.DateTimeField(blank=True, null=True)
+    # Emails des notifications à fort volume (demandes de collaboration, alertes
+    # d'échéance) : immédiats, ou regroupés en un résumé horaire / quotidien.
+    email_digest = models.CharField(
+        max_length=10, choices=EMAIL_DIGEST_CHOICES, default=EMAIL_DIGEST_NONE, blank=True,
+        help_text="Fréquence de regroupement des emails de notification (vide = immédiat)."
+    )
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
@@ -591,7 +719,20 @@ class IncidentOrgAssignment(UUIDModel):
         return f"Incident {self.incident_id} → orga {self.organisation_id} ({self.status})"
 
 
-class Incident(UUIDModel):
+def incident_progress(etat, confirmed, done):
+    """Progression (0-100) : 100 si clôturé, sinon tâches terminées / confirmées.
+
+    Arrondi « demi vers le haut », identique au FLOOR(x + 0.5) SQL des mises à
+    jour incrémentales (services/task_progress.py).
+    """
+    if etat in (RESOLVED, RESOLVED_DEFINITIVE):
+        return 100
+    if not confirmed:
+        return 0
+    return int(done * 100 / confirmed + 0.5)
+
+
+class Incident(TrackedFieldsMixin, ChangeTrackedMixin, UUIDModel):
     title = models.CharField(max_length=250, blank=True,
                              null=True)
     zone = models.CharField(max_length=250, blank=False,
@@ -627,6 +768,8 @@ class Incident(UUIDModel):
                             null=True)
     category_ids = models.ManyToManyField('Category', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Filigrane du flux des changements (GET /sync/changes/?since=).
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     taken_by = models.ForeignKey(User, related_name='taken_incidents', null=True, blank=True, on_delete=models.SET_NULL)
     # Mode de prise en charge : 'internal' (org seule en interne) ou 'collaborative' (ouvert aux autres orgs)
     TAKE_IN_CHARGE_MODES = (
@@ -644,6 +787,12 @@ class Incident(UUIDModel):
                                            help_text="Date de fin de la résolution. Obligatoire à la clôture.")
     progress = models.PositiveSmallIntegerField(default=0,
                                                 help_text="Progression auto-calculée (0-100) selon avancement des tâches.")
+    # Compteurs dénormalisés des tâches (maintenus par IncidentTask.save/delete,
+    # cf. services/task_progress.py) : la progression se calcule sans COUNT.
+    tasks_confirmed_count = models.PositiveIntegerField(default=0,
+                                                        help_text="Nombre de tâches confirmées.")
+    tasks_done_count = models.PositiveIntegerField(default=0,
+                                                   help_text="Nombre de tâches confirmées terminées ('done').")
     is_public = models.BooleanField(default=True,
                                      help_text="Si False, l'incident n'est visible que par l'organisation de l'agent.")
     is_deleted = models.BooleanField(default=False,
@@ -692,20 +841,28 @@ class Incident(UUIDModel):
         help_text="Motif de refus de la résolution par le Super Admin."
     )
 
+    objects = ChangeTrackedQuerySet.as_manager()
+
     def __str__(self):
         return self.zone + ' '
 
     def save(self, *args, **kwargs):
         # Génère une miniature (≈320px) à partir de la photo, une seule fois, pour
         # alléger le chargement de l'onglet incidents. N'échoue jamais la sauvegarde
-        # de l'incident si la génération de la miniature échoue.
-        if self.photo and not self.thumbnail:
+        # de l'incident si la génération de la miniature échoue. Différée pendant la
+        # déclaration (étape 'thumbnail' de l'ingestion, cf. services/ingestion.py).
+        from .services.ingestion import thumbnails_deferred
+        if self.photo and not self.thumbnail and not thumbnails_deferred():
             self._generate_thumbnail()
         # Un incident résolu/clôturé est à 100% de progression — même s'il n'a aucune
         # tâche (sinon `progress` restait à 0 et le front affichait 0% pour un incident
         # résolu). On ajoute 'progress' à update_fields si fourni, pour bien le persister.
-        if self.etat in (RESOLVED, RESOLVED_DEFINITIVE) and self.progress != 100:
-            self.progress = 100
+        # Réouverture d'un incident clôturé : la progression revient à celle des tâches.
+        progress = incident_progress(self.etat, self.tasks_confirmed_count, self.tasks_done_count)
+        if progress != self.progress and (
+                self.etat in (RESOLVED, RESOLVED_DEFINITIVE)
+                or self.previous_value('etat') in (RESOLVED, RESOLVED_DEFINITIVE)):
+            self.progress = progress
             update_fields = kwargs.get('update_fields')
             if update_fields is not None:
                 kwargs['update_fields'] = list(set(update_fields) | {'progress'})
@@ -730,26 +887,25 @@ class Incident(UUIDModel):
                 "Génération miniature échouée pour l'incident %s: %s", self.pk, exc)
 
     def update_progress(self, save=True):
-        """Recalcule la progression de l'incident en fonction de ses tâches confirmées.
+        """Recalcule compteurs de tâches et progression depuis les tâches (une requête).
 
         Seules les tâches confirmées par le leader (is_confirmed=True) sont prises en compte.
         Une tâche 'done' compte comme terminée (poids 1).
         Une tâche 'failed' est considérée comme close (poids 1) mais ne contribue pas à 100%.
         Progression = round(done / total * 100).
+
+        Les compteurs sont normalement maintenus par incréments (IncidentTask.save /
+        delete) : cette méthode sert de réparation.
         """
-        # Un incident résolu est à 100% quoi qu'il arrive (clôture = terminé).
-        if self.etat in (RESOLVED, RESOLVED_DEFINITIVE):
-            self.progress = 100
-        else:
-            tasks = self.tasks.filter(is_confirmed=True)
-            total = tasks.count()
-            if total == 0:
-                self.progress = 0
-            else:
-                done = tasks.filter(state=TASK_DONE).count()
-                self.progress = round(done * 100 / total)
+        counts = self.tasks.aggregate(
+            confirmed=models.Count('id', filter=models.Q(is_confirmed=True)),
+            done=models.Count('id', filter=models.Q(is_confirmed=True, state=TASK_DONE)),
+        )
+        self.tasks_confirmed_count = counts['confirmed']
+        self.tasks_done_count = counts['done']
+        self.progress = incident_progress(self.etat, counts['confirmed'], counts['done'])
         if save:
-            self.save(update_fields=['progress'])
+            self.save(update_fields=['tasks_confirmed_count', 'tasks_done_count', 'progress'])
         return self.progress
 
     @property
@@ -944,10 +1100,11 @@ class PhoneOTP(UUIDModel):
     created_at = models.DateTimeField(auto_now_add=True)
 
 # Collaboration table
-class Collaboration(UUIDModel):
+class Collaboration(TrackedFieldsMixin, ChangeTrackedMixin, UUIDModel):
     incident = models.ForeignKey('Incident', blank=False, null=False, on_delete=models.CASCADE)
     user = models.ForeignKey(User, blank=False, null=False, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     end_date = models.DateField(blank=True, null=True)
     motivation = models.TextField(blank=True, null=True)
     other_option = models.CharField(max_length=255, blank=True, null=True)
@@ -955,6 +1112,8 @@ class Collaboration(UUIDModel):
     role = models.CharField(max_length=20, choices=COLLAB_ROLES, default=COLLAB_ROLE_CONTRIBUTOR,
                             help_text="Rôle de l'organisation sur l'incident : leader, contributor ou observer.")
 
+    objects = ChangeTrackedQuerySet.as_manager()
+
     class Meta:
         unique_together = (("incident", "user"),)
 
@@ -977,6 +1136,8 @@ class Colaboration(UUIDModel):
 class PredictionStatus(models.TextChoices):
     PENDING = "pending", "Pending"
     PROCESSING = "processing", "Processing"
+    # Échec transitoire : un nouvel essai est programmé (backoff exponentiel).
+    RETRYING = "retrying", "Retrying"
     COMPLETED = "completed", "Completed"
     COMPLETED_WITH_WARNING = "completed_with_warning", "Completed with warning"
     FAILED = "failed", "Failed"
@@ -1085,6 +1246,59 @@ class Prediction(UUIDModel):
         super().save(*args, **kwargs)
 
 
+class IncidentIngestion(models.Model):
+    """Suivi des étapes différées d'un incident déclaré (cf. ``services/ingestion.py``) :
+    ``stages`` = ``{étape: 'pending' | 'done' | 'skipped' | 'failed'}``, ``errors`` =
+    ``{étape: message}``. ``completed_at`` est renseigné quand plus rien n'est en attente."""
+    incident = models.OneToOneField('Incident', on_delete=models.CASCADE, related_name='ingestion')
+    stages = models.JSONField(default=dict, blank=True)
+    errors = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"Ingestion {self.incident_id}"
+
+
+class AnalysisDeadLetter(models.Model):
+    """Analyse IA abandonnée après épuisement des essais (cf.
+    ``services/dead_letters.py``). Conservée jusqu'à ce qu'un rejeu réussisse ;
+    un nouvel échec met à jour la même ligne."""
+    prediction = models.OneToOneField(Prediction, on_delete=models.CASCADE, related_name='dead_letter')
+    task_name = models.CharField(max_length=255)
+    # Référence de l'entrée (prédiction, incident, photo) : de quoi rejouer ou diagnostiquer.
+    payload = models.JSONField(default=dict, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    failed_at = models.DateTimeField(auto_now=True)
+    replay_count = models.PositiveIntegerField(default=0)
+    replayed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.task_name} [{self.prediction_id}] ({self.attempts} essai(s))"
+
+
+class SyncTombstone(models.Model):
+    """Trace d'une ligne supprimée définitivement, pour le flux des changements
+    (cf. ``services/delta_sync.py``). ``owner_id`` réserve la trace à son
+    destinataire (notifications) ; nul = visible de tous. Purgée après
+    ``SYNC_TOMBSTONE_RETENTION_DAYS`` jours."""
+    entity = models.CharField(max_length=32)
+    object_id = models.UUIDField()
+    owner_id = models.UUIDField(null=True, blank=True)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['entity', 'deleted_at'], name='sync_tombstone_entity_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.entity} {self.object_id} supprimé le {self.deleted_at:%Y-%m-%d %H:%M}"
+
+
 NOTIF_TYPE_TITLES = {
     'collaboration_request': 'Demande de collaboration',
     'collaboration_accepted': 'Collaboration acceptée',
@@ -1095,13 +1309,14 @@ NOTIF_TYPE_TITLES = {
 }
 
 
-class Notification(UUIDModel):
+class Notification(ChangeTrackedMixin, UUIDModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     message = models.CharField(max_length=255)
     # Catégorie de la notification (pour titre/icône côté front, plus de titre en
     # dur). cf. NOTIF_TYPE_TITLES pour le libellé FR par défaut.
     notif_type = models.CharField(max_length=40, blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     read = models.BooleanField(default=False)
     # Rendu nullable (Phase 4 — Feature 3 « Signaler à mon Admin ») : une
     # notification peut désormais exister sans collaboration rattachée.
@@ -1109,6 +1324,8 @@ class Notification(UUIDModel):
     # Incident concerné (pour la redirection au clic sur la notification).
     incident = models.ForeignKey('Incident', on_delete=models.CASCADE, related_name='notifications', null=True, blank=True)
 
+    objects = ChangeTrackedQuerySet.as_manager()
+
     def __str__(self):
         return self.message
 
@@ -1144,6 +1361,23 @@ class Notification(UUIDModel):
         return None
 
 
+class NotificationCounter(models.Model):
+    """Compteurs dénormalisés des notifications d'un utilisateur (badge).
+
+    Maintenus par incréments atomiques (F()) à la création / suppression d'une
+    notification et au changement de statut de lecture — cf.
+    services.notification_counts. Ligne créée paresseusement (recalcul complet)
+    à la première lecture.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                related_name='notification_counter')
+    unread_count = models.PositiveIntegerField(default=0)
+    total_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread_count}/{self.total_count}"
+
+
 CHAT_ROLE_USER = 'user'
 CHAT_ROLE_ASSISTANT = 'assistant'
 CHAT_ROLE_SYSTEM = 'system'
@@ -1187,7 +1421,95 @@ class UserAction(UUIDModel):
 
     def __str__(self):
         return self.action
-    
+
+
+ACTIVITY_SCOPE_ALL = 'all'
+
+
+class ActivityFeedCounter(models.Model):
+    """Nombre d'actions (UserAction) par périmètre : ``all`` (plateforme) et
+    ``org:<uuid>`` (acteurs membres de l'organisation).
+
+    Incrémenté atomiquement à chaque action (cf. services.activity_counts) ;
+    le flux d'une org = ``all`` - ``org:<uuid>``. Ligne créée paresseusement
+    (COUNT complet) à la première lecture ; réconciliée par
+    ``repair_activity_counters``.
+    """
+    scope = models.CharField(max_length=64, primary_key=True)
+    total = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.scope}: {self.total}"
+
+
+class ActivityFeedWatermark(models.Model):
+    """Dernière consultation du flux d'activité par un utilisateur, exprimée en
+    compteurs : ``unseen = visibles maintenant - visibles au moment de la
+    consultation`` (O(1), sans COUNT sur UserAction)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                related_name='activity_watermark')
+    organisation = models.ForeignKey(Organisation, on_delete=models.SET_NULL,
+                                     null=True, blank=True, related_name='+')
+    seen_total = models.PositiveBigIntegerField(default=0)
+    seen_org_total = models.PositiveBigIntegerField(default=0)
+    seen_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.seen_at}"
+
+
+class OutboundEmail(models.Model):
+    """Email en file d'attente (outbox). Les emails ``pending`` sont envoyés
+    par lots (cf. ``services/mail.py``) et réessayés avec backoff jusqu'à
+    ``EMAIL_MAX_ATTEMPTS`` ; les emails ``digest`` attendent le résumé
+    périodique de leur destinataire."""
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    template_name = models.CharField(max_length=255)
+    context = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    category = models.CharField(max_length=50, blank=True, default='')
+    # Ligne affichée dans le résumé (message de la notification).
+    summary = models.CharField(max_length=255, blank=True, default='')
+    status = models.CharField(max_length=10, choices=EMAIL_STATUSES, default=EMAIL_PENDING)
+    digest = models.CharField(max_length=10, choices=EMAIL_DIGEST_CHOICES, default=EMAIL_DIGEST_NONE,
+                              blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Prochaine tentative (pending) ou fin du bail du worker (sending).
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='outbound_email_status_idx'),
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_retry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {self.to_email} ({self.status})"
+
+
+class StorageOrphan(models.Model):
+    """Objet d'un bucket qu'aucune ligne ne référence (cf. ``services/storage_sweeper.py``).
+    Supprimé (ou mis en quarantaine) après ``STORAGE_SWEEP_GRACE_DAYS`` jours
+    sans référence ; la ligne disparaît si l'objet est à nouveau référencé."""
+    bucket = models.CharField(max_length=63)
+    name = models.CharField(max_length=1024)
+    size = models.BigIntegerField(default=0)
+    first_seen_at = models.DateTimeField(auto_now_add=True)
+    last_seen_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['bucket', 'name'], name='storage_orphan_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.bucket}/{self.name}"
+
+
 class DiscussionMessage(UUIDModel):
     incident = models.ForeignKey('Incident', on_delete=models.CASCADE)
     collaboration = models.ForeignKey(Collaboration, on_delete=models.CASCADE)
@@ -1216,7 +1538,7 @@ class DiscussionMessage(UUIDModel):
 
 
 # --- Tâches d'incident (gérées par le leader) ---
-class IncidentTask(UUIDModel):
+class IncidentTask(TrackedFieldsMixin, UUIDModel):
     incident = models.ForeignKey('Incident', related_name='tasks', on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
@@ -1261,35 +1583,50 @@ class IncidentTask(UUIDModel):
         """Vérifie si le créateur de la tâche est le leader de l'incident."""
         if not self.created_by_id:
             return False
-        # Le leader est soit via Collaboration(role=leader) soit via incident.taken_by
-        if Collaboration.objects.filter(
-            incident=self.incident,
+        # Le leader est soit incident.taken_by (cas courant, sans requête si
+        # l'incident est déjà chargé) soit via Collaboration(role=leader).
+        if self.incident.taken_by_id == self.created_by_id:
+            return True
+        return Collaboration.objects.filter(
+            incident_id=self.incident_id,
             user_id=self.created_by_id,
             role=COLLAB_ROLE_LEADER,
             status='accepted',
-        ).exists():
-            return True
-        return self.incident.taken_by_id == self.created_by_id
+        ).exists()
+
+    def progress_contribution(self, loaded=False):
+        """(incident_id, confirmée, terminée) de la tâche dans les compteurs de
+        son incident : valeurs courantes, ou chargées (``loaded=True``)."""
+        if loaded:
+            if self._state.adding:
+                return None, 0, 0
+            confirmed = bool(self.previous_value('is_confirmed'))
+            return (self.previous_value('incident'), int(confirmed),
+                    int(confirmed and self.previous_value('state') == TASK_DONE))
+        confirmed = bool(self.is_confirmed)
+        return self.incident_id, int(confirmed), int(confirmed and self.state == TASK_DONE)
 
     def save(self, *args, **kwargs):
-        # Auto-confirmer si créée par le leader
-        if not self.pk and not self.is_confirmed:
+        from .services.task_progress import apply_task_change
+
+        # Auto-confirmer si créée par le leader (la clé UUID est attribuée dès
+        # l'instanciation : c'est _state.adding qui distingue une création).
+        if self._state.adding and not self.is_confirmed:
             if self._is_creator_leader():
                 self.is_confirmed = True
+        before = self.progress_contribution(loaded=True)
         super().save(*args, **kwargs)
-        # met à jour la progression de l'incident après chaque sauvegarde
-        try:
-            self.incident.update_progress()
-        except Exception:
-            pass
+        # Compteurs + progression de l'incident : un UPDATE avec F() (et rien si
+        # la tâche ne change pas de contribution).
+        apply_task_change(self, before, self.progress_contribution())
 
     def delete(self, *args, **kwargs):
-        incident = self.incident
-        super().delete(*args, **kwargs)
-        try:
-            incident.update_progress()
-        except Exception:
-            pass
+        from .services.task_progress import apply_task_change
+
+        before = self.progress_contribution(loaded=True)
+        result = super().delete(*args, **kwargs)
+        apply_task_change(self, before, (None, 0, 0))
+        return result
 
 
 # --- Suggestions de partenaires (par contributors, validées par le leader) ---
@@ -9,4 +9,5 @@ websocket_urlpatterns = [
     path('ws/incidents/<uuid:incident_id>/tasks/', consumers.TaskConsumer.as_asgi()),
     path('ws/collaborations/', consumers.CollaborationConsumer.as_asgi()),
     path('ws/activity-feed/', consumers.ActivityFeedConsumer.as_asgi()),
+    path('ws/map/', consumers.MapConsumer.as_asgi()),
 ]
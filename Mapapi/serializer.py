@@ -301,7 +301,7 @@ class IncidentSerializer(IncidentActingOrgsMixin, ModelSerializer):
     class Meta:
         model = Incident
         fields = '__all__'
-        read_only_fields = ('progress',)
+        read_only_fields = ('progress', 'tasks_confirmed_count', 'tasks_done_count')
 
     def validate(self, data):
         """Validation supplémentaire sur la clôture d'un incident.
@@ -365,6 +365,20 @@ class IncidentMapSerializer(ModelSerializer):
         )
 
 
+class IncidentChangeSerializer(ModelSerializer):
+    """Charge utile compacte du flux des changements (GET /sync/changes/) : champs
+    scalaires et PK des relations, miniature seule (pas de photo/vidéo/audio).
+    Le détail complet reste sur ``GET /incident/<id>``."""
+
+    class Meta:
+        model = Incident
+        fields = (
+            'id', 'title', 'zone', 'description', 'thumbnail', 'user_id', 'category_id',
+            'lattitude', 'longitude', 'etat', 'severity', 'progress', 'is_public',
+            'taken_by', 'take_in_charge_mode', 'created_at', 'updated_at',
+        )
+
+
 class EvenementSerializer(ModelSerializer):
     class Meta:
         model = Evenement
@@ -520,6 +534,12 @@ class PhoneOTPSerializer(serializers.ModelSerializer):
         model = PhoneOTP
         fields = ['phone_number']
 
+class IncidentIngestionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = IncidentIngestion
+        fields = ('incident', 'stages', 'errors', 'created_at', 'updated_at', 'completed_at')
+        read_only_fields = fields
+
 class PredictionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Prediction
@@ -674,6 +694,14 @@ class CollaborationEnrichedSerializer(CollaborationPartiesMixin, ModelSerializer
             incident=obj.incident, status='accepted'
         ).count()
 
+class CollaborationChangeSerializer(ModelSerializer):
+    """Charge utile compacte des collaborations dans le flux des changements."""
+
+    class Meta:
+        model = Collaboration
+        fields = ('id', 'incident', 'user', 'status', 'role', 'end_date', 'created_at', 'updated_at')
+
+
 class ColaborationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Colaboration
@@ -874,6 +902,34 @@ class DiscussionMessageSerializer(serializers.ModelSerializer):
         return data
 
 
+class FieldBundleAssignmentSerializer(serializers.ModelSerializer):
+    """Assignation dans le paquet hors ligne de l'agent (cf. services/field_bundle.py)."""
+
+    class Meta:
+        model = IncidentAssignment
+        fields = ('id', 'incident', 'assigned_by', 'deadline', 'status', 'created_at', 'updated_at')
+
+
+class FieldBundleIncidentSerializer(IncidentChangeSerializer):
+    """Incident du paquet hors ligne : ``thumbnail`` = chemin de la miniature dans le
+    zip (contexte ``thumbnails``), ou null."""
+    thumbnail = serializers.SerializerMethodField()
+
+    def get_thumbnail(self, obj) -> str | None:
+        return self.context.get('thumbnails', {}).get(obj.pk)
+
+
+class FieldBundleTaskSerializer(serializers.ModelSerializer):
+    """Tâche du paquet hors ligne, sans les preuves (photo/vidéo)."""
+
+    class Meta:
+        model = IncidentTask
+        fields = (
+            'id', 'incident', 'title', 'description', 'start_date', 'end_date', 'state',
+            'failure_reason', 'assigned_to', 'is_confirmed', 'created_at', 'updated_at',
+        )
+
+
 class IncidentTaskSerializer(serializers.ModelSerializer):
     class Meta:
         model = IncidentTask
@@ -0,0 +1,151 @@
+"""Compteurs O(1) du flux d'activité (/activity-feed/).
+
+Le flux d'un viewer = toutes les actions SAUF celles de son organisation, donc
+``visibles = total(all) - total(org:<son org>)``. Les totaux par périmètre
+(``ActivityFeedCounter``) sont incrémentés atomiquement à chaque action ; la
+dernière consultation est mémorisée en compteurs (``ActivityFeedWatermark``) :
+``non vus = visibles - visibles au moment du mark-seen``.
+
+Les suppressions d'actions (cascade à la suppression d'un User) et les
+changements d'organisation ne sont pas suivis en direct :
+``repair_counters`` (tâche Celery périodique) recalcule tout.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Value, When
+from django.utils import timezone
+
+from ..models import ACTIVITY_SCOPE_ALL, ActivityFeedCounter, ActivityFeedWatermark, UserAction
+
+
+def org_scope(org_id):
+    return f"org:{org_id}"
+
+
+def _actions_in_scope(scope):
+    qs = UserAction.objects.all()
+    if scope != ACTIVITY_SCOPE_ALL:
+        qs = qs.filter(user__organisation_member_id=scope[len('org:'):])
+    return qs
+
+
+def get_totals(scopes):
+    """{scope: total} ; les périmètres inconnus sont calculés puis enregistrés."""
+    totals = dict(ActivityFeedCounter.objects.filter(scope__in=scopes).values_list('scope', 'total'))
+    for scope in scopes:
+        if scope in totals:
+            continue
+        try:
+            with transaction.atomic():
+                counter = ActivityFeedCounter.objects.create(
+                    scope=scope, total=_actions_in_scope(scope).count())
+        except IntegrityError:  # créé en parallèle
+            counter = ActivityFeedCounter.objects.get(scope=scope)
+        totals[scope] = counter.total
+    return totals
+
+
+def record_actions(org_ids):
+    """Compte de nouvelles actions (une entrée par action : l'org de l'acteur
+    ou None). Une seule requête UPDATE quel que soit le nombre d'orgs."""
+    org_ids = list(org_ids)
+    if not org_ids:
+        return
+    deltas = Counter(org_scope(org_id) for org_id in org_ids if org_id)
+    deltas[ACTIVITY_SCOPE_ALL] = len(org_ids)
+    ActivityFeedCounter.objects.filter(scope__in=list(deltas)).update(
+        total=F('total') + Case(*(When(scope=scope, then=Value(n)) for scope, n in deltas.items()),
+                                default=Value(0)),
+    )
+
+
+def _scopes(org_id):
+    return [ACTIVITY_SCOPE_ALL] + ([org_scope(org_id)] if org_id else [])
+
+
+def feed_counts(user):
+    """{total_count, unseen_count, seen_count} du flux de ``user``."""
+    org_id = getattr(user, 'organisation_member_id', None)
+    totals = get_totals(_scopes(org_id))
+    visible = totals[ACTIVITY_SCOPE_ALL] - totals.get(org_scope(org_id), 0)
+    watermark = ActivityFeedWatermark.objects.filter(user_id=user.id).first()
+    if watermark is not None and watermark.organisation_id == org_id:
+        unseen = visible - (watermark.seen_total - watermark.seen_org_total)
+    elif getattr(user, 'activity_seen_at', None):
+        # Consultation antérieure aux watermarks (ou org changée) : calcul
+        # exact, jusqu'au prochain mark-seen.
+        qs = UserAction.objects.filter(created_at__gt=user.activity_seen_at)
+        if org_id:
+            qs = qs.exclude(user__organisation_member_id=org_id)
+        unseen = qs.count()
+    else:
+        unseen = visible
+    visible = max(visible, 0)
+    unseen = min(max(unseen, 0), visible)
+    return {'total_count': visible, 'unseen_count': unseen, 'seen_count': visible - unseen}
+
+
+def mark_seen(user, seen_at=None):
+    """Mémorise les compteurs courants comme « vus » par ``user``."""
+    seen_at = seen_at or timezone.now()
+    org_id = getattr(user, 'organisation_member_id', None)
+    totals = get_totals(_scopes(org_id))
+    ActivityFeedWatermark.objects.update_or_create(
+        user_id=user.id,
+        defaults={
+            'organisation_id': org_id,
+            'seen_total': totals[ACTIVITY_SCOPE_ALL],
+            'seen_org_total': totals.get(org_scope(org_id), 0),
+            'seen_at': seen_at,
+        },
+    )
+    return seen_at
+
+
+def repair_counters():
+    """Recalcule tous les totaux et watermarks depuis UserAction.
+
+    Corrige la dérive due aux suppressions d'actions et aux changements
+    d'organisation. Les watermarks sont recalculés en un seul parcours des
+    actions par date (fusion avec les watermarks triés par ``seen_at``), et
+    non par un COUNT par utilisateur. Retourne le nombre de lignes corrigées.
+    """
+    fixed_scopes = 0
+    expected = {ACTIVITY_SCOPE_ALL: UserAction.objects.count()}
+    for org_id, total in (UserAction.objects.exclude(user__organisation_member__isnull=True)
+                          .values_list('user__organisation_member_id')
+                          .annotate(n=Count('id')).order_by()):
+        expected[org_scope(org_id)] = total
+    current = dict(ActivityFeedCounter.objects.values_list('scope', 'total'))
+    for scope, total in current.items():
+        if expected.get(scope, 0) != total:
+            ActivityFeedCounter.objects.filter(scope=scope).update(total=expected.get(scope, 0))
+            fixed_scopes += 1
+
+    # Une ligne par utilisateur ayant consulté le flux : chargées d'un coup.
+    watermarks = list(ActivityFeedWatermark.objects.order_by('seen_at').values_list(
+        'pk', 'seen_at', 'user__organisation_member_id', 'seen_total', 'seen_org_total', 'organisation_id'))
+    # Actions sans date : comptées comme vues par tous (cf. mark_seen).
+    seen_total, seen_by_org = 0, Counter()
+    for org_id, n in (UserAction.objects.filter(created_at__isnull=True)
+                      .values_list('user__organisation_member_id')
+                      .annotate(n=Count('id')).order_by()):
+        seen_total += n
+        seen_by_org[org_id] += n
+    actions = (UserAction.objects.filter(created_at__isnull=False).order_by('created_at')
+               .values_list('created_at', 'user__organisation_member_id').iterator(chunk_size=2000))
+    action = next(actions, None)
+    stale = []
+    for pk, seen_at, org_id, stored_total, stored_org_total, stored_org_id in watermarks:
+        while action is not None and action[0] <= seen_at:
+            seen_total += 1
+            seen_by_org[action[1]] += 1
+            action = next(actions, None)
+        seen_org = seen_by_org[org_id] if org_id else 0
+        if (stored_total, stored_org_total, stored_org_id) != (seen_total, seen_org, org_id):
+            stale.append(ActivityFeedWatermark(user_id=pk, seen_total=seen_total,
+                                               seen_org_total=seen_org, organisation_id=org_id))
+    ActivityFeedWatermark.objects.bulk_update(
+        stale, ['seen_total', 'seen_org_total', 'organisation_id'], batch_size=500)
+    return {'scopes': fixed_scopes, 'watermarks': len(stale)}
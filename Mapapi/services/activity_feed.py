@@ -0,0 +1,98 @@
+"""Flux d'activité temps réel partitionné par organisation.
+
+Le viewer ne doit pas voir l'activité de SA propre organisation (cf. REST
+/activity-feed/). Plutôt qu'un groupe global où chaque consumer reçoit puis
+jette les événements de son org, chaque viewer rejoint le groupe de son
+organisation (``activity_feed_org_<org_id>``, ou ``activity_feed_all`` sans
+organisation) et un relais publie chaque action vers « tous les groupes sauf
+celui de l'org d'origine ».
+
+Le relais ne vise que les organisations ayant au moins un viewer connecté
+(registre Redis ``ws:activity_feed:orgs`` : org -> nb de connexions). Un
+compteur resté positif après un crash ne coûte qu'une publication inutile ;
+sans Redis, on publie vers toutes les organisations.
+"""
+import logging
+
+from ..models import Organisation
+from .broadcast import ws_broadcast
+from .redis_client import REDIS_ERRORS, get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+ALL_GROUP = 'activity_feed_all'
+ACTIVE_ORGS_KEY = 'ws:activity_feed:orgs'
+
+# Décrément atomique : supprime l'entrée quand plus aucun viewer n'est connecté.
+_UNREGISTER_SCRIPT = """
+local n = redis.call('HINCRBY', KEYS[1], ARGV[1], -1)
+if n <= 0 then redis.call('HDEL', KEYS[1], ARGV[1]) end
+return n
+"""
+
+
+def viewer_group(org_id):
+    """Groupe à rejoindre pour un viewer de l'organisation ``org_id``."""
+    return f"activity_feed_org_{org_id}" if org_id else ALL_GROUP
+
+
+def active_organisations():
+    """Identifiants (str) des organisations ayant un viewer connecté."""
+    try:
+        counts = get_redis().hgetall(ACTIVE_ORGS_KEY)
+        return {key.decode() for key, value in counts.items() if int(value) > 0}
+    except REDIS_ERRORS as exc:
+        logger.warning("registre activity feed indisponible: %s", exc)
+        return {str(pk) for pk in Organisation.objects.values_list('pk', flat=True)}
+
+
+def activity_payload(action, user):
+    """Payload WebSocket d'une action (``user`` : l'acteur, organisation chargée)."""
+    org = getattr(user, 'organisation_member', None) if user else None
+    user_name = (f"{user.first_name or ''} {user.last_name or ''}".strip() or user.email) if user else None
+    org_name = org.name if org else None
+    return {
+        'event': 'activity',
+        'id': action.id,
+        'action': action.action,
+        'user': user.id if user else None,
+        'user_name': user_name,
+        'organisation_id': org.id if org else None,
+        'organisation_name': org_name,
+        'actor': org_name or user_name,   # à afficher en tête (org, repli sur la personne)
+        'created_at': action.created_at.isoformat() if getattr(action, 'created_at', None) else None,
+        'timeStamp': action.timeStamp.isoformat() if getattr(action, 'timeStamp', None) else None,
+    }
+
+
+def relay_activity(payload, active=None):
+    """Publie une action vers tous les viewers, sauf ceux de l'org d'origine.
+
+    ``active`` : organisations actives déjà lues (relais d'un lot d'actions).
+    """
+    origin = payload.get('organisation_id')
+    origin = str(origin) if origin else None
+    if active is None:
+        active = active_organisations()
+    groups = [ALL_GROUP]
+    groups += [viewer_group(org_id) for org_id in sorted(active) if org_id != origin]
+    for group in groups:
+        ws_broadcast(group, payload)
+
+
+async def register_viewer(org_id):
+    if not org_id:
+        return
+    try:
+        await get_async_redis().hincrby(ACTIVE_ORGS_KEY, str(org_id), 1)
+    except REDIS_ERRORS as exc:
+        logger.warning("registre activity feed indisponible: %s", exc)
+
+
+async def unregister_viewer(org_id):
+    if not org_id:
+        return
+    try:
+        await get_async_redis().eval(_UNREGISTER_SCRIPT, 1, ACTIVE_ORGS_KEY, str(org_id))
+    except REDIS_ERRORS as exc:
+        logger.warning("registre activity feed indisponible: %s", exc)
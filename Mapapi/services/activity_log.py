@@ -0,0 +1,166 @@
+"""Journal d'actions (UserAction) en écriture différée.
+
+``log_activity`` ne touche pas la base : l'action est poussée (après le
+commit de la requête) dans une liste Redis, puis la tâche
+``flush_activity_log`` l'insère par lots : un ``bulk_create``, une seule
+lecture des acteurs et de leurs organisations, une seule mise à jour des
+compteurs du flux et un seul flush WebSocket pour tout le lot.
+
+Un lot est déplacé (LMOVE) de la file vers une liste « en cours », vidée
+seulement après le commit : un worker arrêté en plein flush ne perd rien, le
+flush suivant reprend d'abord cette liste. Les actions déjà en base (lot
+repris) ne sont ni recomptées ni rediffusées. Un verrou Redis garantit qu'un
+seul flush tourne à la fois.
+
+Sans Redis, l'action est créée immédiatement (``save`` classique : le signal
+``ws_push_activity`` fait alors le comptage et la diffusion).
+"""
+import json
+import logging
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateField, DateTimeField, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import User, UserAction
+from .activity_counts import record_actions
+from .activity_feed import active_organisations, activity_payload, relay_activity
+from .broadcast import broadcast_buffer
+from .redis_client import REDIS_ERRORS, get_redis
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = 'activity:pending'
+PROCESSING_KEY = 'activity:processing'
+FLUSH_LOCK_KEY = 'activity:flush:scheduled'
+FLUSH_RUNNING_KEY = 'activity:flush:running'
+# Durée max (s) d'un flush : au-delà, le verrou expire (worker tué).
+FLUSH_RUNNING_TTL = 300
+
+
+def log_activity(user, action):
+    """Journalise ``action`` pour ``user`` et retourne l'UserAction.
+
+    L'instance retournée a déjà son ``id`` et son horodatage (ceux qui seront
+    enregistrés) mais n'est en base qu'après le prochain flush.
+    """
+    now = timezone.now()
+    user_action = UserAction(id=uuid.uuid4(), user=user, action=action[:255],
+                             timeStamp=timezone.localdate(now), created_at=now)
+    entry = json.dumps({
+        'id': str(user_action.id),
+        'user': str(user.pk),
+        'action': user_action.action,
+        'created_at': now.isoformat(),
+    })
+    # Rien n'est journalisé si la transaction de l'appelant est annulée.
+    transaction.on_commit(partial(_enqueue, entry))
+    return user_action
+
+
+def _enqueue(entry):
+    try:
+        get_redis().rpush(QUEUE_KEY, entry)
+    except REDIS_ERRORS as exc:
+        logger.warning("file d'activité indisponible, écriture directe: %s", exc)
+        data = json.loads(entry)
+        created_at = parse_datetime(data['created_at'])
+        UserAction(id=data['id'], user_id=data['user'], action=data['action'],
+                   timeStamp=timezone.localdate(created_at), created_at=created_at).save()
+        return
+    schedule_flush()
+
+
+def schedule_flush():
+    """Programme ``flush_activity_log`` après ``ACTIVITY_LOG_FLUSH_WINDOW`` s,
+    au plus une fois par fenêtre (verrou Redis SET NX)."""
+    from ..tasks import flush_activity_log
+
+    window = int(getattr(settings, 'ACTIVITY_LOG_FLUSH_WINDOW', 2))
+    try:
+        if not get_redis().set(FLUSH_LOCK_KEY, 1, nx=True, ex=max(window, 1)):
+            return
+    except REDIS_ERRORS:
+        return  # le flush périodique (Beat) prendra le relais
+    flush_activity_log.apply_async(countdown=window)
+
+
+def _pop_batch(limit):
+    """Lot à écrire : la liste « en cours » laissée par un flush interrompu, sinon
+    au plus ``limit`` entrées déplacées atomiquement de la file vers celle-ci."""
+    redis = get_redis()
+    raw = redis.lrange(PROCESSING_KEY, 0, -1)
+    if not raw:
+        pipe = redis.pipeline(transaction=True)
+        for _ in range(limit):
+            pipe.lmove(QUEUE_KEY, PROCESSING_KEY, 'LEFT', 'RIGHT')
+        raw = [item for item in pipe.execute() if item is not None]
+    return [json.loads(item) for item in raw]
+
+
+def flush_pending(limit=None):
+    """Insère un lot d'actions en attente. Retourne le nombre d'actions écrites.
+
+    En cas d'échec, le lot reste dans la liste « en cours » et sera repris."""
+    limit = limit or int(getattr(settings, 'ACTIVITY_LOG_BATCH_SIZE', 500))
+    redis = get_redis()
+    if not redis.set(FLUSH_RUNNING_KEY, 1, nx=True, ex=FLUSH_RUNNING_TTL):
+        return 0  # un autre flush est en cours
+    try:
+        entries = _pop_batch(limit)
+        if not entries:
+            return 0
+        written = _write_batch(entries)
+        redis.delete(PROCESSING_KEY)  # lot commité
+        return written
+    finally:
+        redis.delete(FLUSH_RUNNING_KEY)
+
+
+def _write_batch(entries):
+    # Enrichissement une fois par lot : acteurs + organisations en une requête.
+    users = User.objects.select_related('organisation_member').only(
+        'id', 'email', 'first_name', 'last_name',
+        'organisation_member__id', 'organisation_member__name',
+    ).in_bulk({entry['user'] for entry in entries})
+    actions = []
+    for entry in entries:
+        user = users.get(uuid.UUID(entry['user']))
+        if user is None:  # acteur supprimé entre-temps
+            continue
+        created_at = parse_datetime(entry['created_at'])
+        actions.append(UserAction(id=entry['id'], user=user, action=entry['action'],
+                                  timeStamp=timezone.localdate(created_at), created_at=created_at))
+    if not actions:
+        return 0
+
+    with transaction.atomic(), broadcast_buffer():
+        # Lot repris après un flush interrompu : seules les actions absentes de la
+        # base sont insérées, comptées et diffusées (le verrou exclut tout
+        # flush concurrent entre cette lecture et l'insertion).
+        existing = {str(pk) for pk in UserAction.objects.filter(
+            id__in=[action.id for action in actions]).values_list('id', flat=True)}
+        actions = [action for action in actions if str(action.id) not in existing]
+        if not actions:
+            return 0
+        stamps = {str(action.id): action.created_at for action in actions}
+        UserAction.objects.bulk_create(actions, ignore_conflicts=True)
+        # auto_now_add écrase les horodatages au bulk_create : on rétablit ceux
+        # de la journalisation (ordre du flux, réponses déjà renvoyées).
+        UserAction.objects.filter(id__in=list(stamps)).update(
+            created_at=Case(*(When(id=pk, then=Value(ts)) for pk, ts in stamps.items()),
+                            output_field=DateTimeField()),
+            timeStamp=Case(*(When(id=pk, then=Value(timezone.localdate(ts))) for pk, ts in stamps.items()),
+                           output_field=DateField()),
+        )
+        record_actions([action.user.organisation_member_id for action in actions])
+        active = active_organisations()
+        for action in actions:
+            action.created_at = stamps[str(action.id)]
+            action.timeStamp = timezone.localdate(action.created_at)
+            relay_activity(activity_payload(action, action.user), active=active)
+    return len(actions)
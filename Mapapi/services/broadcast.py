@@ -0,0 +1,185 @@
+"""Diffusion WebSocket (channel layer) avec tampon de coalescence.
+
+Chaque signal post_save/post_delete pousse un événement vers un groupe Channels.
+Sans tampon, une opération de masse (N tâches, N notifications, acceptations en
+série…) déclenche N ``group_send``, chacun avec son propre aller-retour
+``async_to_sync`` vers une boucle d'événements.
+
+``broadcast_buffer()`` ouvre un tampon pour la durée d'une requête (cf.
+``BroadcastBufferMiddleware``) ou d'une tâche Celery (``buffered_broadcasts``) :
+les événements sont regroupés par groupe, dédoublonnés, puis expédiés AU COMMIT
+en une seule trame ``{"event": "batch", "items": [...]}`` par groupe — et tous
+les groupes partent dans un unique passage ``async_to_sync``. Les événements
+émis dans un bloc atomique annulé sont abandonnés (``transaction.on_commit``).
+
+Hors tampon, ``ws_broadcast`` envoie immédiatement (comportement historique).
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import partial, wraps
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .replay import record_events
+
+logger = logging.getLogger(__name__)
+
+BATCH_EVENT = 'batch'
+
+# Nombre maximal d'éléments par trame groupée (au-delà, plusieurs trames).
+DEFAULT_BATCH_SIZE = 100
+
+_local = threading.local()
+
+
+def _normalise(payload):
+    """Normalise le payload en primitives JSON (UUID -> str, datetime -> ISO…).
+
+    La couche Channels sérialise en msgpack, qui ne sait pas empaqueter un
+    UUID/datetime : sans cette étape, group_send lève et le message est perdu.
+    """
+    return json.loads(json.dumps(payload, cls=DjangoJSONEncoder))
+
+
+def _batch_size():
+    return max(1, int(getattr(settings, 'WS_BROADCAST_BATCH_SIZE', DEFAULT_BATCH_SIZE)))
+
+
+class BroadcastBuffer:
+    """Accumule les événements par groupe jusqu'au flush."""
+
+    def __init__(self):
+        self.depth = 0
+        self._groups = OrderedDict()
+
+    def add(self, group, payload):
+        # Enregistré via on_commit : immédiat hors transaction, différé jusqu'au
+        # commit dans un bloc atomique, abandonné si ce bloc est annulé.
+        transaction.on_commit(partial(self._append, group, payload))
+
+    def _append(self, group, payload):
+        items = self._groups.setdefault(group, OrderedDict())
+        # Coalescence : un même (événement, objet) émis plusieurs fois dans le
+        # lot n'est envoyé qu'une fois, avec son état le plus récent.
+        event_id = payload.get('id') if isinstance(payload, dict) else None
+        if event_id is None:
+            key = ('__seq__', len(items))
+        else:
+            key = (payload.get('event'), event_id)
+        items[key] = payload
+
+    def __len__(self):
+        return sum(len(items) for items in self._groups.values())
+
+    def drain(self):
+        """Retourne puis vide les messages à envoyer : [(group, payload), ...]."""
+        size = _batch_size()
+        messages = []
+        for group, items in self._groups.items():
+            values = list(items.values())
+            if len(values) == 1:
+                messages.append((group, values[0]))
+                continue
+            for start in range(0, len(values), size):
+                chunk = values[start:start + size]
+                messages.append((group, chunk[0] if len(chunk) == 1
+                                 else {'event': BATCH_EVENT, 'items': chunk}))
+        self._groups = OrderedDict()
+        return messages
+
+    def flush(self):
+        send_messages(self.drain())
+
+
+def current_buffer():
+    return getattr(_local, 'buffer', None)
+
+
+@contextmanager
+def broadcast_buffer():
+    """Ouvre (ou rejoint) le tampon de diffusion du thread courant.
+
+    Les contextes imbriqués partagent le tampon du plus externe, seul ce
+    dernier déclenche le flush (au commit de la transaction en cours, ou
+    immédiatement en autocommit).
+    """
+    buffer = current_buffer()
+    if buffer is None:
+        buffer = _local.buffer = BroadcastBuffer()
+    buffer.depth += 1
+    try:
+        yield buffer
+    finally:
+        buffer.depth -= 1
+        if buffer.depth == 0:
+            _local.buffer = None
+            transaction.on_commit(buffer.flush)
+
+
+def buffered_broadcasts(func):
+    """Décorateur (tâches Celery, commandes) : exécute ``func`` dans un tampon."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with broadcast_buffer():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+async def _group_send_all(layer, messages):
+    results = await asyncio.gather(
+        *(layer.group_send(group, {'type': 'broadcast', 'payload': payload})
+          for group, payload in messages),
+        return_exceptions=True,
+    )
+    for (group, _), result in zip(messages, results):
+        if isinstance(result, Exception):
+            logger.warning("WS broadcast échoué (%s): %s", group, result)
+
+
+def send_messages(messages):
+    """Envoie [(group, payload), ...] en un seul passage ``async_to_sync``.
+
+    Les événements des groupes rejouables sont d'abord journalisés (event_id).
+    """
+    if not messages:
+        return
+    record_events(messages)
+    try:
+        layer = get_channel_layer()
+        if layer is not None:
+            async_to_sync(_group_send_all)(layer, messages)
+    except Exception as exc:  # ne jamais casser une écriture DB à cause du temps réel
+        logger.warning("WS broadcast échoué (%d messages): %s", len(messages), exc)
+
+
+def ws_broadcast(group, payload):
+    """Pousse un message vers un groupe WebSocket (depuis un contexte sync).
+
+    Dans un ``broadcast_buffer()`` le message est mis en attente et coalescé ;
+    sinon il part immédiatement.
+    """
+    try:
+        safe_payload = _normalise(payload)
+    except Exception as exc:
+        logger.warning("WS broadcast échoué (%s): %s", group, exc)
+        return
+    buffer = current_buffer()
+    if buffer is not None:
+        buffer.add(group, safe_payload)
+        return
+    send_messages([(group, safe_payload)])
+
+
+def iter_payload_items(payload):
+    """Déplie une trame groupée : retourne la liste des événements unitaires."""
+    if isinstance(payload, dict) and payload.get('event') == BATCH_EVENT:
+        return list(payload.get('items') or [])
+    return [payload]
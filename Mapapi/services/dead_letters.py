@@ -0,0 +1,103 @@
+"""Nouveaux essais et lettres mortes des analyses IA (model-deploy).
+
+Un échec transitoire de l'appel au service d'analyse (connexion, délai
+dépassé, 5xx, 408/429) est réessayé avec un backoff exponentiel « equal
+jitter » : la moitié du délai ``base × 2^essai`` (plafonné) est fixe, l'autre
+tirée au hasard, pour que les analyses échouées ensemble ne reviennent pas
+frapper le service au même instant. Entre deux essais la prédiction est
+'retrying' ; elle ne passe à 'failed' qu'une fois les essais épuisés (ou pour
+une erreur non transitoire), avec une ``AnalysisDeadLetter`` qui garde le
+nombre d'essais, la dernière erreur et la référence de l'entrée. Les lettres
+mortes se rejouent par lot (action d'administration) ; une analyse réussie
+retire la sienne.
+"""
+import random
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import AnalysisDeadLetter, Prediction, PredictionStatus
+
+ANALYSIS_TASK = 'Mapapi.tasks.analyze_incident_with_model_task'
+
+# Codes HTTP qui justifient un nouvel essai (les autres 4xx ne changeront pas).
+RETRYABLE_STATUS = frozenset({408, 425, 429})
+
+
+def max_retries():
+    return int(getattr(settings, 'ANALYSIS_MAX_RETRIES', 5))
+
+
+def retry_delay(retries):
+    """Délai (s) avant l'essai suivant le ``retries``-ième nouvel essai (0 = premier)."""
+    base = int(getattr(settings, 'ANALYSIS_RETRY_BASE_DELAY', 30))
+    cap = int(getattr(settings, 'ANALYSIS_RETRY_MAX_DELAY', 30 * 60))
+    delay = min(base * 2 ** retries, cap)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def is_transient(exc):
+    """Vrai si l'échec de requête ``exc`` peut disparaître en réessayant."""
+    if isinstance(exc, requests.exceptions.InvalidJSONError):
+        return False  # le service a répondu, mais pas en JSON : rien à attendre d'un nouvel essai
+    response = getattr(exc, 'response', None)
+    if response is None:
+        return True  # connexion, délai dépassé…
+    return response.status_code >= 500 or response.status_code in RETRYABLE_STATUS
+
+
+def dead_letter(prediction, attempts, error):
+    """Passe ``prediction`` en échec et enregistre (ou met à jour) sa lettre morte."""
+    prediction.status = PredictionStatus.FAILED
+    prediction.error_message = error
+    prediction.save(update_fields=['status', 'error_message', 'updated_at'])
+    incident = prediction.incident
+    AnalysisDeadLetter.objects.update_or_create(
+        prediction=prediction,
+        defaults={
+            'task_name': ANALYSIS_TASK,
+            'payload': {
+                'prediction_id': str(prediction.pk),
+                'incident_id': str(prediction.incident_id) if prediction.incident_id else None,
+                'photo': incident.photo.name if incident is not None and incident.photo else None,
+            },
+            'attempts': attempts,
+            'last_error': error,
+        },
+    )
+
+
+def resolve(prediction):
+    """Retire la lettre morte d'une prédiction analysée avec succès."""
+    AnalysisDeadLetter.objects.filter(prediction=prediction).delete()
+
+
+def replay(queryset):
+    """Remet en file les analyses des lettres mortes de ``queryset``.
+
+    Les prédictions repassent 'pending' (un UPDATE), les lettres mortes
+    comptent le rejeu (un UPDATE) et les tâches partent après le commit.
+    Retourne le nombre d'analyses relancées.
+    """
+    from ..tasks import analyze_incident_with_model_task
+
+    prediction_ids = list(queryset.values_list('prediction_id', flat=True))
+    if not prediction_ids:
+        return 0
+    with transaction.atomic():
+        Prediction.objects.filter(pk__in=prediction_ids).update(
+            status=PredictionStatus.PENDING, error_message='', updated_at=timezone.now(),
+        )
+        AnalysisDeadLetter.objects.filter(prediction_id__in=prediction_ids).update(
+            replay_count=F('replay_count') + 1, replayed_at=timezone.now(),
+        )
+
+        def enqueue():
+            for prediction_id in prediction_ids:
+                analyze_incident_with_model_task.delay(prediction_id)
+
+        transaction.on_commit(enqueue)
+    return len(prediction_ids)
@@ -0,0 +1,164 @@
+"""Échéances du cycle de vie traitées à l'heure dite (file Redis triée).
+
+Chaque objet qui porte une échéance y est inscrit sous ``<type>:<pk>`` avec
+l'échéance (timestamp) pour score :
+
+- ``validation`` : ``Incident.validation_deadline`` tant que l'incident est
+  'in_validation' (validation tacite à 72 h) ;
+- ``assignment`` : ``IncidentOrgAssignment.deadline`` tant qu'elle est
+  'pending' (acceptation tacite à 72 h) ;
+- ``antigel`` : prochain seuil anti-gel non traité (75 %, 90 % puis 100 % du
+  délai selon la sévérité) tant que l'incident est 'taken_into_account'.
+
+L'inscription est refaite (ou retirée) après le commit de chaque sauvegarde
+qui touche ces champs (signaux). La tâche ``dispatch_due_deadlines`` retire
+les entrées échues et applique les traitements de ``tasks.py`` restreints à
+ces objets ; ces traitements revérifient l'éligibilité en base, une entrée
+périmée est donc sans effet. Les scans Beat ne sont plus qu'un filet de
+sécurité (Redis indisponible, entrée perdue).
+"""
+import logging
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import (
+    ANTI_GEL_DEADLINE_DAYS, ANTI_GEL_DEFAULT_DAYS, IN_VALIDATION, ORG_ASSIGNMENT_PENDING, TAKEN,
+    Incident, IncidentOrgAssignment,
+)
+from .redis_client import REDIS_ERRORS, get_redis
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = 'deadlines:due'
+
+VALIDATION = 'validation'
+ASSIGNMENT = 'assignment'
+ANTIGEL = 'antigel'
+
+# Champs d'un incident dont la modification déplace ses échéances.
+INCIDENT_FIELDS = frozenset({
+    'etat', 'validation_deadline', 'taken_in_charge_at', 'severity',
+    'antigel_warned_75', 'antigel_warned_90',
+})
+
+
+def _member(kind, pk):
+    return f"{kind}:{pk}"
+
+
+def antigel_eta(incident):
+    """Date du prochain seuil anti-gel non encore traité de ``incident``."""
+    days = ANTI_GEL_DEADLINE_DAYS.get(incident.severity, ANTI_GEL_DEFAULT_DAYS)
+    if not incident.antigel_warned_75:
+        ratio = 0.75
+    elif not incident.antigel_warned_90:
+        ratio = 0.90
+    else:
+        ratio = 1
+    return incident.taken_in_charge_at + timedelta(days=days) * ratio
+
+
+def incident_entries(incident):
+    """``[(type, pk, échéance ou None)]`` d'un incident (None : à retirer)."""
+    validation = antigel = None
+    if incident.etat == IN_VALIDATION and incident.validation_deadline:
+        validation = incident.validation_deadline
+    if incident.etat == TAKEN and incident.taken_in_charge_at:
+        antigel = antigel_eta(incident)
+    return [(VALIDATION, incident.pk, validation), (ANTIGEL, incident.pk, antigel)]
+
+
+def assignment_entries(assignment):
+    deadline = assignment.deadline if assignment.status == ORG_ASSIGNMENT_PENDING else None
+    return [(ASSIGNMENT, assignment.pk, deadline)]
+
+
+def apply_entries(entries):
+    """Inscrit / retire des échéances en un aller-retour Redis."""
+    if not entries:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for kind, pk, eta in entries:
+            if eta is None:
+                pipe.zrem(QUEUE_KEY, _member(kind, pk))
+            else:
+                pipe.zadd(QUEUE_KEY, {_member(kind, pk): eta.timestamp()})
+        pipe.execute()
+    except REDIS_ERRORS as exc:
+        # Le scan Beat (filet de sécurité) rattrapera ces échéances.
+        logger.warning("planification des échéances indisponible: %s", exc)
+
+
+def schedule_entries(entries):
+    """``apply_entries`` après le commit de la transaction en cours."""
+    if entries:
+        transaction.on_commit(partial(apply_entries, list(entries)))
+
+
+def resync_incidents(incident_ids):
+    """Replanifie les échéances d'incidents modifiés par UPDATE (sans signal)."""
+    incident_ids = list(incident_ids)
+    if not incident_ids:
+        return
+    entries = []
+    for incident in Incident.objects.filter(pk__in=incident_ids).only(*INCIDENT_FIELDS):
+        entries.extend(incident_entries(incident))
+    missing = set(incident_ids) - {pk for _, pk, _ in entries}
+    entries.extend((kind, pk, None) for pk in missing for kind in (VALIDATION, ANTIGEL))
+    schedule_entries(entries)
+
+
+def cancel_assignments(assignment_ids):
+    schedule_entries([(ASSIGNMENT, pk, None) for pk in assignment_ids])
+
+
+def pop_due(limit=None, now=None):
+    """Retire les échéances passées (au plus ``limit``) : ``{type: [pk, ...]}``.
+
+    Seules les entrées effectivement retirées par cet appel sont retournées :
+    deux répartiteurs concurrents ne traitent pas la même échéance.
+    """
+    limit = limit or int(getattr(settings, 'DEADLINE_DISPATCH_BATCH_SIZE', 500))
+    now = now or timezone.now()
+    redis = get_redis()
+    members = redis.zrangebyscore(QUEUE_KEY, '-inf', now.timestamp(), start=0, num=limit)
+    if not members:
+        return {}
+    pipe = redis.pipeline(transaction=False)
+    for member in members:
+        pipe.zrem(QUEUE_KEY, member)
+    due = {}
+    for member, removed in zip(members, pipe.execute()):
+        if not removed:
+            continue
+        member = member.decode() if isinstance(member, bytes) else member
+        kind, _, pk = member.partition(':')
+        due.setdefault(kind, []).append(pk)
+    return due
+
+
+def requeue(due, now=None):
+    """Réinscrit des échéances dont le traitement a échoué (nouvel essai au
+    prochain passage du répartiteur)."""
+    now = now or timezone.now()
+    apply_entries([(kind, pk, now) for kind, pks in due.items() for pk in pks])
+
+
+def rebuild():
+    """Réinscrit toutes les échéances en cours (perte de Redis, déploiement).
+    Retourne le nombre d'échéances inscrites."""
+    entries = []
+    incidents = Incident.objects.filter(etat__in=[IN_VALIDATION, TAKEN]).only(*INCIDENT_FIELDS)
+    for incident in incidents.iterator(chunk_size=2000):
+        entries.extend(entry for entry in incident_entries(incident) if entry[2] is not None)
+    assignments = IncidentOrgAssignment.objects.filter(status=ORG_ASSIGNMENT_PENDING).only('status', 'deadline')
+    for assignment in assignments.iterator(chunk_size=2000):
+        entries.extend(assignment_entries(assignment))
+    for start in range(0, len(entries), 1000):
+        apply_entries(entries[start:start + 1000])
+    return len(entries)
@@ -0,0 +1,108 @@
+"""Flux des changements (``GET /sync/changes/?since=<filigrane>``).
+
+Au lieu de re-télécharger les listes complètes (/incident/, /my-incidents/,
+/notifications/, /collaborations/dashboard/), le client envoie le filigrane de
+sa dernière synchronisation et ne reçoit que ce qui a changé depuis : lignes
+créées ou modifiées (charge utile compacte) et identifiants supprimés
+(incidents mis en corbeille, ``SyncTombstone`` des suppressions définitives).
+
+Le filigrane est l'horodatage (ISO 8601, UTC) de la borne haute de la réponse,
+en retrait de ``SYNC_WATERMARK_LAG`` secondes sur l'heure courante : une ligne
+modifiée par une transaction encore ouverte (``updated_at`` antérieur à son
+commit) est vue au passage suivant au lieu d'être perdue. Un filigrane plus
+ancien que la rétention des traces de suppression, ou plus de
+``SYNC_CHANGES_MAX`` changements dans une section, donnent ``reset`` : le client
+recharge alors les listes complètes.
+"""
+import datetime
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+
+from ..models import SyncTombstone
+
+INCIDENT, COLLABORATION, NOTIFICATION = 'incident', 'collaboration', 'notification'
+
+
+class TooManyChanges(Exception):
+    """Section trop volumineuse : un rechargement complet coûte moins cher."""
+
+
+def _setting(name, default):
+    return int(getattr(settings, name, default))
+
+
+def format_watermark(moment):
+    # 'Z' plutôt que '+00:00' : pas de '+' à encoder dans l'URL du client.
+    return moment.astimezone(datetime.timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def parse_watermark(value):
+    """Filigrane ``value`` → datetime aware. Lève ``ValidationError`` s'il est invalide."""
+    try:
+        moment = parse_datetime(value.strip().replace(' ', '+'))
+    except (AttributeError, ValueError):
+        moment = None
+    if moment is None:
+        raise serializers.ValidationError({'since': ["Filigrane invalide (horodatage ISO 8601 attendu)."]})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, datetime.timezone.utc)
+    return moment
+
+
+def upper_bound():
+    """Borne haute (exclue des passages suivants) d'une réponse du flux."""
+    return timezone.now() - timedelta(seconds=_setting('SYNC_WATERMARK_LAG', 5))
+
+
+def retention():
+    return timedelta(days=_setting('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+def expired(since):
+    """Vrai si des suppressions postérieures à ``since`` ont pu être oubliées."""
+    return since < timezone.now() - retention()
+
+
+def section(queryset, entity, since, until, user, serializer_class, context=None, trashed=None):
+    """Changements de ``queryset`` (déjà restreint aux lignes visibles de ``user``)
+    dans ``]since, until]`` : ``{'created': [...], 'updated': [...], 'deleted': [ids]}``.
+
+    ``trashed`` : lignes mises en corbeille (suppression logique), signalées
+    supprimées. Lève ``TooManyChanges`` au-delà de ``SYNC_CHANGES_MAX`` lignes.
+    """
+    limit = _setting('SYNC_CHANGES_MAX', 1000)
+    window = Q(updated_at__gt=since, updated_at__lte=until)
+    rows = list(queryset.filter(window).order_by('updated_at')[:limit + 1])
+    deleted = list(
+        SyncTombstone.objects
+        .filter(Q(owner_id__isnull=True) | Q(owner_id=user.pk),
+                entity=entity, deleted_at__gt=since, deleted_at__lte=until)
+        .values_list('object_id', flat=True)[:limit + 1]
+    )
+    if trashed is not None:
+        deleted += list(trashed.filter(window).values_list('pk', flat=True)[:limit + 1])
+    if len(rows) > limit or len(deleted) > limit:
+        raise TooManyChanges(entity)
+    created = [row for row in rows if row.created_at > since]
+    updated = [row for row in rows if row.created_at <= since]
+    return {
+        'created': serializer_class(created, many=True, context=context).data,
+        'updated': serializer_class(updated, many=True, context=context).data,
+        'deleted': sorted({str(pk) for pk in deleted}),
+    }
+
+
+def record_deletion(entity, object_id, owner_id=None):
+    """Trace la suppression définitive d'une ligne (cf. signaux ``post_delete``)."""
+    SyncTombstone.objects.create(entity=entity, object_id=object_id, owner_id=owner_id)
+
+
+def prune_tombstones():
+    """Supprime les traces plus anciennes que la rétention. Retourne leur nombre."""
+    deleted, _ = SyncTombstone.objects.filter(deleted_at__lt=timezone.now() - retention()).delete()
+    return deleted
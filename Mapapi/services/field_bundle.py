@@ -0,0 +1,153 @@
+"""Paquet hors ligne des agents de terrain (``GET /sync/field-bundle/``).
+
+Avant de partir en zone sans réseau, l'agent télécharge en une fois ce dont il
+a besoin : ses assignations (comme ``/agent/assigned-incidents/``), les
+incidents concernés (charge utile compacte), leurs tâches et les miniatures.
+Le tout est un zip : ``bundle.json`` + ``thumbnails/<incident>.jpg``.
+
+L'empreinte du paquet (assignations, incidents et tâches de l'agent, en deux
+petites requêtes) indique s'il faut le reconstruire. Le dernier paquet
+construit est gardé dans Redis par agent ; une assignation, un incident ou une
+tâche modifiés changent l'empreinte et le paquet est reconstruit. Un changement
+d'assignation retire aussi tout de suite le paquet en cache (signaux).
+
+L'ETag est le SHA-1 des octets du zip, pas l'empreinte : une miniature
+illisible au moment d'une reconstruction change le contenu sans changer les
+lignes en base. La reprise d'un téléchargement interrompu (``Range`` /
+``If-Range``) ne recolle ainsi jamais deux zips différents. Le zip est
+déterministe (ordre fixe, dates d'entrée fixes) : reconstruit à l'identique, il
+garde le même ETag.
+"""
+import hashlib
+import io
+import json
+import logging
+import zipfile
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max
+
+from ..models import IncidentAssignment, IncidentTask
+from .redis_client import REDIS_ERRORS, get_redis
+
+logger = logging.getLogger(__name__)
+
+# À incrémenter quand le contenu de bundle.json change de forme.
+FORMAT_VERSION = 1
+MANIFEST = 'bundle.json'
+# Date fixe des entrées du zip (la plus ancienne que le format accepte).
+ENTRY_DATE = (1980, 1, 1, 0, 0, 0)
+
+
+def _setting(name, default):
+    return int(getattr(settings, name, default))
+
+
+def _cache_key(agent_id):
+    return f"field_bundle:{agent_id}"
+
+
+def _assignments(agent):
+    return IncidentAssignment.objects.filter(agent=agent).select_related('incident').order_by('created_at', 'id')
+
+
+def fingerprint(agent):
+    """Empreinte (hex) des lignes en base du paquet de ``agent`` (clé de version du cache)."""
+    rows = list(_assignments(agent).values_list(
+        'id', 'status', 'deadline', 'updated_at', 'incident_id', 'incident__updated_at'))
+    tasks = IncidentTask.objects.filter(incident__assignments__agent=agent).aggregate(
+        count=Count('id'), last=Max('updated_at'))
+    digest = hashlib.sha1(
+        json.dumps([FORMAT_VERSION, rows, tasks], cls=DjangoJSONEncoder).encode())
+    return digest.hexdigest()
+
+
+def _thumbnail(incident):
+    """Octets de la miniature de ``incident`` (None si absente, trop lourde ou illisible)."""
+    if not incident.thumbnail:
+        return None
+    try:
+        with incident.thumbnail.open('rb') as image:
+            data = image.read(_setting('FIELD_BUNDLE_MAX_THUMBNAIL_BYTES', 200 * 1024) + 1)
+    except Exception as exc:  # stockage injoignable : paquet sans cette miniature
+        logger.warning("paquet hors ligne: miniature de l'incident %s illisible: %s", incident.pk, exc)
+        return None
+    if len(data) > _setting('FIELD_BUNDLE_MAX_THUMBNAIL_BYTES', 200 * 1024):
+        return None
+    return data
+
+
+def _write(archive, name, data, compress):
+    info = zipfile.ZipInfo(name, date_time=ENTRY_DATE)
+    info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    archive.writestr(info, data)
+
+
+def build(agent, version):
+    """Construit le zip du paquet de ``agent`` (empreinte ``version``)."""
+    from ..serializer import (
+        FieldBundleAssignmentSerializer, FieldBundleIncidentSerializer, FieldBundleTaskSerializer,
+    )
+
+    assignments = list(_assignments(agent))
+    incidents = list({assignment.incident_id: assignment.incident for assignment in assignments}.values())
+    tasks = IncidentTask.objects.filter(incident__in=incidents).order_by('incident_id', 'start_date', 'id')
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        thumbnails = {}
+        for incident in incidents:
+            data = _thumbnail(incident)
+            if data is not None:
+                thumbnails[incident.pk] = f"thumbnails/{incident.pk}.jpg"
+                # JPEG déjà compressé : stocké tel quel.
+                _write(archive, thumbnails[incident.pk], data, compress=False)
+        manifest = {
+            'format': FORMAT_VERSION,
+            'version': version,
+            'assignments': FieldBundleAssignmentSerializer(assignments, many=True).data,
+            'incidents': FieldBundleIncidentSerializer(
+                incidents, many=True, context={'thumbnails': thumbnails}).data,
+            'tasks': FieldBundleTaskSerializer(tasks, many=True).data,
+        }
+        _write(archive, MANIFEST, json.dumps(manifest, cls=DjangoJSONEncoder, ensure_ascii=False).encode(),
+               compress=True)
+    return buffer.getvalue()
+
+
+def get_bundle(agent):
+    """``(etag, octets)`` du paquet de ``agent``, depuis Redis si l'empreinte n'a pas changé.
+
+    Redis indisponible : le paquet est reconstruit (et son ETag recalculé sur
+    les octets obtenus).
+    """
+    version = fingerprint(agent)
+    key = _cache_key(agent.pk)
+    try:
+        cached = get_redis().hmget(key, 'version', 'etag', 'data')
+    except REDIS_ERRORS as exc:
+        logger.warning("paquet hors ligne: cache indisponible (Redis): %s", exc)
+        cached = (None, None, None)
+    if cached[0] is not None and cached[0].decode() == version and None not in cached[1:]:
+        return cached[1].decode(), cached[2]
+
+    data = build(agent, version)
+    etag = hashlib.sha1(data).hexdigest()
+    if len(data) <= _setting('FIELD_BUNDLE_CACHE_MAX_BYTES', 10 * 1024 * 1024):
+        try:
+            pipe = get_redis().pipeline()
+            pipe.hset(key, mapping={'version': version, 'etag': etag, 'data': data})
+            pipe.expire(key, _setting('FIELD_BUNDLE_CACHE_TTL', 6 * 3600))
+            pipe.execute()
+        except REDIS_ERRORS as exc:
+            logger.warning("paquet hors ligne de %s non mis en cache: %s", agent.pk, exc)
+    return etag, data
+
+
+def invalidate(agent_id):
+    """Retire le paquet en cache de l'agent ``agent_id`` (assignation modifiée)."""
+    try:
+        get_redis().delete(_cache_key(agent_id))
+    except REDIS_ERRORS:
+        pass  # l'empreinte aura changé : le paquet en cache ne sera pas servi
@@ -0,0 +1,137 @@
+"""Clés d'idempotence (en-tête ``Idempotency-Key``) des POST mobiles.
+
+Sur réseau instable, le client rejoue une création dont il n'a pas reçu la
+réponse. Avec un même ``Idempotency-Key`` (UUID généré par le client), la
+première requête s'exécute et sa réponse 2xx est conservée dans Redis
+(``IDEMPOTENCY_TTL`` secondes) ; les suivantes reçoivent cette réponse telle
+quelle (en-tête ``Idempotent-Replayed: true``) sans rien réexécuter — pas de
+doublon d'incident, de photo, de points ni d'analyse.
+
+La clé est réservée par ``SET NX`` avant l'exécution : une seconde requête
+arrivée pendant la première reçoit 409 (``Retry-After``). Une réponse d'erreur
+(ou une exception) libère la clé : le client peut réessayer. La clé est
+propre à l'utilisateur authentifié (ou anonyme) et à l'URL. Sans en-tête, ou
+si Redis est indisponible, la requête s'exécute normalement.
+
+Une empreinte SHA-256 de la requête (méthode, chemin, données ; pour un
+fichier : nom, taille et contenu) est conservée avec la clé : la même clé
+réutilisée pour une requête différente reçoit 422 au lieu de la réponse d'une
+autre création. Les données analysées sont comparées, pas le corps brut : la
+frontière multipart change d'un envoi à l'autre.
+"""
+import hashlib
+import json
+import logging
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework import status
+from rest_framework.response import Response
+
+from .redis_client import REDIS_ERRORS, get_redis
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+IN_PROGRESS = 'in_progress'
+
+
+def _redis_key(request, key):
+    user = request.user.pk if request.user and request.user.is_authenticated else 'anon'
+    return f"idempotency:{user}:{request.path}:{key}"
+
+
+def _value(value):
+    if hasattr(value, 'chunks'):  # fichier téléversé
+        content = hashlib.sha256()
+        for chunk in value.chunks():
+            content.update(chunk)
+        value.seek(0)
+        return [value.name, value.size, content.hexdigest()]
+    return value
+
+
+def _fingerprint(request):
+    """Empreinte (hex) de la méthode, du chemin et des données de ``request``."""
+    data = request.data
+    if hasattr(data, 'lists'):  # formulaire (multipart / urlencoded)
+        data = {key: [_value(value) for value in values] for key, values in data.lists()}
+    body = json.dumps([request.method, request.path, data], sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _mismatch():
+    return Response(
+        {"detail": "Cette clé d'idempotence a déjà servi pour une requête différente."},
+        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+    )
+
+
+def _release(redis_key):
+    try:
+        get_redis().delete(redis_key)
+    except REDIS_ERRORS:
+        pass  # expirera seule (IDEMPOTENCY_LOCK_TTL)
+
+
+def idempotent(method):
+    """Décorateur de méthode de vue DRF (``post`` / ``create``) honorant ``Idempotency-Key``."""
+
+    @wraps(method)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER, '').strip()
+        if not key:
+            return method(view, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({HEADER: [f"{MAX_KEY_LENGTH} caractères au plus."]},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        redis_key = _redis_key(request, key)
+        fingerprint = _fingerprint(request)
+        lock_ttl = int(getattr(settings, 'IDEMPOTENCY_LOCK_TTL', 60))
+        try:
+            redis = get_redis()
+            claimed = redis.set(redis_key, f"{IN_PROGRESS}:{fingerprint}", nx=True, ex=lock_ttl)
+            stored = None if claimed else redis.get(redis_key)
+        except REDIS_ERRORS as exc:
+            logger.warning("idempotence indisponible (Redis) pour %s: %s", request.path, exc)
+            return method(view, request, *args, **kwargs)
+
+        if not claimed:
+            stored = stored.decode() if isinstance(stored, bytes) else stored
+            if stored is None or stored.startswith(IN_PROGRESS):
+                if stored not in (None, IN_PROGRESS, f"{IN_PROGRESS}:{fingerprint}"):
+                    return _mismatch()
+                response = Response(
+                    {"detail": "Une requête avec cette clé d'idempotence est en cours."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+                response['Retry-After'] = '1'
+                return response
+            saved = json.loads(stored)
+            if saved.get('fingerprint') != fingerprint:
+                return _mismatch()
+            response = Response(saved['data'], status=saved['status'])
+            response[REPLAYED_HEADER] = 'true'
+            return response
+
+        try:
+            response = method(view, request, *args, **kwargs)
+        except Exception:
+            _release(redis_key)
+            raise
+        if not status.is_success(response.status_code):
+            _release(redis_key)
+            return response
+        try:
+            payload = json.dumps({'status': response.status_code, 'data': response.data,
+                                  'fingerprint': fingerprint}, cls=DjangoJSONEncoder)
+            get_redis().set(redis_key, payload, ex=int(getattr(settings, 'IDEMPOTENCY_TTL', 24 * 3600)))
+        except REDIS_ERRORS as exc:
+            logger.warning("réponse idempotente non conservée pour %s: %s", request.path, exc)
+        return response
+
+    return wrapper
@@ -0,0 +1,254 @@
+"""Ingestion par étapes des incidents déclarés (POST /incident/).
+
+La requête ne fait plus que valider et enregistrer l'incident avec ses clés
+de médias, puis répond 201. Le reste s'exécute en tâche de fond, étape par
+étape (chaîne Celery, une tâche par étape), avec un statut par étape dans
+``IncidentIngestion`` :
+
+- ``zone`` : création de la ``Zone`` nommée si elle n'existe pas ;
+- ``points`` : +1 point au déclarant (UPDATE ``F()``, une seule fois) ;
+- ``analysis`` : ``Prediction`` 'pending' + analyse IA (file 'analysis') ;
+- ``thumbnail`` : miniature de la photo (différée de ``Incident.save``) ;
+- ``video`` : transcodage H.264/MP4 des vidéos dans un autre format.
+
+Les étapes légères passent sur la file par défaut, les étapes médias sur
+'media' : un transcodage ne retarde pas les étapes des autres incidents. Une
+étape déjà traitée n'est jamais rejouée ; une étape en échec n'interrompt pas
+la chaîne. ``resume_stalled`` relance les ingestions restées en attente
+(broker indisponible à la déclaration, worker perdu).
+"""
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import Incident, IncidentIngestion, Prediction, PredictionStatus, User, Zone
+
+logger = logging.getLogger(__name__)
+
+ZONE, POINTS, ANALYSIS, THUMBNAIL, VIDEO = 'zone', 'points', 'analysis', 'thumbnail', 'video'
+# Ordre de la chaîne : les étapes rapides d'abord, l'analyse n'attend pas les médias.
+STAGES = (ZONE, POINTS, ANALYSIS, THUMBNAIL, VIDEO)
+MEDIA_STAGES = frozenset({THUMBNAIL, VIDEO})
+
+PENDING, DONE, SKIPPED, FAILED = 'pending', 'done', 'skipped', 'failed'
+
+# Vidéos déjà lisibles partout : pas de transcodage.
+PLAYABLE_VIDEO_EXTENSIONS = ('.mp4',)
+
+_local = threading.local()
+
+
+@contextmanager
+def deferred_thumbnails():
+    """Dans ce bloc, ``Incident.save`` ne génère pas la miniature (étape ``thumbnail``)."""
+    previous = getattr(_local, 'defer_thumbnails', False)
+    _local.defer_thumbnails = True
+    try:
+        yield
+    finally:
+        _local.defer_thumbnails = previous
+
+
+def thumbnails_deferred():
+    return getattr(_local, 'defer_thumbnails', False)
+
+
+def stage_queue(stage):
+    return 'media' if stage in MEDIA_STAGES else 'celery'
+
+
+def start(incident):
+    """Crée le suivi (toutes les étapes 'pending') et lance la chaîne après le commit."""
+    ingestion = IncidentIngestion.objects.create(
+        incident=incident, stages={stage: PENDING for stage in STAGES},
+    )
+    transaction.on_commit(partial(launch, incident.pk))
+    return ingestion
+
+
+def launch(incident_id, stages=STAGES):
+    """Envoie la chaîne des étapes ``stages`` ; un broker indisponible laisse
+    l'ingestion en attente (reprise par ``resume_stalled``)."""
+    from celery import chain
+    from ..tasks import run_ingestion_stage
+
+    signatures = [
+        run_ingestion_stage.si(str(incident_id), stage).set(queue=stage_queue(stage))
+        for stage in stages
+    ]
+    try:
+        chain(*signatures).apply_async()
+    except Exception as exc:  # broker indisponible, etc.
+        logger.warning("ingestion de l'incident %s non planifiée: %s", incident_id, exc)
+
+
+def _resolve_zone(incident):
+    Zone.objects.get_or_create(
+        name=incident.zone,
+        defaults={'lattitude': incident.lattitude or '', 'longitude': incident.longitude or ''},
+    )
+    return DONE
+
+
+def _award_points(incident):
+    if not incident.user_id_id:
+        return SKIPPED
+    User.objects.filter(pk=incident.user_id_id).update(points=F('points') + 1)
+    return DONE
+
+
+def _schedule_analysis(incident):
+    from ..tasks import analyze_incident_with_model_task
+
+    prediction, _ = Prediction.objects.get_or_create(
+        incident=incident, defaults={'status': PredictionStatus.PENDING},
+    )
+    if not incident.photo:
+        prediction.status = PredictionStatus.FAILED
+        prediction.error_message = "Incident has no photo."
+        prediction.save(update_fields=['status', 'error_message', 'updated_at'])
+        return SKIPPED
+    transaction.on_commit(partial(analyze_incident_with_model_task.delay, prediction.pk))
+    return DONE
+
+
+def _generate_thumbnail(incident):
+    if not incident.photo:
+        return SKIPPED
+    if not incident.thumbnail:
+        incident._generate_thumbnail()
+        if not incident.thumbnail:
+            raise RuntimeError("génération de la miniature impossible")
+        # UPDATE ciblé : pas de post_save (marqueurs, WebSocket) pour une miniature.
+        Incident.objects.filter(pk=incident.pk).update(thumbnail=incident.thumbnail.name)
+    return DONE
+
+
+def _transcode_video(incident):
+    name = incident.video.name if incident.video else ''
+    if not name or os.path.splitext(name)[1].lower() in PLAYABLE_VIDEO_EXTENSIONS:
+        return SKIPPED
+    storage = incident.video.storage
+    timeout = int(getattr(settings, 'VIDEO_TRANSCODE_TIMEOUT', 600))
+    with tempfile.TemporaryDirectory() as workdir:
+        source = os.path.join(workdir, os.path.basename(name))
+        with storage.open(name, 'rb') as remote, open(source, 'wb') as local:
+            shutil.copyfileobj(remote, local)
+        target = os.path.splitext(source)[0] + '.mp4'
+        subprocess.run(
+            ['ffmpeg', '-y', '-loglevel', 'error', '-i', source, '-vcodec', 'h264', target],
+            check=True, timeout=timeout,
+        )
+        with open(target, 'rb') as converted:
+            new_name = storage.save(os.path.splitext(name)[0] + '.mp4', File(converted))
+    Incident.objects.filter(pk=incident.pk).update(video=new_name)
+    try:
+        storage.delete(name)
+    except Exception as exc:  # l'original restera orphelin (cf. storage_sweeper)
+        logger.warning("ingestion: vidéo d'origine %s non supprimée: %s", name, exc)
+    return DONE
+
+
+HANDLERS = {
+    ZONE: _resolve_zone,
+    POINTS: _award_points,
+    ANALYSIS: _schedule_analysis,
+    THUMBNAIL: _generate_thumbnail,
+    VIDEO: _transcode_video,
+}
+
+
+def _store(ingestion, stage, status, error=''):
+    ingestion.stages[stage] = status
+    if error:
+        ingestion.errors[stage] = error[:1000]
+    else:
+        ingestion.errors.pop(stage, None)
+    if PENDING not in ingestion.stages.values():
+        ingestion.completed_at = timezone.now()
+    ingestion.save(update_fields=['stages', 'errors', 'completed_at', 'updated_at'])
+
+
+def _locked(incident_id):
+    return (IncidentIngestion.objects.select_for_update()
+            .filter(incident_id=incident_id).first())
+
+
+def run_stage(incident_id, stage):
+    """Exécute l'étape ``stage`` de l'incident si elle est encore en attente.
+
+    Les étapes en base seule (zone, points, analyse) s'exécutent sous le verrou
+    de la ligne de suivi, dans la même transaction que leur statut : une étape
+    n'est jamais appliquée deux fois. Les étapes médias (longues) s'exécutent
+    hors transaction ; seul leur statut est écrit sous verrou.
+    Retourne le statut de l'étape (None si l'incident n'a pas de suivi).
+    """
+    incident = Incident.objects.filter(pk=incident_id).first()
+    if incident is None:
+        return None
+    handler = HANDLERS[stage]
+    if stage not in MEDIA_STAGES:
+        try:
+            with transaction.atomic():
+                ingestion = _locked(incident_id)
+                if ingestion is None or ingestion.stages.get(stage) != PENDING:
+                    return ingestion and ingestion.stages.get(stage)
+                _store(ingestion, stage, handler(incident))
+                return ingestion.stages[stage]
+        except Exception as exc:  # noqa: BLE001 — l'étape échoue, la chaîne continue
+            return _fail(incident_id, stage, exc)
+
+    ingestion = IncidentIngestion.objects.filter(incident_id=incident_id).first()
+    if ingestion is None or ingestion.stages.get(stage) != PENDING:
+        return ingestion and ingestion.stages.get(stage)
+    try:
+        status = handler(incident)
+    except Exception as exc:  # noqa: BLE001
+        return _fail(incident_id, stage, exc)
+    with transaction.atomic():
+        ingestion = _locked(incident_id)
+        if ingestion is not None and ingestion.stages.get(stage) == PENDING:
+            _store(ingestion, stage, status)
+    return status
+
+
+def _fail(incident_id, stage, exc):
+    logger.warning("ingestion de l'incident %s: étape %s en échec: %s", incident_id, stage, exc)
+    with transaction.atomic():
+        ingestion = _locked(incident_id)
+        if ingestion is not None and ingestion.stages.get(stage) == PENDING:
+            _store(ingestion, stage, FAILED, str(exc) or exc.__class__.__name__)
+    return FAILED
+
+
+def resume_stalled(older_than=None):
+    """Relance les étapes en attente des ingestions inactives depuis
+    ``INGESTION_RESUME_AFTER`` secondes. Retourne le nombre d'ingestions relancées."""
+    older_than = older_than or timedelta(seconds=int(getattr(settings, 'INGESTION_RESUME_AFTER', 1800)))
+    now = timezone.now()
+    stalled = list(
+        IncidentIngestion.objects
+        .filter(completed_at__isnull=True, updated_at__lt=now - older_than)
+        .values_list('pk', 'incident_id', 'stages')[:500]
+    )
+    if not stalled:
+        return 0
+    # Repousse le prochain passage : une chaîne relancée n'est pas relancée à nouveau.
+    IncidentIngestion.objects.filter(pk__in=[pk for pk, _, _ in stalled]).update(updated_at=now)
+    for _, incident_id, stages in stalled:
+        pending = [stage for stage in STAGES if stages.get(stage) == PENDING]
+        if pending:
+            launch(incident_id, pending)
+    return len(stalled)
@@ -0,0 +1,265 @@
+"""Envoi d'emails par lots (outbox) et résumés périodiques.
+
+Les emails de notification ne partent plus un par un depuis la requête : ils
+sont enregistrés dans ``OutboundEmail`` puis envoyés par la tâche
+``flush_email_outbox``, déclenchée au plus une fois par fenêtre
+``EMAIL_BATCH_WINDOW`` (secondes). Un lot est trié par template/sujet, chaque
+template n'est rendu qu'une fois par contexte distinct, et tous les messages
+du lot passent par une seule connexion SMTP. Chaque email garde son statut ;
+un échec est réessayé avec backoff exponentiel (``EMAIL_MAX_ATTEMPTS``).
+
+Le contexte d'un email est stocké en JSON : les dates y sont écrites telles
+que le template les aurait affichées (``{{ date }}``), et non en ISO 8601.
+
+Les catégories à fort volume (``EMAIL_DIGEST_CATEGORIES``) respectent la
+préférence ``User.email_digest`` : les emails sont alors mis de côté et
+regroupés en un seul résumé horaire ou quotidien par destinataire.
+"""
+import datetime
+import json
+import logging
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import formats, timezone
+from django.utils.html import strip_tags
+
+from ..models import (
+    OutboundEmail, EMAIL_DIGEST, EMAIL_DIGESTED, EMAIL_DIGEST_NONE, EMAIL_DIGEST_CHOICES,
+    EMAIL_FAILED, EMAIL_PENDING, EMAIL_SENDING, EMAIL_SENT,
+)
+from .redis_client import REDIS_ERRORS, get_redis
+
+logger = logging.getLogger(__name__)
+
+DIGEST_TEMPLATE = 'emails/digest.html'
+FLUSH_LOCK_KEY = 'mail:flush:scheduled'
+
+
+def _from_email():
+    return settings.DEFAULT_FROM_EMAIL or 'Map Action <contact@map-action.com>'
+
+
+def _storable(value):
+    """``value`` (contexte de template) avec ses dates formatées comme au rendu."""
+    if isinstance(value, dict):
+        return {key: _storable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_storable(item) for item in value]
+    if isinstance(value, (datetime.date, datetime.time)):
+        return formats.localize(timezone.template_localtime(value))
+    return value
+
+
+def _digest_categories():
+    return set(getattr(settings, 'EMAIL_DIGEST_CATEGORIES', ('collaboration_request', 'deadline_warning')))
+
+
+def queue_emails(subject, template_name, context, recipients, category='', summary=''):
+    """Met en file le même email pour ``recipients`` (Users ou adresses).
+    Point d'entrée unique des emails envoyés depuis les vues : aucun envoi
+    SMTP n'a lieu pendant la requête.
+
+    Une seule requête INSERT ; l'envoi est déclenché après le commit. Retourne
+    les ``OutboundEmail`` créés (y compris ceux réservés à un résumé).
+    """
+    messages, seen = [], set()
+    for recipient in recipients:
+        address = _address(recipient)
+        if not address or address in seen:
+            continue
+        seen.add(address)
+        messages.append({'recipient': recipient, 'subject': subject, 'template_name': template_name,
+                         'context': context, 'category': category, 'summary': summary})
+    return queue_email_batch(messages)
+
+
+def queue_email_batch(messages):
+    """Met en file des emails distincts (sujet / contexte propres à chacun) en
+    un seul INSERT. ``messages`` : dicts ``{'recipient', 'subject',
+    'template_name', 'context', 'category', 'summary'}`` (les deux derniers
+    optionnels). Retourne les ``OutboundEmail`` créés."""
+    digest_categories = _digest_categories()
+    rows = []
+    for message in messages:
+        recipient = message['recipient']
+        address = _address(recipient)
+        if not address:
+            continue
+        category = message.get('category', '')
+        subject = message['subject']
+        digest = EMAIL_DIGEST_NONE
+        if category in digest_categories:
+            digest = getattr(recipient, 'email_digest', EMAIL_DIGEST_NONE) or EMAIL_DIGEST_NONE
+        rows.append(OutboundEmail(
+            to_email=address, subject=subject[:255], template_name=message['template_name'],
+            context=_storable(message.get('context') or {}), category=category,
+            summary=(message.get('summary') or subject)[:255],
+            status=EMAIL_DIGEST if digest else EMAIL_PENDING, digest=digest,
+        ))
+    if not rows:
+        return []
+    emails = OutboundEmail.objects.bulk_create(rows)
+    if any(email.status == EMAIL_PENDING for email in emails):
+        transaction.on_commit(schedule_flush)
+    return emails
+
+
+def _address(recipient):
+    return recipient if isinstance(recipient, str) else getattr(recipient, 'email', None)
+
+
+def schedule_flush():
+    """Programme ``flush_email_outbox`` à la fin de la fenêtre de regroupement.
+
+    Le verrou Redis (SET NX + expiration) évite d'empiler une tâche par email ;
+    sans Redis, chaque appel programme sa tâche (les lots restent corrects :
+    les emails sont réservés en SKIP LOCKED).
+    """
+    from ..tasks import flush_email_outbox
+
+    window = int(getattr(settings, 'EMAIL_BATCH_WINDOW', 10))
+    try:
+        if not get_redis().set(FLUSH_LOCK_KEY, 1, nx=True, ex=max(window, 1)):
+            return
+    except REDIS_ERRORS:
+        logger.warning("Redis indisponible : flush de l'outbox programmé sans verrou.")
+    flush_email_outbox.apply_async(countdown=window)
+
+
+def _backoff(attempts):
+    """Délai avant la tentative suivante : base × 2^(tentatives-1), plafonné."""
+    base = int(getattr(settings, 'EMAIL_RETRY_BASE_DELAY', 60))
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), 6 * 3600))
+
+
+def _claim(limit):
+    """Réserve au plus ``limit`` emails dus (SKIP LOCKED) et les passe en
+    ``sending`` pour la durée d'un bail ; un worker tombé en cours d'envoi
+    libère ainsi ses emails à l'expiration du bail."""
+    now = timezone.now()
+    lease = timedelta(seconds=int(getattr(settings, 'EMAIL_SENDING_LEASE', 600)))
+    due = (Q(status=EMAIL_PENDING, next_attempt_at__isnull=True)
+           | Q(status__in=[EMAIL_PENDING, EMAIL_SENDING], next_attempt_at__lte=now))
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(due).order_by('created_at').values_list('id', flat=True)[:limit]
+        )
+        OutboundEmail.objects.filter(id__in=ids).update(
+            status=EMAIL_SENDING, next_attempt_at=now + lease, attempts=F('attempts') + 1)
+    return list(OutboundEmail.objects.filter(id__in=ids).order_by('template_name', 'subject', 'created_at'))
+
+
+def _record_failures(emails, errors):
+    """Replanifie (backoff) ou abandonne (``failed``) les emails en échec."""
+    max_attempts = int(getattr(settings, 'EMAIL_MAX_ATTEMPTS', 5))
+    now = timezone.now()
+    retrying = 0
+    for email in emails:
+        if email.id not in errors:
+            continue
+        if email.attempts < max_attempts:
+            retrying += 1
+            changes = {'status': EMAIL_PENDING, 'next_attempt_at': now + _backoff(email.attempts)}
+        else:
+            changes = {'status': EMAIL_FAILED, 'next_attempt_at': None}
+        OutboundEmail.objects.filter(id=email.id).update(last_error=errors[email.id], **changes)
+    return retrying
+
+
+def _render_key(email):
+    return email.template_name, json.dumps(email.context, sort_keys=True, cls=DjangoJSONEncoder)
+
+
+def deliver_pending(limit=None):
+    """Envoie un lot d'emails dus. Retourne ``{'sent', 'failed', 'retrying'}``."""
+    limit = limit or int(getattr(settings, 'EMAIL_BATCH_SIZE', 200))
+    emails = _claim(limit)
+    if not emails:
+        return {'sent': 0, 'failed': 0, 'retrying': 0}
+
+    rendered, sent, errors = {}, [], {}
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        # Serveur SMTP injoignable : tout le lot est replanifié.
+        logger.error(f"Connexion SMTP impossible, {len(emails)} emails replanifiés: {e}")
+        retrying = _record_failures(emails, {email.id: str(e) for email in emails})
+        return {'sent': 0, 'failed': len(emails) - retrying, 'retrying': retrying}
+    try:
+        for email in emails:
+            key = _render_key(email)
+            try:
+                if key not in rendered:
+                    html_content = render_to_string(email.template_name, email.context)
+                    rendered[key] = (strip_tags(html_content), html_content)
+                text_content, html_content = rendered[key]
+                msg = EmailMultiAlternatives(email.subject, text_content, _from_email(),
+                                             [email.to_email], connection=connection)
+                msg.attach_alternative(html_content, "text/html")
+                msg.send()
+                sent.append(email.id)
+            except Exception as e:
+                logger.error(f"Erreur lors de l'envoi de l'email {email.id} à {email.to_email}: {e}")
+                errors[email.id] = str(e)
+    finally:
+        connection.close()
+
+    OutboundEmail.objects.filter(id__in=sent).update(
+        status=EMAIL_SENT, sent_at=timezone.now(), next_attempt_at=None, last_error='')
+    retrying = _record_failures(emails, errors)
+    failed = len(errors) - retrying
+    logger.info(f"Lot d'emails : {len(sent)} envoyés, {retrying} replanifiés, {failed} en échec, "
+                f"{len(rendered)} rendus de template.")
+    return {'sent': len(sent), 'failed': failed, 'retrying': retrying}
+
+
+def retry_failed(queryset):
+    """Remet en file des emails abandonnés (action d'administration)."""
+    return queryset.filter(status=EMAIL_FAILED).update(
+        status=EMAIL_PENDING, attempts=0, next_attempt_at=None)
+
+
+def build_digests(frequency):
+    """Regroupe les emails ``digest`` de ``frequency`` en un résumé par destinataire.
+
+    Les résumés sont mis en file (``pending``) ; les emails d'origine passent
+    en ``digested``. Retourne le nombre de résumés créés.
+    """
+    labels = dict(EMAIL_DIGEST_CHOICES)
+    with transaction.atomic():
+        entries = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=EMAIL_DIGEST, digest=frequency)
+            .order_by('to_email', 'created_at')
+        )
+        if not entries:
+            return 0
+        digests = []
+        for to_email, items in groupby(entries, key=lambda e: e.to_email):
+            items = list(items)
+            digests.append(OutboundEmail(
+                to_email=to_email,
+                subject=f"Map Action : {len(items)} notification(s) en attente",
+                template_name=DIGEST_TEMPLATE,
+                context=_storable({
+                    'period': labels.get(frequency, frequency),
+                    'items': [
+                        {'subject': e.subject, 'summary': e.summary, 'created_at': e.created_at}
+                        for e in items
+                    ],
+                }),
+                category='digest',
+            ))
+        OutboundEmail.objects.bulk_create(digests)
+        OutboundEmail.objects.filter(id__in=[e.id for e in entries]).update(
+            status=EMAIL_DIGESTED, sent_at=timezone.now())
+    return len(digests)
@@ -0,0 +1,104 @@
+"""Flux temps réel des marqueurs de la carte (/ws/map/).
+
+La carte du dashboard charge ``/incident-filter/`` une fois, puis applique des
+deltas compacts poussés à chaque sauvegarde d'incident :
+
+- ``marker_created`` / ``marker_updated`` : id, titre, coordonnées, etat, severity
+  (mêmes noms de champs qu'``IncidentMapSerializer``) ; ``updated`` vaut upsert ;
+- ``marker_deleted`` : id seul (suppression définitive ou mise en corbeille).
+
+Le filtrage par viewport / scope est fait côté consumer (cf. ``MarkerFilter``).
+"""
+from ..models import IN_VALIDATION, RESOLVED, RESOLVED_DEFINITIVE
+from .broadcast import ws_broadcast
+
+MAP_GROUP = 'incident_map'
+
+MARKER_CREATED = 'marker_created'
+MARKER_UPDATED = 'marker_updated'
+MARKER_DELETED = 'marker_deleted'
+
+# Champs dont la modification change le rendu d'un marqueur.
+MARKER_FIELDS = frozenset({'title', 'lattitude', 'longitude', 'etat', 'severity', 'is_deleted'})
+
+# Même découpage que le paramètre ``scope`` de /incident-filter/.
+RESOLVED_STATES = (RESOLVED, RESOLVED_DEFINITIVE, IN_VALIDATION)
+SCOPES = {
+    'all': 'all', 'tous': 'all',
+    'resolved': 'resolved', 'resolu': 'resolved', 'résolu': 'resolved',
+    'unresolved': 'unresolved', 'non_resolu': 'unresolved',
+    'non-resolu': 'unresolved', 'active': 'unresolved',
+}
+
+
+def _coord(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def marker_payload(incident, event):
+    if event == MARKER_DELETED:
+        return {'event': MARKER_DELETED, 'id': incident.pk}
+    return {
+        'event': event,
+        'id': incident.pk,
+        'title': incident.title,
+        'lattitude': incident.lattitude,
+        'longitude': incident.longitude,
+        'etat': incident.etat,
+        'severity': incident.severity,
+    }
+
+
+def push_marker(incident, created=False, deleted=False, update_fields=None):
+    """Diffuse le delta de marqueur d'un incident sauvegardé / supprimé."""
+    if update_fields is not None and not MARKER_FIELDS.intersection(update_fields):
+        return  # sauvegarde sans effet sur la carte (progress, drapeaux…)
+    if deleted or incident.is_deleted:
+        event = MARKER_DELETED
+    else:
+        event = MARKER_CREATED if created else MARKER_UPDATED
+    ws_broadcast(MAP_GROUP, marker_payload(incident, event))
+
+
+class MarkerFilter:
+    """Filtre d'abonnement d'un client carte : viewport (bbox) et scope."""
+
+    def __init__(self, bbox=None, scope='all'):
+        self.bbox = None
+        if bbox is not None:
+            west, south, east, north = (float(v) for v in bbox)
+            self.bbox = (west, south, east, north)
+        self.scope = SCOPES.get(str(scope or 'all').lower())
+        if self.scope is None:
+            raise ValueError(f"scope inconnu : {scope}")
+
+    def matches(self, payload):
+        etat = payload.get('etat')
+        if self.scope == 'resolved' and etat not in RESOLVED_STATES:
+            return False
+        if self.scope == 'unresolved' and etat in RESOLVED_STATES:
+            return False
+        if self.bbox is None:
+            return True
+        lat, lng = _coord(payload.get('lattitude')), _coord(payload.get('longitude'))
+        if lat is None or lng is None:
+            return False
+        west, south, east, north = self.bbox
+        in_lng = west <= lng <= east if west <= east else (lng >= west or lng <= east)
+        return south <= lat <= north and in_lng
+
+    def apply(self, payload):
+        """Delta à transmettre au client, ou None.
+
+        Une mise à jour qui fait sortir un marqueur du filtre (passage en résolu,
+        déplacement hors viewport) devient un ``marker_deleted`` côté client.
+        """
+        event = payload.get('event')
+        if event == MARKER_DELETED or self.matches(payload):
+            return payload
+        if event == MARKER_UPDATED:
+            return {'event': MARKER_DELETED, 'id': payload.get('id'), 'reason': 'out_of_filter'}
+        return None
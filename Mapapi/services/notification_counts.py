@@ -0,0 +1,67 @@
+"""Compteurs lu / non-lu des notifications (badge), sans COUNT à la lecture.
+
+``NotificationCounter`` est tenu à jour par incréments atomiques (F()) :
+création / suppression de notification (signaux), ``partial_update`` et
+``mark_all_read`` (vues), fan-out groupé (bulk_create). Chaque variation est
+poussée sur ``/ws/notifications/`` (événement ``notification_counts``).
+
+Une ligne absente n'est jamais incrémentée : elle est calculée entièrement à la
+première lecture, ce qui inclut toutes les notifications déjà écrites.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+
+from ..models import Notification, NotificationCounter
+from .broadcast import ws_broadcast
+
+COUNTS_EVENT = 'notification_counts'
+
+
+def _as_dict(unread, total):
+    return {'unread_count': unread, 'read_count': total - unread, 'total_count': total}
+
+
+def recompute_counts(user_id):
+    """Recalcule (une requête d'agrégat) et enregistre les compteurs d'un utilisateur."""
+    agg = Notification.objects.filter(user_id=user_id).aggregate(
+        total=Count('id'), unread=Count('id', filter=Q(read=False)))
+    NotificationCounter.objects.update_or_create(
+        user_id=user_id,
+        defaults={'unread_count': agg['unread'], 'total_count': agg['total']},
+    )
+    return _as_dict(agg['unread'], agg['total'])
+
+
+def get_counts(user_id):
+    """Compteurs {unread_count, read_count, total_count} — une lecture de clé primaire."""
+    counter = NotificationCounter.objects.filter(user_id=user_id).first()
+    if counter is None:
+        try:
+            with transaction.atomic():
+                return recompute_counts(user_id)
+        except IntegrityError:  # créée en parallèle
+            counter = NotificationCounter.objects.get(user_id=user_id)
+    return _as_dict(counter.unread_count, counter.total_count)
+
+
+def push_counts(user_ids):
+    """Diffuse les compteurs courants aux utilisateurs (une requête pour tous)."""
+    rows = NotificationCounter.objects.filter(user_id__in=set(user_ids)).values_list(
+        'user_id', 'unread_count', 'total_count')
+    for user_id, unread, total in rows:
+        ws_broadcast(f"notifications_{user_id}", {
+            'event': COUNTS_EVENT, 'id': user_id, **_as_dict(unread, total)})
+
+
+def apply_delta(user_ids, unread=0, total=0, push=True):
+    """Applique la même variation aux compteurs existants de ``user_ids``."""
+    user_ids = list(user_ids)
+    if not user_ids or (not unread and not total):
+        return
+    NotificationCounter.objects.filter(user_id__in=user_ids).update(
+        unread_count=Greatest(F('unread_count') + unread, 0),
+        total_count=Greatest(F('total_count') + total, 0),
+    )
+    if push:
+        push_counts(user_ids)
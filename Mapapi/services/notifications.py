@@ -0,0 +1,92 @@
+"""Fan-out de notifications en nombre constant de requêtes.
+
+``notify_users`` crée les notifications d'un ensemble de destinataires en un
+seul ``bulk_create``, met à jour leurs compteurs (NotificationCounter) en une
+requête, pousse les événements WebSocket dans un seul flush groupé et met les
+emails dans l'outbox en un seul INSERT (envoi par lots, cf. ``mail.py``).
+``bulk_create`` ne déclenchant pas ``post_save``, le service fait lui-même ce
+que font les signaux pour une création unitaire.
+"""
+from collections import Counter
+
+from django.db import transaction
+
+from ..models import Notification
+from .broadcast import broadcast_buffer, ws_broadcast
+from .mail import queue_email_batch, queue_emails
+from .notification_counts import apply_delta, push_counts
+
+
+def notification_payload(notification):
+    """Payload WebSocket d'une notification (groupe ``notifications_<user_id>``)."""
+    return {
+        'event': 'notification',
+        'id': notification.id,
+        'type': notification.notif_type,            # catégorie (collaboration_request, …)
+        'title': notification.title,                # libellé FR prêt à afficher
+        'message': notification.message,
+        'incident_title': getattr(getattr(notification, 'incident', None), 'title', None),
+        'read': notification.read,
+        'colaboration': notification.colaboration_id,
+        'incident': notification.incident_id,
+        'link': notification.redirect_link(),  # cible de redirection au clic
+        'created_at': notification.created_at.isoformat() if notification.created_at else None,
+    }
+
+
+def notify_users(users, notif_type, message, incident=None, colaboration=None, email=None):
+    """Notifie ``users`` (même type, même message) et retourne les notifications.
+
+    ``email`` (optionnel) : ``{'subject', 'template_name', 'context'}`` envoyé
+    aux destinataires qui ont une adresse, via l'outbox ; le type de
+    notification sert de catégorie (résumés horaires/quotidiens).
+    """
+    recipients = list({user.pk: user for user in users if user is not None}.values())
+    if not recipients:
+        return []
+    message = message[:255]
+    # Tout ou rien : si la mise en file de l'email échoue, les notifications
+    # sont annulées et les diffusions (on_commit) abandonnées.
+    with transaction.atomic(), broadcast_buffer():
+        notifications = Notification.objects.bulk_create([
+            Notification(user=user, notif_type=notif_type, message=message,
+                         incident=incident, colaboration=colaboration)
+            for user in recipients
+        ])
+        apply_delta([user.pk for user in recipients], unread=1, total=1)
+        for notification in notifications:
+            ws_broadcast(f"notifications_{notification.user_id}", notification_payload(notification))
+        if email:
+            queue_emails(email['subject'], email['template_name'], email['context'], recipients,
+                         category=notif_type, summary=message)
+    return notifications
+
+
+def notify_each(notif_type, items):
+    """Variante de ``notify_users`` où chaque notification a son propre message :
+    ``items`` = ``[(user, message, incident, email), ...]`` (``email`` comme pour
+    ``notify_users``, ou None). Même nombre constant de requêtes : un INSERT de
+    notifications, une mise à jour des compteurs par multiplicité, un INSERT
+    d'emails. Retourne les notifications créées."""
+    items = [item for item in items if item[0] is not None]
+    if not items:
+        return []
+    with transaction.atomic(), broadcast_buffer():
+        notifications = Notification.objects.bulk_create([
+            Notification(user=user, notif_type=notif_type, message=message[:255], incident=incident)
+            for user, message, incident, _ in items
+        ])
+        # Un même utilisateur peut recevoir plusieurs notifications du lot.
+        by_count = {}
+        for user_id, count in Counter(user.pk for user, *_ in items).items():
+            by_count.setdefault(count, []).append(user_id)
+        for count, user_ids in by_count.items():
+            apply_delta(user_ids, unread=count, total=count, push=False)
+        push_counts([user.pk for user, *_ in items])
+        for notification in notifications:
+            ws_broadcast(f"notifications_{notification.user_id}", notification_payload(notification))
+        queue_email_batch([
+            {'recipient': user, 'category': notif_type, 'summary': message[:255], **email}
+            for user, message, _, email in items if email
+        ])
+    return notifications
@@ -0,0 +1,182 @@
+"""Synchronisation par lot des saisies hors ligne (application mobile).
+
+Un agent collecte incidents et rapports de terrain hors connexion puis envoie
+un seul paquet zip : ``manifest.json`` + fichiers médias ::
+
+    {"incidents": [{"id": "<uuid client>", "title": ..., "zone": ...,
+                    "photo": "media/1.jpg", "video": ..., "audio": ...}],
+     "field_reports": [{"id": "<uuid client>", "incident": "<uuid>",
+                        "notes": ..., "photo": "media/2.jpg", ...}]}
+
+Les champs médias référencent un fichier du zip. L'UUID généré par le client
+devient la clé primaire : un élément déjà synchronisé (paquet renvoyé après
+une coupure) est signalé 'duplicate' sans rien réécrire ni re-téléverser.
+Chaque élément est appliqué dans sa propre transaction ; le résultat est
+donné élément par élément ('created', 'duplicate' ou 'error' + erreurs). Les
+incidents créés suivent la même ingestion que ``POST /incident/`` (zone,
+points, analyse, miniature, vidéo en tâche de fond).
+"""
+import json
+import os
+import uuid
+import zipfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from ..models import ASSIGNMENT_REPORTED, ORG_ROLE_FIELD, FieldReport, Incident, IncidentAssignment
+from .ingestion import deferred_thumbnails, start as start_ingestion
+
+MANIFEST = 'manifest.json'
+INCIDENT_MEDIA = ('photo', 'video', 'audio')
+FIELD_REPORT_MEDIA = ('photo',)
+
+CREATED, DUPLICATE, ERROR = 'created', 'duplicate', 'error'
+# Modèle et champ propriétaire de chaque type d'élément du manifeste.
+OWNERS = {'incident': (Incident, 'user_id'), 'field_report': (FieldReport, 'agent_id')}
+
+
+def _limit(name, default):
+    return int(getattr(settings, name, default))
+
+
+class Bundle:
+    """Paquet zip ouvert : manifeste + accès aux médias référencés."""
+
+    def __init__(self, fileobj):
+        try:
+            self.archive = zipfile.ZipFile(fileobj)
+        except (zipfile.BadZipFile, OSError):
+            raise serializers.ValidationError({'bundle': ["Archive zip invalide."]})
+        infos = self.archive.infolist()
+        # Bombe zip : la taille décompressée déclarée est bornée avant toute lecture.
+        if sum(info.file_size for info in infos) > _limit('SYNC_BUNDLE_MAX_UNCOMPRESSED', 200 * 1024 * 1024):
+            raise serializers.ValidationError({'bundle': ["Archive trop volumineuse une fois décompressée."]})
+        self.names = {info.filename for info in infos if not info.is_dir()}
+        if MANIFEST not in self.names:
+            raise serializers.ValidationError({'bundle': [f"{MANIFEST} manquant."]})
+        try:
+            manifest = json.loads(self.archive.read(MANIFEST))
+        except ValueError:
+            raise serializers.ValidationError({'bundle': [f"{MANIFEST} n'est pas un JSON valide."]})
+        if not isinstance(manifest, dict):
+            raise serializers.ValidationError({'bundle': [f"{MANIFEST} doit être un objet."]})
+        self.incidents = manifest.get('incidents') or []
+        self.field_reports = manifest.get('field_reports') or []
+        if not isinstance(self.incidents, list) or not isinstance(self.field_reports, list):
+            raise serializers.ValidationError({'bundle': ["'incidents' et 'field_reports' doivent être des listes."]})
+        if len(self.incidents) + len(self.field_reports) > _limit('SYNC_MAX_ITEMS', 100):
+            raise serializers.ValidationError(
+                {'bundle': [f"Au plus {_limit('SYNC_MAX_ITEMS', 100)} éléments par paquet."]})
+
+    def media(self, reference):
+        """Fichier téléversable pour la référence ``reference`` du manifeste."""
+        if reference not in self.names:
+            raise serializers.ValidationError(f"Fichier '{reference}' absent du paquet.")
+        try:
+            content = self.archive.read(reference)
+        except (zipfile.BadZipFile, OSError):
+            raise serializers.ValidationError(f"Fichier '{reference}' illisible dans le paquet.")
+        return SimpleUploadedFile(os.path.basename(reference), content)
+
+
+def _uuid(value):
+    try:
+        return uuid.UUID(str(value))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def _client_id(item):
+    return _uuid(item.get('id'))
+
+
+def _already_synced(kind, pk, user):
+    """Vrai si l'élément ``pk`` existe déjà pour ``user`` ; erreur s'il appartient à un autre."""
+    model, owner_field = OWNERS[kind]
+    owners = list(model.objects.filter(pk=pk).values_list(owner_field, flat=True)[:1])
+    if not owners:
+        return False
+    if owners[0] != user.pk:
+        raise serializers.ValidationError({'id': ["Identifiant déjà utilisé."]})
+    return True
+
+
+def _with_media(bundle, item, fields):
+    data = {key: value for key, value in item.items() if key != 'id'}
+    for field in fields:
+        if data.get(field):
+            data[field] = bundle.media(data[field])
+    return data
+
+
+def _sync_incident(bundle, item, user):
+    from ..serializer import IncidentSerializer
+
+    pk = _client_id(item)
+    if _already_synced('incident', pk, user):
+        return DUPLICATE
+    serializer = IncidentSerializer(data=_with_media(bundle, item, INCIDENT_MEDIA))
+    serializer.is_valid(raise_exception=True)
+    with deferred_thumbnails():
+        incident = serializer.save(id=pk, user_id=user)
+    start_ingestion(incident)
+    return CREATED
+
+
+def _sync_field_report(bundle, item, user):
+    from ..serializer import FieldReportSerializer
+
+    pk = _client_id(item)
+    if _already_synced('field_report', pk, user):
+        return DUPLICATE
+    if user.org_role != ORG_ROLE_FIELD:
+        raise serializers.ValidationError("Seuls les agents de terrain peuvent créer des rapports.")
+    incident_id = _uuid(item.get('incident') or item.get('incident_id'))
+    incident = Incident.objects.filter(pk=incident_id).first() if incident_id else None
+    assignments = IncidentAssignment.objects.filter(incident=incident, agent=user)
+    if incident is None or not assignments.exists():
+        raise serializers.ValidationError({'incident': ["Incident non trouvé ou non assigné."]})
+    serializer = FieldReportSerializer(data=_with_media(bundle, item, FIELD_REPORT_MEDIA))
+    serializer.is_valid(raise_exception=True)
+    serializer.save(id=pk, agent=user, incident=incident)
+    assignments.update(status=ASSIGNMENT_REPORTED)
+    return CREATED
+
+
+def _apply(kind, handler, bundle, item, user):
+    result = {'type': kind, 'id': str(item.get('id')) if isinstance(item, dict) else None}
+    if not isinstance(item, dict) or _client_id(item) is None:
+        result.update(status=ERROR, errors={'id': ["UUID client manquant ou invalide."]})
+        return result
+    try:
+        with transaction.atomic():
+            result['status'] = handler(bundle, item, user)
+    except serializers.ValidationError as exc:
+        result.update(status=ERROR, errors=exc.detail)
+    except IntegrityError:
+        # Doublon seulement si l'UUID vient d'être inséré pour ``user`` par un envoi
+        # concurrent du même paquet ; toute autre contrainte violée est une erreur.
+        try:
+            duplicate = _already_synced(kind, _client_id(item), user)
+        except serializers.ValidationError as exc:
+            result.update(status=ERROR, errors=exc.detail)
+            return result
+        if duplicate:
+            result['status'] = DUPLICATE
+        else:
+            result.update(status=ERROR, errors={'non_field_errors': ["Élément refusé par la base de données."]})
+    return result
+
+
+def sync_bundle(fileobj, user):
+    """Applique le paquet ``fileobj`` au nom de ``user``. Retourne la liste des
+    résultats par élément (incidents d'abord, puis rapports de terrain).
+    Lève ``serializers.ValidationError`` si le paquet lui-même est invalide."""
+    bundle = Bundle(fileobj)
+    results = [_apply('incident', _sync_incident, bundle, item, user) for item in bundle.incidents]
+    results += [_apply('field_report', _sync_field_report, bundle, item, user)
+                for item in bundle.field_reports]
+    return results
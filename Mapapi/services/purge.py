@@ -0,0 +1,119 @@
+"""Suppression définitive d'incidents par lots, avec nettoyage du stockage.
+
+Chaque lot est supprimé dans sa propre transaction courte : le ``Collector``
+de Django résout la cascade (prédictions, tâches, discussions, notifications,
+rapports terrain…) une fois par lot. Avant la suppression, les clés des
+fichiers de TOUTES les lignes supprimées (incident et lignes en cascade) sont
+relevées ; après le commit, elles sont retirées des buckets par appels groupés
+(``SupabaseStorage.delete_many``). Une suppression de fichier en échec est
+journalisée sans annuler la purge (l'objet reste orphelin dans le bucket).
+"""
+import logging
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models.deletion import Collector
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 50
+
+
+def _file_fields(model):
+    return [field for field in model._meta.concrete_fields if isinstance(field, models.FileField)]
+
+
+def _storage_key(storage):
+    return type(storage), getattr(storage, 'bucket_name', None)
+
+
+class StoredFiles:
+    """Clés de fichiers à supprimer, regroupées par stockage (bucket)."""
+
+    def __init__(self):
+        self._storages = {}
+        self._names = {}
+
+    def add(self, field, name):
+        if not name or name == field.get_default():
+            return  # fichier par défaut partagé (avatar…) : jamais supprimé
+        key = _storage_key(field.storage)
+        self._storages.setdefault(key, field.storage)
+        self._names.setdefault(key, set()).add(name)
+
+    def collect(self, collector):
+        """Relève les fichiers des lignes qu'un ``Collector`` va supprimer.
+
+        Les lignes chargées (``collector.data``) sont lues en mémoire ; les
+        suppressions rapides (``fast_deletes``, sans chargement) sont lues par
+        une requête ne ramenant que les colonnes de fichiers.
+        """
+        for model, instances in collector.data.items():
+            for field in _file_fields(model):
+                for instance in instances:
+                    # Clé (str) du fichier, pas le FieldFile : les clés sont triées à la suppression.
+                    self.add(field, getattr(instance, field.attname).name)
+        for queryset in collector.fast_deletes:
+            fields = _file_fields(queryset.model)
+            if not fields:
+                continue
+            for row in queryset.values_list(*(field.attname for field in fields)):
+                for field, name in zip(fields, row):
+                    self.add(field, name)
+
+    def __len__(self):
+        return sum(len(names) for names in self._names.values())
+
+    def delete(self):
+        """Supprime les fichiers relevés, un appel groupé par bucket.
+        Retourne le nombre de fichiers supprimés."""
+        deleted = 0
+        for key, names in self._names.items():
+            storage = self._storages[key]
+            try:
+                names = sorted(names)
+                if hasattr(storage, 'delete_many'):
+                    failed = storage.delete_many(names)
+                else:
+                    failed = []
+                    for name in names:
+                        storage.delete(name)
+            except Exception as exc:  # stockage injoignable : la purge reste valide
+                logger.warning("purge: %s fichier(s) non supprimé(s) du stockage %s: %s",
+                               len(names), key[1] or key[0].__name__, exc)
+                continue
+            if failed:
+                logger.warning("purge: %s fichier(s) non supprimé(s) du stockage %s",
+                               len(failed), key[1] or key[0].__name__)
+            deleted += len(names) - len(failed)
+        self._names = {}
+        return deleted
+
+
+def purge_incidents(queryset, chunk_size=None):
+    """Supprime définitivement les incidents de ``queryset`` par lots.
+
+    ``queryset`` est réévalué à chaque lot (les lignes supprimées n'y figurent
+    plus) ; les lignes verrouillées ailleurs sont laissées au passage suivant.
+    Retourne ``{'purged', 'ids', 'files'}``.
+    """
+    chunk_size = chunk_size or int(getattr(settings, 'TRASH_PURGE_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+    purged_ids, files_deleted = [], 0
+    while True:
+        files = StoredFiles()
+        with transaction.atomic():
+            incidents = list(queryset.select_for_update(skip_locked=True).order_by('pk')[:chunk_size])
+            if not incidents:
+                break
+            ids = [incident.pk for incident in incidents]  # delete() remet les pk à None
+            collector = Collector(using=DEFAULT_DB_ALIAS)
+            collector.collect(incidents)
+            files.collect(collector)
+            collector.delete()
+        # Fichiers retirés seulement une fois la suppression validée.
+        files_deleted += files.delete()
+        purged_ids.extend(ids)
+        logger.info("purge: %s incident(s) supprimé(s) définitivement", len(incidents))
+        if len(incidents) < chunk_size:
+            break
+    return {'purged': len(purged_ids), 'ids': purged_ids, 'files': files_deleted}
@@ -0,0 +1,85 @@
+"""Client Redis partagé par les services temps réel (hors channel layer).
+
+Même instance Redis que Channels / Celery (``REDIS_URL``, repli sur
+``CHANNELS_REDIS_URL``). Les délais de connexion sont courts : Redis est un
+accélérateur, jamais une dépendance dure — chaque appelant intercepte
+``REDIS_ERRORS`` et retombe sur le chemin base de données.
+
+Coupe-circuit : après une erreur de connexion, les commandes échouent
+immédiatement pendant ``REDIS_RETRY_AFTER`` secondes, pour ne pas payer un
+timeout par appel (signaux, handshakes) quand Redis est indisponible.
+"""
+import asyncio
+import time
+import weakref
+from functools import lru_cache
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+
+REDIS_ERRORS = (redis.RedisError, OSError)
+
+_async_clients = weakref.WeakKeyDictionary()
+_breaker = {'open_until': 0.0}
+
+
+def _check_breaker():
+    if time.monotonic() < _breaker['open_until']:
+        raise redis.ConnectionError("Redis indisponible (coupe-circuit ouvert)")
+
+
+def _trip_breaker():
+    _breaker['open_until'] = time.monotonic() + float(getattr(settings, 'REDIS_RETRY_AFTER', 5))
+
+
+class _GuardedRedis(redis.Redis):
+    def execute_command(self, *args, **options):
+        _check_breaker()
+        try:
+            return super().execute_command(*args, **options)
+        except (redis.ConnectionError, redis.TimeoutError):
+            _trip_breaker()
+            raise
+
+    def pipeline(self, *args, **kwargs):
+        _check_breaker()
+        return super().pipeline(*args, **kwargs)
+
+
+class _GuardedAsyncRedis(aioredis.Redis):
+    async def execute_command(self, *args, **options):
+        _check_breaker()
+        try:
+            return await super().execute_command(*args, **options)
+        except (redis.ConnectionError, redis.TimeoutError):
+            _trip_breaker()
+            raise
+
+
+def _url():
+    return getattr(settings, 'REDIS_URL', None) or settings.CHANNELS_REDIS_URL
+
+
+def _options():
+    timeout = float(getattr(settings, 'REDIS_SOCKET_TIMEOUT', 0.5))
+    return {'socket_connect_timeout': timeout, 'socket_timeout': timeout}
+
+
+@lru_cache(maxsize=1)
+def get_redis():
+    """Client synchrone (vues, signaux, tâches Celery)."""
+    return _GuardedRedis.from_url(_url(), **_options())
+
+
+def get_async_redis():
+    """Client asyncio (consumers), un par boucle d'événements.
+
+    Les connexions redis.asyncio sont liées à la boucle qui les a ouvertes :
+    ``async_to_sync`` en crée une par appel hors Daphne.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = _GuardedAsyncRedis.from_url(_url(), **_options())
+    return client
@@ -0,0 +1,100 @@
+"""Journal de rejeu borné des flux WebSocket (reconnexion mobile).
+
+Pour les groupes rejouables (``notifications_*``, ``tasks_*`` par défaut), chaque
+événement diffusé est d'abord ajouté à un stream Redis ``ws:replay:<group>``
+(longueur bornée, expiration glissante) ; l'identifiant du stream est livré
+dans le payload sous ``event_id``.
+
+À la reconnexion, le client passe ``?last_event_id=<id>`` : s'il est encore
+présent dans le journal, on lui renvoie uniquement les événements suivants ;
+sinon (trou supérieur à la rétention, id inconnu) on envoie
+``{"event": "resync_required"}`` et le client recharge ses listes REST.
+Des doublons sont possibles à la jonction rejeu / direct : le client
+dédoublonne sur ``event_id``.
+"""
+import json
+import logging
+
+from django.conf import settings
+
+from .redis_client import REDIS_ERRORS, get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+RESYNC_EVENT = 'resync_required'
+KEY_PREFIX = 'ws:replay:'
+
+
+def _prefixes():
+    return tuple(getattr(settings, 'WS_REPLAY_GROUP_PREFIXES', ('notifications_', 'tasks_')))
+
+
+def _maxlen():
+    return int(getattr(settings, 'WS_REPLAY_MAXLEN', 200))
+
+
+def _ttl():
+    return int(getattr(settings, 'WS_REPLAY_TTL', 24 * 3600))
+
+
+def is_replayable(group):
+    return group.startswith(_prefixes())
+
+
+def stream_key(group):
+    return f"{KEY_PREFIX}{group}"
+
+
+def record_events(messages):
+    """Journalise les événements des groupes rejouables et leur attribue un
+    ``event_id`` (modifie les payloads en place). ``messages`` : [(group, payload)]
+    où payload est un événement ou une trame groupée. Sans Redis, les événements
+    partent sans ``event_id`` (le client ne pourra pas reprendre : resync)."""
+    from .broadcast import iter_payload_items
+
+    entries = [(group, item) for group, payload in messages if is_replayable(group)
+               for item in iter_payload_items(payload)]
+    if not entries:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for group, item in entries:
+            pipe.xadd(stream_key(group), {'data': json.dumps(item)},
+                      maxlen=_maxlen(), approximate=True)
+        for group in {group for group, _ in entries}:
+            pipe.expire(stream_key(group), _ttl())
+        results = pipe.execute()
+    except REDIS_ERRORS as exc:
+        logger.warning("journal de rejeu WS indisponible: %s", exc)
+        return
+    for (_, item), event_id in zip(entries, results):
+        item['event_id'] = event_id.decode() if isinstance(event_id, bytes) else event_id
+
+
+async def events_since(group, last_event_id):
+    """Événements postérieurs à ``last_event_id`` pour ``group``.
+
+    Retourne la liste des payloads, ou ``None`` si la reprise est impossible
+    (id absent du journal : tronqué, expiré ou invalide).
+    """
+    limit = _maxlen()
+    try:
+        entries = await get_async_redis().xrange(
+            stream_key(group), min=last_event_id, max='+', count=limit + 1)
+    except REDIS_ERRORS as exc:
+        # Id mal formé (ResponseError) ou Redis indisponible : resync complet.
+        logger.warning("rejeu WS impossible (%s): %s", group, exc)
+        return None
+    if not entries:
+        return None
+    first_id = entries[0][0]
+    first_id = first_id.decode() if isinstance(first_id, bytes) else first_id
+    if first_id != last_event_id:
+        return None  # le dernier événement vu a été évincé : trou possible
+    events = []
+    for entry_id, fields in entries[1:]:
+        data = fields.get(b'data') or fields.get('data')
+        item = json.loads(data)
+        item['event_id'] = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+        events.append(item)
+    return events
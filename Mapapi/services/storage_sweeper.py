@@ -0,0 +1,196 @@
+"""Balayage des buckets de stockage : objets orphelins.
+
+Créations d'incident échouées, avatars remplacés, suppressions définitives
+hors purge… laissent des objets qu'aucune ligne ne référence. Le balayage
+parcourt chaque bucket page par page (``SupabaseStorage.list_page``) et, pour
+chaque page, confronte les clés à toutes les colonnes ``FileField`` /
+``ImageField`` qui écrivent dans ce bucket (une requête ``IN`` par colonne).
+
+Un objet non référencé est noté (``StorageOrphan``) ; s'il l'est toujours
+après ``STORAGE_SWEEP_GRACE_DAYS`` jours, il est supprimé par appels groupés
+(ou déplacé sous ``quarantine/`` si ``STORAGE_SWEEP_ACTION = 'quarantine'``).
+Chaque passage traite au plus ``STORAGE_SWEEP_MAX_OBJECTS`` objets et reprend
+au passage suivant là où il s'est arrêté (curseur dans Redis).
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from backend.supabase_storage import SupabaseStorage
+from ..models import StorageOrphan
+from .redis_client import REDIS_ERRORS, get_redis
+
+logger = logging.getLogger(__name__)
+
+CURSOR_KEY = 'storage:sweep:cursor'
+QUARANTINE_PREFIX = 'quarantine/'
+# Objets techniques jamais référencés en base (cf. SupabaseStorage._ensure_folder_exists).
+IGNORED_SUFFIXES = ('.placeholder', '.emptyFolderPlaceholder')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def bucket_columns():
+    """``{bucket: (storage, [(modèle, champ), ...])}`` pour tous les modèles."""
+    buckets = {}
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if not isinstance(field, models.FileField) or not isinstance(field.storage, SupabaseStorage):
+                continue
+            storage, columns = buckets.setdefault(field.storage.bucket_name, (field.storage, []))
+            columns.append((model, field))
+    return buckets
+
+
+def referenced(columns, names):
+    """Sous-ensemble de ``names`` référencé par au moins une colonne."""
+    found = set()
+    for model, field in columns:
+        default = field.get_default()
+        if default in names:
+            found.add(default)  # fichier par défaut partagé (avatar…)
+        remaining = list(set(names) - found)
+        if not remaining:
+            break
+        found.update(
+            model._base_manager.filter(**{f'{field.attname}__in': remaining})
+            .values_list(field.attname, flat=True)
+        )
+    return found
+
+
+def _iter_page(storage, stack, page_size):
+    """Avance le parcours en profondeur ``stack`` (``[[prefix, offset], ...]``)
+    d'une page. Retourne les fichiers ``[(nom, taille)]`` de la page et l'entrée
+    de pile du dossier (None s'il est épuisé)."""
+    position = stack[-1]
+    prefix, offset = position
+    entries = storage.list_page(prefix, offset=offset, limit=page_size)
+    if len(entries) < page_size:
+        stack.pop()
+        position = None
+    else:
+        position[1] = offset + len(entries)
+    files, folders = [], []
+    for entry in entries:
+        name = f"{prefix}/{entry['name']}" if prefix else entry['name']
+        if entry.get('id') is None:
+            folders.append(name)
+        elif not name.endswith(IGNORED_SUFFIXES):
+            metadata = entry.get('metadata') or {}
+            files.append((name, int(metadata.get('size') or 0)))
+    # Parcours en profondeur : les sous-dossiers de la page sont explorés avant la
+    # suite du dossier courant, dans l'ordre (empilés en ordre inverse).
+    for folder in reversed(folders):
+        if not (folder + '/').startswith(QUARANTINE_PREFIX):
+            stack.append([folder, 0])
+    return files, position
+
+
+def _load_cursor(buckets):
+    try:
+        raw = get_redis().get(CURSOR_KEY)
+    except REDIS_ERRORS:
+        raw = None
+    cursor = json.loads(raw) if raw else None
+    if not cursor or cursor.get('bucket') not in buckets:
+        cursor = {'bucket': sorted(buckets)[0], 'stack': [['', 0]],
+                  'started_at': timezone.now().isoformat()}
+    return cursor
+
+
+def _save_cursor(cursor):
+    try:
+        if cursor is None:
+            get_redis().delete(CURSOR_KEY)
+        else:
+            get_redis().set(CURSOR_KEY, json.dumps(cursor))
+    except REDIS_ERRORS as exc:
+        logger.warning("balayage du stockage : curseur non enregistré (%s)", exc)
+
+
+def _reclaim(bucket, storage, due, action):
+    """Supprime / met en quarantaine les orphelins ``due`` ({nom: taille})."""
+    names = sorted(due)
+    if action == 'quarantine':
+        failed = []
+        for name in names:
+            try:
+                storage.move(name, QUARANTINE_PREFIX + name)
+            except Exception:
+                failed.append(name)
+    else:
+        failed = storage.delete_many(names)
+    failed = set(failed)
+    done = [name for name in names if name not in failed]
+    StorageOrphan.objects.filter(bucket=bucket, name__in=done).delete()
+    return len(done), sum(due[name] for name in done)
+
+
+def _sweep_page(bucket, storage, columns, files, now, action):
+    sizes = dict(files)
+    in_use = referenced(columns, list(sizes))
+    StorageOrphan.objects.filter(bucket=bucket, name__in=in_use).delete()
+    orphans = [name for name in sizes if name not in in_use]
+    if not orphans:
+        return 0, 0, 0
+    StorageOrphan.objects.bulk_create(
+        [StorageOrphan(bucket=bucket, name=name, size=sizes[name]) for name in orphans],
+        ignore_conflicts=True,
+    )
+    StorageOrphan.objects.filter(bucket=bucket, name__in=orphans).update(last_seen_at=now)
+    grace = timedelta(days=int(_setting('STORAGE_SWEEP_GRACE_DAYS', 7)))
+    due = dict(
+        StorageOrphan.objects.filter(bucket=bucket, name__in=orphans, first_seen_at__lte=now - grace)
+        .values_list('name', 'size')
+    )
+    if not due:
+        return len(orphans), 0, 0
+    reclaimed, size = _reclaim(bucket, storage, due, action)
+    return len(orphans), reclaimed, size
+
+
+def sweep(max_objects=None):
+    """Un passage de balayage. Retourne ``{'scanned', 'orphans', 'reclaimed', 'bytes'}``."""
+    buckets = bucket_columns()
+    stats = {'scanned': 0, 'orphans': 0, 'reclaimed': 0, 'bytes': 0}
+    if not buckets:
+        return stats
+    max_objects = max_objects or int(_setting('STORAGE_SWEEP_MAX_OBJECTS', 20000))
+    page_size = int(_setting('STORAGE_SWEEP_PAGE_SIZE', 1000))
+    action = _setting('STORAGE_SWEEP_ACTION', 'delete')
+    names = sorted(buckets)
+    cursor = _load_cursor(buckets)
+    now = timezone.now()
+    while stats['scanned'] < max_objects:
+        bucket = cursor['bucket']
+        storage, columns = buckets[bucket]
+        if not cursor['stack']:
+            # Bucket parcouru en entier : oublie les orphelins disparus entre-temps.
+            StorageOrphan.objects.filter(
+                bucket=bucket, last_seen_at__lt=parse_datetime(cursor['started_at'])).delete()
+            index = names.index(bucket) + 1
+            if index == len(names):
+                cursor = None
+                break
+            cursor = {'bucket': names[index], 'stack': [['', 0]], 'started_at': now.isoformat()}
+            continue
+        files, position = _iter_page(storage, cursor['stack'], page_size)
+        stats['scanned'] += len(files)
+        if files:
+            orphans, reclaimed, size = _sweep_page(bucket, storage, columns, files, now, action)
+            stats['orphans'] += orphans
+            stats['reclaimed'] += reclaimed
+            stats['bytes'] += size
+            if position is not None:
+                position[1] -= reclaimed  # objets retirés : la page suivante recule d'autant
+    _save_cursor(cursor)
+    return stats
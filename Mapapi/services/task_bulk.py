@@ -0,0 +1,184 @@
+"""Opérations groupées sur les tâches d'un incident (planification par le leader).
+
+Une requête porte jusqu'à ``TASK_BULK_MAX_OPERATIONS`` opérations :
+``{"create": [...], "update": [{"id", ...}], "confirm": [id, ...], "delete": [id, ...]}``.
+
+Tout est validé en une passe (une seule lecture des tâches visées) avant la
+moindre écriture ; puis, dans une transaction : un ``bulk_create``, un
+``bulk_update``, un DELETE, un seul recalcul des compteurs/progression de
+l'incident (``deferred_progress``) et une seule trame WebSocket groupée sur
+``tasks_<incident_id>``. ``bulk_create``/``bulk_update`` ne déclenchant pas
+``post_save``, le service pousse lui-même les événements des signaux.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from ..models import IncidentTask
+from .broadcast import broadcast_buffer, ws_broadcast
+from .task_progress import deferred_progress
+
+DEFAULT_MAX_OPERATIONS = 200
+
+SECTIONS = ('create', 'update', 'confirm', 'delete')
+
+
+def task_payload(task, event):
+    """Payload WebSocket d'une tâche (groupe ``tasks_<incident_id>``)."""
+    return {
+        'event': event,
+        'id': task.id,
+        'incident': task.incident_id,
+        'title': task.title,
+        'state': task.state,
+        'assigned_to': task.assigned_to_id,
+        'updated_at': task.updated_at.isoformat() if getattr(task, 'updated_at', None) else None,
+    }
+
+
+def max_operations():
+    return int(getattr(settings, 'TASK_BULK_MAX_OPERATIONS', DEFAULT_MAX_OPERATIONS))
+
+
+def _task_id(value):
+    try:
+        return serializers.UUIDField().to_internal_value(value)
+    except serializers.ValidationError:
+        return None
+
+
+def _validate(incident, data):
+    """Valide toutes les opérations. Retourne ``(plan, erreurs)``."""
+    from ..serializer import IncidentTaskSerializer
+
+    if not isinstance(data, dict):
+        return None, {'non_field_errors': ["Un objet {create, update, confirm, delete} est attendu."]}
+    sections = {name: data.get(name) or [] for name in SECTIONS}
+    if any(not isinstance(items, list) for items in sections.values()):
+        return None, {'non_field_errors': ["Chaque section doit être une liste."]}
+    total = sum(len(items) for items in sections.values())
+    if not total:
+        return None, {'non_field_errors': ["Aucune opération."]}
+    if total > max_operations():
+        return None, {'non_field_errors': [f"Au plus {max_operations()} opérations par requête."]}
+    if not incident.can_add_task():
+        return None, {'non_field_errors': ["Impossible de modifier les tâches d'un incident clôturé."]}
+
+    errors = {}
+    # Toutes les tâches visées (update / confirm / delete) en une requête.
+    refs = {
+        'update': [_task_id(item.get('id')) if isinstance(item, dict) else None
+                   for item in sections['update']],
+        'confirm': [_task_id(value) for value in sections['confirm']],
+        'delete': [_task_id(value) for value in sections['delete']],
+    }
+    wanted = {pk for ids in refs.values() for pk in ids if pk}
+    tasks = IncidentTask.objects.filter(incident=incident).in_bulk(wanted)
+    targets = {}
+    for name, ids in refs.items():
+        section_errors = []
+        for pk in ids:
+            previous = targets.setdefault(pk, set())
+            if pk is None:
+                section_errors.append({'id': ["Identifiant de tâche invalide."]})
+            elif pk not in tasks:
+                section_errors.append({'id': ["Tâche non trouvée."]})
+            elif name in previous or (previous and 'delete' in previous | {name}):
+                # Une tâche peut être modifiée ET confirmée, mais pas visée deux
+                # fois par la même opération ni supprimée en plus d'autre chose.
+                section_errors.append({'id': ["Tâche visée par des opérations incompatibles."]})
+            else:
+                section_errors.append({})
+            previous.add(name)
+        if any(section_errors):
+            errors[name] = section_errors
+
+    # L'incident est déjà chargé : pas de requête par tâche dans validate().
+    for task in tasks.values():
+        task.incident = incident
+
+    creates, create_errors = [], []
+    for item in sections['create']:
+        serializer = IncidentTaskSerializer(data=item)
+        if serializer.is_valid():
+            creates.append(serializer.validated_data)
+            create_errors.append({})
+        else:
+            create_errors.append(serializer.errors)
+    if any(create_errors):
+        errors['create'] = create_errors
+
+    updates, update_errors = [], []
+    for item, pk in zip(sections['update'], refs['update']):
+        task = tasks.get(pk)
+        if task is None:
+            update_errors.append({})
+            continue
+        payload = {key: value for key, value in item.items() if key != 'id'}
+        serializer = IncidentTaskSerializer(task, data=payload, partial=True)
+        if serializer.is_valid():
+            updates.append((task, serializer.validated_data))
+            update_errors.append({})
+        else:
+            update_errors.append(serializer.errors)
+    if any(update_errors):
+        errors.setdefault('update', update_errors)
+
+    if errors:
+        return None, errors
+    return {
+        'create': creates,
+        'update': updates,
+        'confirm': [tasks[pk] for pk in refs['confirm']],
+        'delete': [tasks[pk] for pk in refs['delete']],
+    }, {}
+
+
+def apply_bulk_operations(incident, user, data):
+    """Applique les opérations de ``data`` sur ``incident`` au nom de ``user``.
+
+    Lève ``serializers.ValidationError`` (rien n'est écrit) si une opération est
+    invalide ; sinon retourne ``{'created', 'updated', 'deleted'}``.
+    """
+    plan, errors = _validate(incident, data)
+    if errors:
+        raise serializers.ValidationError(errors)
+
+    now = timezone.now()
+    with transaction.atomic(), broadcast_buffer(), deferred_progress() as touched:
+        created = []
+        if plan['create']:
+            # Créées par le leader : auto-confirmées (cf. IncidentTask.save).
+            auto_confirm = IncidentTask(incident=incident, created_by=user)._is_creator_leader()
+            created = IncidentTask.objects.bulk_create([
+                IncidentTask(incident=incident, created_by=user, is_confirmed=auto_confirm, **values)
+                for values in plan['create']
+            ])
+
+        changed, fields = {}, {'updated_at'}
+        for task, values in plan['update']:
+            for attr, value in values.items():
+                setattr(task, attr, value)
+            fields.update(values)
+            changed[task.pk] = task
+        for task in plan['confirm']:
+            task.is_confirmed = True
+            fields.add('is_confirmed')
+            changed[task.pk] = task
+        for task in changed.values():
+            task.updated_at = now  # bulk_update n'applique pas auto_now
+        if changed:
+            IncidentTask.objects.bulk_update(list(changed.values()), sorted(fields))
+
+        deleted = [task.pk for task in plan['delete']]
+        if deleted:
+            # post_delete (signal) pousse chaque suppression dans le tampon.
+            IncidentTask.objects.filter(pk__in=deleted).delete()
+
+        touched.add(incident.pk)
+        for task in created:
+            ws_broadcast(f"tasks_{incident.pk}", task_payload(task, 'task_created'))
+        for task in changed.values():
+            ws_broadcast(f"tasks_{incident.pk}", task_payload(task, 'task_updated'))
+    return {'created': created, 'updated': list(changed.values()), 'deleted': deleted}
@@ -0,0 +1,108 @@
+"""Progression des incidents maintenue par compteurs de tâches.
+
+``Incident.tasks_confirmed_count`` / ``tasks_done_count`` sont mis à jour par
+un seul UPDATE (expressions ``F()``) à chaque création, modification ou
+suppression de tâche qui change sa contribution ; la progression est
+recalculée dans le même UPDATE. Plus de COUNT ni de ``save()`` de l'incident.
+
+Pour les traitements par lots (API bulk, imports), ``deferred_progress()``
+suspend ces mises à jour et recalcule une seule fois, à la sortie du bloc,
+les incidents touchés (``refresh_task_counters``).
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db.models import Case, Count, F, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import Cast, Floor, Greatest
+from django.db.models.lookups import LessThanOrEqual
+from django.utils import timezone
+
+from ..models import Incident, RESOLVED, RESOLVED_DEFINITIVE, TASK_DONE, incident_progress
+
+COUNTER_FIELDS = ('tasks_confirmed_count', 'tasks_done_count', 'progress')
+
+_local = threading.local()
+
+
+def _progress_expression(confirmed, done):
+    """Équivalent SQL de ``incident_progress`` : arrondi demi vers le haut par
+    ``FLOOR(x + 0.5)`` (le ROUND de PostgreSQL sur float8 arrondit au pair : 12,5 → 12)."""
+    return Case(
+        When(etat__in=[RESOLVED, RESOLVED_DEFINITIVE], then=Value(100)),
+        When(LessThanOrEqual(confirmed, 0), then=Value(0)),
+        default=Cast(Floor(Cast(done, FloatField()) * Value(100.0) / confirmed + Value(0.5)),
+                     IntegerField()),
+        output_field=IntegerField(),
+    )
+
+
+def _apply_delta(incident_id, confirmed, done):
+    confirmed_expr = Greatest(F('tasks_confirmed_count') + confirmed, 0)
+    done_expr = Greatest(F('tasks_done_count') + done, 0)
+    Incident.objects.filter(pk=incident_id).update(
+        tasks_confirmed_count=confirmed_expr,
+        tasks_done_count=done_expr,
+        progress=_progress_expression(confirmed_expr, done_expr),
+    )
+
+
+def apply_task_change(task, before, after):
+    """Répercute le passage de la contribution ``before`` à ``after`` (tuples
+    ``(incident_id, confirmée, terminée)``, cf. ``IncidentTask.progress_contribution``)."""
+    deltas = {}
+    for (incident_id, confirmed, done), sign in ((before, -1), (after, 1)):
+        if incident_id:
+            old = deltas.get(incident_id, (0, 0))
+            deltas[incident_id] = (old[0] + sign * confirmed, old[1] + sign * done)
+    deltas = {incident_id: delta for incident_id, delta in deltas.items() if delta != (0, 0)}
+    if not deltas:
+        return
+    batch = getattr(_local, 'incidents', None)
+    if batch is not None:
+        batch.update(deltas)
+        return
+    for incident_id, (confirmed, done) in deltas.items():
+        _apply_delta(incident_id, confirmed, done)
+    # L'incident chargé sur la tâche (souvent celui de la vue) reste à jour ;
+    # l'instantané suivi est rafraîchi : un save() ultérieur ne l'écrase pas.
+    incident = task._state.fields_cache.get('incident')
+    if incident is not None and incident.pk in deltas:
+        incident.refresh_from_db(fields=list(COUNTER_FIELDS))
+
+
+def refresh_task_counters(incident_ids=None):
+    """Recalcule compteurs et progression depuis les tâches (tous les incidents
+    si ``incident_ids`` est None). Une lecture agrégée, puis un ``bulk_update``
+    des seuls incidents divergents. Retourne le nombre d'incidents corrigés."""
+    qs = Incident.objects.all()
+    if incident_ids is not None:
+        qs = qs.filter(pk__in=list(incident_ids))
+    rows = qs.annotate(
+        confirmed=Count('tasks', filter=Q(tasks__is_confirmed=True)),
+        done=Count('tasks', filter=Q(tasks__is_confirmed=True, tasks__state=TASK_DONE)),
+    ).values_list('pk', 'etat', 'confirmed', 'done', *COUNTER_FIELDS)
+    now = timezone.now()
+    stale = []
+    for pk, etat, confirmed, done, *current in rows.iterator():
+        expected = [confirmed, done, incident_progress(etat, confirmed, done)]
+        if current != expected:
+            # bulk_update n'applique pas auto_now : horodaté pour le flux des changements.
+            stale.append(Incident(pk=pk, updated_at=now, **dict(zip(COUNTER_FIELDS, expected))))
+    Incident.objects.bulk_update(stale, [*COUNTER_FIELDS, 'updated_at'], batch_size=500)
+    return len(stale)
+
+
+@contextmanager
+def deferred_progress():
+    """Suspend la mise à jour des compteurs par tâche ; recalcule une fois, à
+    la sortie, les incidents touchés. Les blocs imbriqués partagent le lot."""
+    if getattr(_local, 'incidents', None) is not None:
+        yield _local.incidents
+        return
+    _local.incidents = incidents = set()
+    try:
+        yield incidents
+    finally:
+        _local.incidents = None
+    if incidents:
+        refresh_task_counters(incidents)
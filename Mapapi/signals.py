@@ -1,12 +1,18 @@
-import json
-
-from django.db.models.signals import post_save, pre_save, post_delete
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.serializers.json import DjangoJSONEncoder
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from .models import (Collaboration, Notification, User, DiscussionMessage, IncidentTask,
-                     UserAction, COLLAB_ROLE_LEADER)
+                     UserAction, Incident, IncidentAssignment, IncidentOrgAssignment, COLLAB_ROLE_LEADER)
+# Diffusion WebSocket (tamponnée par requête / tâche, cf. services.broadcast).
+from .services.broadcast import ws_broadcast as _ws_broadcast
+from .services import deadlines, delta_sync, field_bundle
+from .services.activity_counts import record_actions
+from .services.activity_feed import activity_payload, relay_activity
+from .services.activity_log import log_activity
+from .services.map_stream import push_marker
+from .services.notification_counts import apply_delta as apply_notification_delta
+from .services.notifications import notification_payload, notify_users
+from .services.task_bulk import task_payload
+from .ws_auth import invalidate_cached_user
 
 
 def _actor_label(user):
@@ -18,22 +24,13 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-def _ws_broadcast(group, payload):
-    """Pousse un message vers un groupe WebSocket (depuis un contexte sync).
-
-    Le payload est d'abord normalisé en primitives JSON (UUID -> str, datetime ->
-    ISO, etc.) AVANT group_send : la couche Channels sérialise en msgpack, qui ne
-    sait pas empaqueter un UUID/datetime. Sans cela, group_send levait
-    « can not serialize 'UUID' object », l'exception était avalée ci-dessous, et le
-    broadcast était silencieusement perdu (WebSocket ouvert mais aucun message reçu).
-    """
-    try:
-        safe_payload = json.loads(json.dumps(payload, cls=DjangoJSONEncoder))
-        layer = get_channel_layer()
-        if layer is not None:
-            async_to_sync(layer.group_send)(group, {'type': 'broadcast', 'payload': safe_payload})
-    except Exception as exc:  # ne jamais casser une écriture DB à cause du temps réel
-        logger.warning("WS broadcast échoué (%s): %s", group, exc)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_ws_user_cache(sender, instance, **kwargs):
+    """Invalide l'identité WebSocket en cache (organisation, rôle, is_active…)."""
+    if kwargs.get('raw'):
+        return
+    invalidate_cached_user(instance.pk)
 
 
 @receiver(post_save, sender=Notification)
@@ -41,19 +38,30 @@ def ws_push_notification(sender, instance, created, **kwargs):
     """Temps réel : pousse chaque notification à son destinataire (qui a fait quoi)."""
     if kwargs.get('raw') or not created:
         return
-    _ws_broadcast(f"notifications_{instance.user_id}", {
-        'event': 'notification',
-        'id': instance.id,
-        'type': instance.notif_type,            # catégorie (collaboration_request, …)
-        'title': instance.title,                # libellé FR prêt à afficher
-        'message': instance.message,
-        'incident_title': getattr(getattr(instance, 'incident', None), 'title', None),
-        'read': instance.read,
-        'colaboration': instance.colaboration_id,
-        'incident': instance.incident_id,
-        'link': instance.redirect_link(),  # cible de redirection au clic
-        'created_at': instance.created_at.isoformat() if instance.created_at else None,
-    })
+    _ws_broadcast(f"notifications_{instance.user_id}", notification_payload(instance))
+
+
+@receiver(post_save, sender=Notification)
+def count_notification_created(sender, instance, created, **kwargs):
+    """Compteurs dénormalisés : +1 total (et +1 non lu) pour le destinataire."""
+    if kwargs.get('raw') or not created:
+        return
+    apply_notification_delta([instance.user_id], unread=0 if instance.read else 1, total=1)
+
+
+@receiver(post_delete, sender=Notification)
+def count_notification_deleted(sender, instance, **kwargs):
+    apply_notification_delta([instance.user_id], unread=0 if instance.read else -1, total=-1)
+
+
+@receiver(post_delete, sender=Incident)
+@receiver(post_delete, sender=Collaboration)
+@receiver(post_delete, sender=Notification)
+def record_sync_tombstone(sender, instance, **kwargs):
+    """Flux des changements : trace la suppression définitive (les notifications
+    ne sont signalées qu'à leur destinataire)."""
+    owner_id = instance.user_id if sender is Notification else None
+    delta_sync.record_deletion(sender._meta.model_name, instance.pk, owner_id)
 
 
 @receiver(post_save, sender=DiscussionMessage)
@@ -77,15 +85,8 @@ def ws_push_task(sender, instance, created, **kwargs):
     """Temps réel : pousse les créations/màj de tâches aux membres de l'incident."""
     if kwargs.get('raw'):
         return
-    _ws_broadcast(f"tasks_{instance.incident_id}", {
-        'event': 'task_created' if created else 'task_updated',
-        'id': instance.id,
-        'incident': instance.incident_id,
-        'title': instance.title,
-        'state': instance.state,
-        'assigned_to': instance.assigned_to_id,
-        'updated_at': instance.updated_at.isoformat() if getattr(instance, 'updated_at', None) else None,
-    })
+    _ws_broadcast(f"tasks_{instance.incident_id}",
+                  task_payload(instance, 'task_created' if created else 'task_updated'))
 
 
 @receiver(post_delete, sender=IncidentTask)
@@ -103,37 +104,69 @@ def ws_push_task_deleted(sender, instance, **kwargs):
 
 @receiver(post_save, sender=UserAction)
 def ws_push_activity(sender, instance, created, **kwargs):
-    """Temps réel : pousse chaque nouvelle action au flux d'activité global
-    (groupe ``activity_feed``). L'ActivityFeedConsumer filtre côté serveur
-    l'activité de l'organisation du viewer — comme le REST /activity-feed/ qui
-    exclut sa propre organisation."""
+    """Temps réel : pousse chaque nouvelle action au flux d'activité, partitionné
+    par organisation : le relais publie vers les groupes de toutes les orgs SAUF
+    celle de l'acteur — comme le REST /activity-feed/ qui exclut sa propre
+    organisation (cf. services.activity_feed)."""
     if kwargs.get('raw') or not created:
         return
     u = instance.user
     org = getattr(u, 'organisation_member', None) if u else None
-    user_name = (f"{u.first_name or ''} {u.last_name or ''}".strip() or u.email) if u else None
-    org_name = org.name if org else None
-    _ws_broadcast("activity_feed", {
-        'event': 'activity',
-        'id': instance.id,
-        'action': instance.action,
-        'user': u.id if u else None,
-        'user_name': user_name,
-        'organisation_id': org.id if org else None,
-        'organisation_name': org_name,
-        'actor': org_name or user_name,   # à afficher en tête (org, repli sur la personne)
-        'created_at': instance.created_at.isoformat() if getattr(instance, 'created_at', None) else None,
-        'timeStamp': instance.timeStamp.isoformat() if getattr(instance, 'timeStamp', None) else None,
-    })
+    record_actions([org.id if org else None])  # compteurs du flux (services.activity_counts)
+    relay_activity(activity_payload(instance, u))
 
 
-@receiver(pre_save, sender=Collaboration)
-def _capture_collab_old_status(sender, instance, **kwargs):
-    """Capture l'ancien statut pour détecter accept/decline dans le post_save."""
-    if instance.pk:
-        instance._old_status = Collaboration.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
-    else:
-        instance._old_status = None
+@receiver(post_save, sender=Incident)
+def ws_push_map_marker(sender, instance, created, update_fields=None, **kwargs):
+    """Temps réel : delta de marqueur pour la carte (/ws/map/) à chaque création /
+    modification visible d'un incident (coordonnées, état, sévérité, corbeille)."""
+    if kwargs.get('raw'):
+        return
+    push_marker(instance, created=created, update_fields=update_fields)
+
+
+@receiver(post_delete, sender=Incident)
+def ws_push_map_marker_deleted(sender, instance, **kwargs):
+    """Temps réel : retire le marqueur d'un incident supprimé définitivement."""
+    push_marker(instance, deleted=True)
+
+
+@receiver(post_save, sender=Incident)
+def schedule_incident_deadlines(sender, instance, created, **kwargs):
+    """Validation tacite / seuils anti-gel : (re)planifie les échéances de
+    l'incident quand un champ qui les porte change (cf. services.deadlines)."""
+    if kwargs.get('raw'):
+        return
+    if created or deadlines.INCIDENT_FIELDS.intersection(instance.changed_fields):
+        deadlines.schedule_entries(deadlines.incident_entries(instance))
+
+
+@receiver(post_delete, sender=Incident)
+def cancel_incident_deadlines(sender, instance, **kwargs):
+    deadlines.schedule_entries(
+        [(deadlines.VALIDATION, instance.pk, None), (deadlines.ANTIGEL, instance.pk, None)])
+
+
+@receiver(post_save, sender=IncidentAssignment)
+@receiver(post_delete, sender=IncidentAssignment)
+def invalidate_field_bundle(sender, instance, **kwargs):
+    """Paquet hors ligne de l'agent à reconstruire (cf. services.field_bundle)."""
+    if kwargs.get('raw'):
+        return
+    field_bundle.invalidate(instance.agent_id)
+
+
+@receiver(post_save, sender=IncidentOrgAssignment)
+def schedule_assignment_deadline(sender, instance, **kwargs):
+    """Acceptation tacite : planifiée tant que l'assignation est 'pending'."""
+    if kwargs.get('raw'):
+        return
+    deadlines.schedule_entries(deadlines.assignment_entries(instance))
+
+
+@receiver(post_delete, sender=IncidentOrgAssignment)
+def cancel_assignment_deadline(sender, instance, **kwargs):
+    deadlines.cancel_assignments([instance.pk])
 
 
 @receiver(post_save, sender=Collaboration)
@@ -172,17 +205,13 @@ def ws_push_collaboration(sender, instance, created, **kwargs):
         # (user_name / organisation_name) ; le texte de l'action ne le répète donc pas.
         incident_title = getattr(getattr(instance, 'incident', None), 'title', None) or "un incident"
         if created:
-            UserAction.objects.create(
-                user=instance.user,
-                action=f"a demandé une collaboration sur l'incident «{incident_title}»."[:255],
-            )
-        elif getattr(instance, '_old_status', None) != instance.status and instance.status in ('accepted', 'declined'):
+            log_activity(instance.user,
+                         f"a demandé une collaboration sur l'incident «{incident_title}».")
+        # Ancien statut : instantané chargé par TrackedFieldsMixin (pas de re-lecture).
+        elif instance.has_changed('status') and instance.status in ('accepted', 'declined'):
             actor = getattr(getattr(instance, 'incident', None), 'taken_by', None) or instance.user
             verbe = "a accepté" if instance.status == 'accepted' else "a refusé"
-            UserAction.objects.create(
-                user=actor,
-                action=f"{verbe} une demande de collaboration sur l'incident «{incident_title}»."[:255],
-            )
+            log_activity(actor, f"{verbe} une demande de collaboration sur l'incident «{incident_title}».")
     except Exception as exc:  # ne jamais casser l'écriture DB
         logger.warning("log activité collaboration échoué: %s", exc)
 
@@ -219,25 +248,22 @@ def notify_organisation_on_collaboration(sender, instance, created, **kwargs):
                     'organisation': getattr(getattr(user, 'organisation_member', None), 'name', None) or user.organisation,
                     'requesting_organisation': requesting_organisation
                 }
-                
-                # Envoi de l'email à l'organisation
-                send_email.delay(
-                    subject='Nouvelle demande de collaboration',
-                    template_name='emails/collaboration_request.html',
-                    context=context,
-                    to_email=user.email
-                )
-                logger.info(f"Email envoyé à {user.email} pour la collaboration sur l'incident {incident.id}.")
-                
-                # Création de la notification pour l'organisation
-                Notification.objects.create(
-                    user=user,
+
+                # Notification + email à l'organisation (service de fan-out).
+                notify_users(
+                    [user],
                     notif_type='collaboration_request',
                     message=f"L'organisation {requesting_organisation} souhaite collaborer sur l'incident {incident.title} (Zone: {incident.zone}, Date: {incident.created_at.strftime('%d-%m-%Y')})",
                     colaboration=instance,
                     incident=incident,
+                    email={
+                        'subject': 'Nouvelle demande de collaboration',
+                        'template_name': 'emails/collaboration_request.html',
+                        'context': context,
+                    },
                 )
-                logger.info(f"Notification créée pour l'utilisateur {user.email}.")
+                logger.info("Notification et email envoyés à %s pour la collaboration sur l'incident %s.",
+                            user.email, incident.id)
                 
             except Exception as e:
                 logger.error(f"Erreur lors de l'envoi de l'email: {str(e)}")
@@ -13,24 +13,31 @@ import requests
 from celery import shared_task
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 
 from Mapapi.models import (
-    Prediction, PredictionStatus, Incident, Collaboration, Notification,
+    Prediction, PredictionStatus, Incident, Collaboration,
     IN_VALIDATION, RESOLVED_DEFINITIVE, TAKEN, DECLARED,
     COLLAB_STATUS_ACCEPTED, COLLAB_STATUS_TERMINATED,
     IncidentOrgAssignment, ORG_ASSIGNMENT_PENDING, ORG_ASSIGNMENT_ACCEPTED,
-    ORG_ROLE_ADMIN, ANTI_GEL_DEADLINE_DAYS,
+    ORG_ROLE_ADMIN, ANTI_GEL_DEADLINE_DAYS, ANTI_GEL_DEFAULT_DAYS, User,
 )
+from Mapapi.services import dead_letters, deadlines, delta_sync, ingestion
+from Mapapi.services.activity_counts import repair_counters
+from Mapapi.services.activity_log import flush_pending as flush_pending_activity
+from Mapapi.services.broadcast import buffered_broadcasts
+from Mapapi.services.mail import build_digests, deliver_pending
+from Mapapi.services.map_stream import MARKER_FIELDS, push_marker
+from Mapapi.services.notifications import notify_each
 from Mapapi.services.prediction_mapper import fill_prediction_from_model_response
+from Mapapi.services.purge import purge_incidents
+from Mapapi.services.storage_sweeper import sweep as sweep_storage
+from Mapapi.services.redis_client import REDIS_ERRORS
+from Mapapi.services.task_progress import refresh_task_counters
 
 logger = logging.getLogger(__name__)
 
-# Anti-gel (spec T3) : délai de repli quand la sévérité de l'Incident est nulle/inconnue.
-# La spec prévoit Élevée 30 j / Moyenne 60 j / Faible 90 j (cf. Incident.severity et
-# ANTI_GEL_DEADLINE_DAYS dans models.py). Faute de sévérité exploitable, on applique 60 j.
-ANTI_GEL_DEFAULT_DAYS = 60
-
 
 def _antigel_deadline_days(incident):
     """Délai anti-gel (en jours) pour `incident` selon sa sévérité.
@@ -58,16 +65,21 @@ def _get_timeout():
 
 @shared_task(
     bind=True,
-    autoretry_for=(requests.exceptions.RequestException,),
-    retry_kwargs={"max_retries": 3, "countdown": 30},
-    retry_backoff=True,
+    # Nouveaux essais gérés dans la tâche (backoff avec jitter, lettre morte) :
+    # cf. services/dead_letters.py.
+    max_retries=None,
+    # Acquittée après exécution (tâche idempotente) : une analyse en cours n'est
+    # pas perdue si le worker tombe ; cf. prefetch 1 de la file 'analysis'.
+    acks_late=True,
 )
 def analyze_incident_with_model_task(self, prediction_id):
     """Send the incident photo to the model-deploy service and store the result.
 
     This task is idempotent: if the prediction is already COMPLETED, it
-    returns early. Failures are persisted on the Prediction (status=FAILED,
-    error_message=...) and re-raised so that Celery can retry where relevant.
+    returns early. Transient request failures are retried with jittered
+    exponential backoff (status=RETRYING in between); once retries are
+    exhausted, or on a non-transient error, the Prediction is marked FAILED,
+    an AnalysisDeadLetter is recorded and the exception is re-raised.
     """
     prediction = Prediction.objects.select_related("incident").get(id=prediction_id)
     incident = prediction.incident
@@ -134,68 +146,155 @@ def analyze_incident_with_model_task(self, prediction_id):
         result = response.json()
 
         fill_prediction_from_model_response(prediction, result)
+        dead_letters.resolve(prediction)
         return {"prediction_id": prediction.id, "status": prediction.status}
 
     except requests.exceptions.RequestException as exc:
-        prediction.status = PredictionStatus.FAILED
-        prediction.error_message = f"Model service request failed: {exc}"
-        prediction.save(update_fields=["status", "error_message", "updated_at"])
+        error = f"Model service request failed: {exc}"
+        retries = self.request.retries
+        if dead_letters.is_transient(exc) and retries < dead_letters.max_retries():
+            prediction.status = PredictionStatus.RETRYING
+            prediction.error_message = error
+            prediction.save(update_fields=["status", "error_message", "updated_at"])
+            raise self.retry(exc=exc, countdown=dead_letters.retry_delay(retries))
+        dead_letters.dead_letter(prediction, retries + 1, error)
         raise
 
     except Exception as exc:  # noqa: BLE001
-        prediction.status = PredictionStatus.FAILED
-        prediction.error_message = str(exc)
-        prediction.save(update_fields=["status", "error_message", "updated_at"])
+        dead_letters.dead_letter(prediction, self.request.retries + 1, str(exc))
         raise
 
 
+@shared_task
+def run_ingestion_stage(incident_id, stage):
+    """Une étape de fond d'un incident déclaré (zone, points, analyse, miniature,
+    vidéo), maillon de la chaîne lancée par services/ingestion.py."""
+    return ingestion.run_stage(incident_id, stage)
+
+
+@shared_task
+def resume_stalled_ingestions():
+    """Filet de sécurité : relance les étapes en attente des déclarations dont la
+    chaîne n'a pas été envoyée ou s'est interrompue."""
+    count = ingestion.resume_stalled()
+    if count:
+        logger.info("resume_stalled_ingestions: %s ingestion(s) relancée(s)", count)
+    return count
+
+
+@shared_task
+def prune_sync_tombstones():
+    """Supprime les traces de suppression du flux des changements plus anciennes que
+    SYNC_TOMBSTONE_RETENTION_DAYS (un client plus en retard recharge tout)."""
+    count = delta_sync.prune_tombstones()
+    if count:
+        logger.info("prune_sync_tombstones: %s trace(s) supprimée(s)", count)
+    return count
+
+
 # ============================================================================
 # Phase 4 — mécanismes temporels du cycle de vie de l'incident (Celery Beat)
 # Tâches idempotentes : sûres à rejouer ; n'agissent que sur les lignes éligibles.
+# Les diffusions WebSocket qu'elles déclenchent sont regroupées (buffered_broadcasts).
+# Traitement ensembliste : les échéances sont calculées dans la requête et les
+# lignes éligibles sont traitées par lots (LIFECYCLE_BATCH_SIZE), chaque lot
+# étant réservé (SELECT … FOR UPDATE SKIP LOCKED) puis modifié par un seul
+# UPDATE dans la même transaction. Les UPDATE ne passant pas par save(), les
+# deltas de marqueurs (signal post_save) sont poussés explicitement.
+# Déclenchement : à l'échéance, par ``dispatch_due_deadlines`` (file Redis triée,
+# cf. services/deadlines.py) avec ``ids`` = objets échus ; les passages Beat sans
+# ``ids`` ne sont plus qu'un filet de sécurité basse fréquence.
 # ============================================================================
 
+def _lifecycle_batch_size():
+    return int(getattr(settings, 'LIFECYCLE_BATCH_SIZE', 500))
+
+
+def _claim_ids(queryset, size):
+    """Réserve au plus ``size`` lignes de ``queryset`` (transaction de l'appelant).
+
+    Les lignes verrouillées par un autre worker sont sautées ; une ligne traitée
+    ne correspond plus au filtre, ce qui garantit l'idempotence des boucles.
+    """
+    return list(queryset.select_for_update(skip_locked=True).values_list('pk', flat=True)[:size])
+
+
+def _push_markers(incident_ids):
+    """Deltas de carte des incidents modifiés par UPDATE (une lecture)."""
+    for incident in Incident.objects.filter(pk__in=incident_ids).only(*MARKER_FIELDS):
+        push_marker(incident, update_fields=['etat'])
+
+
+def _antigel_elapsed(now, ratio):
+    """Incidents dont ``ratio`` du délai anti-gel (selon la sévérité) est écoulé.
+
+    Une branche par sévérité connue, plus le repli ANTI_GEL_DEFAULT_DAYS pour une
+    sévérité nulle/inconnue : la comparaison porte directement sur
+    ``taken_in_charge_at`` (pas de calcul par ligne en Python).
+    """
+    condition = ~Q(severity__in=list(ANTI_GEL_DEADLINE_DAYS)) & Q(
+        taken_in_charge_at__lte=now - timedelta(days=ANTI_GEL_DEFAULT_DAYS) * ratio)
+    for severity, days in ANTI_GEL_DEADLINE_DAYS.items():
+        condition |= Q(severity=severity, taken_in_charge_at__lte=now - timedelta(days=days) * ratio)
+    return condition
+
+
 @shared_task
-def auto_validate_overdue_resolutions():
+@buffered_broadcasts
+def auto_validate_overdue_resolutions(ids=None):
     """Validation tacite à 72 h (spec D1).
 
     Tout incident en 'in_validation' dont validation_deadline est dépassée passe
     automatiquement en 'resolved_definitive' (le Super Admin n'a pas tranché à temps).
     Idempotent : ne sélectionne que les lignes encore 'in_validation' avec une
-    échéance passée ; une fois basculées, elles ne ressortent plus.
+    échéance passée ; une fois basculées, elles ne ressortent plus. ``ids`` :
+    restreint le passage à ces incidents (échéances échues).
     """
     now = timezone.now()
     qs = Incident.objects.filter(
         etat=IN_VALIDATION,
         validation_deadline__isnull=False,
         validation_deadline__lt=now,
-    )
+    ).order_by('validation_deadline')
+    if ids is not None:
+        qs = qs.filter(pk__in=list(ids))
+    size = _lifecycle_batch_size()
     count = 0
-    for incident in qs:
-        incident.etat = RESOLVED_DEFINITIVE
-        incident.save(update_fields=['etat'])
-        # Spec §5 : à la résolution définitive, les collaborations encore actives
-        # passent en « Terminée ». Idempotent (ne touche que les 'accepted').
-        Collaboration.objects.filter(
-            incident=incident,
-            status=COLLAB_STATUS_ACCEPTED,
-        ).update(status=COLLAB_STATUS_TERMINATED)
-        count += 1
+    while True:
+        with transaction.atomic():
+            ids = _claim_ids(qs, size)
+            if not ids:
+                break
+            # Un incident clôturé est à 100 % (cf. Incident.save).
+            Incident.objects.filter(pk__in=ids).update(etat=RESOLVED_DEFINITIVE, progress=100)
+            # Spec §5 : à la résolution définitive, les collaborations encore actives
+            # passent en « Terminée ». Idempotent (ne touche que les 'accepted').
+            Collaboration.objects.filter(
+                incident_id__in=ids,
+                status=COLLAB_STATUS_ACCEPTED,
+            ).update(status=COLLAB_STATUS_TERMINATED)
+            _push_markers(ids)
+            deadlines.resync_incidents(ids)
+        count += len(ids)
         logger.info(
-            "auto_validate_overdue_resolutions: incident=%s validé tacitement "
-            "(deadline=%s) -> resolved_definitive",
-            incident.pk, incident.validation_deadline,
+            "auto_validate_overdue_resolutions: %s incident(s) validé(s) tacitement "
+            "-> resolved_definitive : %s",
+            len(ids), ids,
         )
+        if len(ids) < size:
+            break
     return {"validated": count}
 
 
 @shared_task
-def revert_stale_taken_incidents():
+@buffered_broadcasts
+def revert_stale_taken_incidents(ids=None):
     """Anti-gel / délai d'échec de prise en compte (spec T3 / §5).
 
-    Pour chaque incident 'taken_into_account' avec taken_in_charge_at non nul, on
-    calcule le délai (deadline) selon sa sévérité — Élevée 30 j / Moyenne 60 j /
-    Faible 90 j ; repli ANTI_GEL_DEFAULT_DAYS (60 j) si nulle/inconnue — et l'écoulé
-    (elapsed = now - taken_in_charge_at) :
+    Pour chaque incident 'taken_into_account' avec taken_in_charge_at non nul, le
+    délai (deadline) dépend de sa sévérité — Élevée 30 j / Moyenne 60 j /
+    Faible 90 j ; repli ANTI_GEL_DEFAULT_DAYS (60 j) si nulle/inconnue — et
+    l'écoulé vaut elapsed = now - taken_in_charge_at. Trois passes, dans cet ordre :
 
     - elapsed >= deadline       -> retour en 'declared' (champs de prise en charge
                                    remis à zéro), drapeaux d'avertissement réarmés.
@@ -205,90 +304,117 @@ def revert_stale_taken_incidents():
                                    seule fois (antigel_warned_75).
 
     Avertissements : même schéma que ReportToAdminView (Notification au leader,
-    colaboration=None, message tronqué à 255 car.). Si taken_by est nul, on saute
-    la Notification mais on positionne quand même le drapeau (pas de re-déclenchement).
+    colaboration=None, message tronqué à 255 car.), créés en lot. Si taken_by est
+    nul, on saute la Notification mais on positionne quand même le drapeau (pas de
+    re-déclenchement).
 
     On exige taken_in_charge_at non nul : les incidents pris en compte AVANT l'ajout
     de ce champ (timestamp nul) ne sont jamais traités (pas de date fiable).
     Idempotent : un incident repassé 'declared' ne ressort plus ; un avertissement
-    déjà émis (drapeau posé) ne se redéclenche pas.
+    déjà émis (drapeau posé) ne se redéclenche pas. ``ids`` : restreint le
+    passage à ces incidents (seuils échus) ; le seuil suivant est replanifié.
     """
     now = timezone.now()
-    qs = Incident.objects.filter(
+    taken = Incident.objects.filter(
         etat=TAKEN,
         taken_in_charge_at__isnull=False,
-    )
+    ).order_by('taken_in_charge_at')
+    if ids is not None:
+        taken = taken.filter(pk__in=list(ids))
+    size = _lifecycle_batch_size()
+
     reverted = 0
-    warned_75 = 0
-    warned_90 = 0
-    for incident in qs:
-        deadline_days = _antigel_deadline_days(incident)
-        elapsed = now - incident.taken_in_charge_at
-        deadline = timedelta(days=deadline_days)
-
-        if elapsed >= deadline:
-            incident.etat = DECLARED
-            incident.taken_by = None
-            incident.take_in_charge_mode = None
-            incident.taken_in_charge_at = None
-            incident.antigel_warned_75 = False
-            incident.antigel_warned_90 = False
-            incident.save(update_fields=[
-                'etat', 'taken_by', 'take_in_charge_mode', 'taken_in_charge_at',
-                'antigel_warned_75', 'antigel_warned_90',
-            ])
-            reverted += 1
-            logger.info(
-                "revert_stale_taken_incidents: incident=%s gelé > %s j -> declared "
-                "(anti-gel, spec T3)",
-                incident.pk, deadline_days,
+    stale = taken.filter(_antigel_elapsed(now, 1))
+    while True:
+        with transaction.atomic():
+            ids = _claim_ids(stale, size)
+            if not ids:
+                break
+            Incident.objects.filter(pk__in=ids).update(
+                etat=DECLARED,
+                taken_by=None,
+                take_in_charge_mode=None,
+                taken_in_charge_at=None,
+                antigel_warned_75=False,
+                antigel_warned_90=False,
             )
-
-        elif elapsed >= 0.90 * deadline and not incident.antigel_warned_90:
-            _notify_antigel_leader(incident, 90, deadline_days)
-            # Poser aussi 75 pour ne pas déclencher l'avertissement à 75 % en retard.
-            incident.antigel_warned_90 = True
-            incident.antigel_warned_75 = True
-            incident.save(update_fields=['antigel_warned_90', 'antigel_warned_75'])
-            warned_90 += 1
-
-        elif elapsed >= 0.75 * deadline and not incident.antigel_warned_75:
-            _notify_antigel_leader(incident, 75, deadline_days)
-            incident.antigel_warned_75 = True
-            incident.save(update_fields=['antigel_warned_75'])
-            warned_75 += 1
-
-    return {"reverted": reverted, "warned_75": warned_75, "warned_90": warned_90}
-
-
-def _notify_antigel_leader(incident, pct, deadline_days):
-    """Notifie le leader (incident.taken_by) qu'un seuil anti-gel est atteint.
-
-    Même schéma que ReportToAdminView : Notification(user=leader, colaboration=None,
-    message tronqué à 255 car.). Sans leader (taken_by nul), on ne crée rien (le
-    drapeau est posé par l'appelant pour éviter tout re-déclenchement).
+            _push_markers(ids)
+            deadlines.resync_incidents(ids)
+        reverted += len(ids)
+        logger.info(
+            "revert_stale_taken_incidents: %s incident(s) gelé(s) au-delà du délai "
+            "-> declared (anti-gel, spec T3) : %s",
+            len(ids), ids,
+        )
+        if len(ids) < size:
+            break
+
+    # Poser aussi 75 à 90 % pour ne pas déclencher l'avertissement à 75 % en retard.
+    warned = {}
+    for pct, pending, flags in (
+        (90, Q(antigel_warned_90=False), {'antigel_warned_90': True, 'antigel_warned_75': True}),
+        (75, Q(antigel_warned_75=False), {'antigel_warned_75': True}),
+    ):
+        warned[pct] = 0
+        # Un incident au-delà du délai est rétabli, jamais averti (verrouillé
+        # ailleurs pendant la première passe, il le sera au prochain passage).
+        qs = taken.filter(pending, _antigel_elapsed(now, pct / 100)).exclude(_antigel_elapsed(now, 1))
+        while True:
+            with transaction.atomic():
+                ids = _claim_ids(qs, size)
+                if not ids:
+                    break
+                Incident.objects.filter(pk__in=ids).update(**flags)
+                _notify_antigel_leaders(
+                    Incident.objects.filter(pk__in=ids).select_related('taken_by'), pct)
+                deadlines.resync_incidents(ids)
+            warned[pct] += len(ids)
+            if len(ids) < size:
+                break
+
+    return {"reverted": reverted, "warned_75": warned[75], "warned_90": warned[90]}
+
+
+def _notify_antigel_leaders(incidents, pct):
+    """Notifie les leaders (incident.taken_by) qu'un seuil anti-gel est atteint.
+
+    Même schéma que ReportToAdminView : une notification par incident, créées en
+    lot (colaboration=None, message tronqué à 255 car.) avec leur email. Sans
+    leader (taken_by nul), on ne crée rien (le drapeau est posé par l'appelant
+    pour éviter tout re-déclenchement).
     """
-    leader = incident.taken_by
-    if leader is None:
-        return
-    titre = incident.title or incident.zone
-    message = (
-        f"Anti-gel : l'incident « {titre} » a atteint {pct} % "
-        f"du délai de prise en compte ({deadline_days} j). Agissez pour éviter "
-        f"son retour automatique en « Déclaré »."
-    )[:255]
-    Notification.objects.create(user=leader, notif_type='deadline_warning',
-                                message=message, colaboration=None, incident=incident)
+    items = []
+    for incident in incidents:
+        if incident.taken_by is None:
+            continue
+        deadline_days = _antigel_deadline_days(incident)
+        titre = incident.title or incident.zone
+        message = (
+            f"Anti-gel : l'incident « {titre} » a atteint {pct} % "
+            f"du délai de prise en compte ({deadline_days} j). Agissez pour éviter "
+            f"son retour automatique en « Déclaré »."
+        )[:255]
+        items.append((incident.taken_by, message, incident, {
+            'subject': "Anti-gel : échéance de prise en compte proche",
+            'template_name': 'emails/deadline_warning.html',
+            'context': {'incident_title': titre, 'percent': pct, 'deadline_days': deadline_days},
+        }))
+    notify_each('deadline_warning', items)
 
 
 @shared_task
+@buffered_broadcasts
 def purge_expired_trash():
     """Purge de la Corbeille à 30 j (spec D10).
 
-    Suppression DÉFINITIVE (.delete()) des incidents en corbeille (is_deleted=True)
-    dont la mise en corbeille (deleted_at) date de plus de 30 jours. Les
-    suppressions antérieures à l'ajout de deleted_at (timestamp nul) ne sont PAS
-    purgées — on ne supprime que ce qu'on peut dater de façon fiable.
+    Suppression DÉFINITIVE des incidents en corbeille (is_deleted=True) dont la
+    mise en corbeille (deleted_at) date de plus de 30 jours. Les suppressions
+    antérieures à l'ajout de deleted_at (timestamp nul) ne sont PAS purgées — on
+    ne supprime que ce qu'on peut dater de façon fiable.
+    Par lots (TRASH_PURGE_CHUNK_SIZE), une transaction courte par lot ; les
+    fichiers des lignes supprimées (photos, vidéos, audios, miniatures, preuves
+    de tâches, pièces jointes, rapports terrain…) sont retirés du stockage après
+    chaque lot (cf. services/purge.py).
     Idempotent : les lignes purgées disparaissent ; relancer ne refait rien.
     """
     cutoff = timezone.now() - timedelta(days=30)
@@ -297,22 +423,33 @@ def purge_expired_trash():
         deleted_at__isnull=False,
         deleted_at__lt=cutoff,
     )
-    purged_ids = list(qs.values_list('pk', flat=True))
-    count = 0
-    with transaction.atomic():
-        for incident in qs:
-            incident.delete()
-            count += 1
-            logger.info(
-                "purge_expired_trash: incident=%s purgé définitivement "
-                "(deleted_at antérieur à %s)",
-                incident.pk, cutoff,
-            )
-    return {"purged": count, "ids": purged_ids}
+    result = purge_incidents(qs)
+    logger.info(
+        "purge_expired_trash: %s incident(s) purgé(s) définitivement (deleted_at "
+        "antérieur à %s), %s fichier(s) supprimé(s) du stockage",
+        result['purged'], cutoff, result['files'],
+    )
+    return result
 
 
 @shared_task
-def auto_accept_overdue_assignments():
+def sweep_orphaned_storage():
+    """Balayage des buckets : supprime (ou met en quarantaine) les objets qu'aucune
+    ligne ne référence depuis STORAGE_SWEEP_GRACE_DAYS jours (cf.
+    services/storage_sweeper.py). Passage borné, repris au passage suivant.
+    """
+    stats = sweep_storage()
+    logger.info(
+        "sweep_orphaned_storage: %s objet(s) parcouru(s), %s orphelin(s), %s récupéré(s) "
+        "(%s octets)",
+        stats['scanned'], stats['orphans'], stats['reclaimed'], stats['bytes'],
+    )
+    return stats
+
+
+@shared_task
+@buffered_broadcasts
+def auto_accept_overdue_assignments(ids=None):
     """Acceptation tacite des assignations d'organisation à 72 h (spec D4).
 
     Toute IncidentOrgAssignment 'pending' dont la deadline est dépassée passe
@@ -322,40 +459,189 @@ def auto_accept_overdue_assignments():
     taken_in_charge_at). taken_by est fixé à un Admin de l'organisation s'il en
     existe un (l'org engage via l'un de ses Admins). Idempotent : ne sélectionne
     que les lignes encore 'pending' avec une échéance passée.
+
+    Par lot : un UPDATE des assignations, une lecture des Admins de toutes les
+    organisations concernées, un UPDATE des incidents par Admin retenu. ``ids`` :
+    restreint le passage à ces assignations (échéances échues).
     """
     now = timezone.now()
-    qs = IncidentOrgAssignment.objects.select_related(
-        'incident', 'organisation'
-    ).filter(
+    qs = IncidentOrgAssignment.objects.filter(
         status=ORG_ASSIGNMENT_PENDING,
         deadline__lt=now,
-    )
+    ).order_by('deadline')
+    if ids is not None:
+        qs = qs.filter(pk__in=list(ids))
+    size = _lifecycle_batch_size()
     count = 0
-    for assignment in qs:
-        assignment.status = ORG_ASSIGNMENT_ACCEPTED
-        assignment.responded_at = now
-        assignment.save(update_fields=['status', 'responded_at'])
-
-        # Engager l'incident : taken_by = un Admin de l'org cible si disponible.
-        org_admin = assignment.organisation.members.filter(
-            org_role=ORG_ROLE_ADMIN
-        ).first()
-        incident = assignment.incident
-        if incident.etat == DECLARED:
-            incident.etat = TAKEN
-            incident.taken_by = org_admin
-            incident.taken_in_charge_at = now
-            incident.save(update_fields=['etat', 'taken_by', 'taken_in_charge_at'])
-
-        count += 1
+    while True:
+        with transaction.atomic():
+            ids = _claim_ids(qs, size)
+            if not ids:
+                break
+            IncidentOrgAssignment.objects.filter(pk__in=ids).update(
+                status=ORG_ASSIGNMENT_ACCEPTED, responded_at=now)
+
+            # Première assignation (par échéance) de chaque incident du lot.
+            targets = {}
+            for incident_id, organisation_id in (
+                IncidentOrgAssignment.objects.filter(pk__in=ids)
+                .order_by('deadline').values_list('incident_id', 'organisation_id')
+            ):
+                targets.setdefault(incident_id, organisation_id)
+            # Engager l'incident : taken_by = un Admin de l'org cible si disponible
+            # (le premier, comme ``organisation.members.filter(...).first()``).
+            admins = {}
+            for organisation_id, user_id in (
+                User.objects.filter(organisation_member_id__in=set(targets.values()),
+                                    org_role=ORG_ROLE_ADMIN)
+                .order_by('pk').values_list('organisation_member_id', 'pk')
+            ):
+                admins.setdefault(organisation_id, user_id)
+            declared = set(
+                Incident.objects.select_for_update()
+                .filter(pk__in=list(targets), etat=DECLARED).values_list('pk', flat=True)
+            )
+            by_admin = {}
+            for incident_id in declared:
+                by_admin.setdefault(admins.get(targets[incident_id]), []).append(incident_id)
+            for admin_id, incident_ids in by_admin.items():
+                Incident.objects.filter(pk__in=incident_ids).update(
+                    etat=TAKEN, taken_by_id=admin_id, taken_in_charge_at=now)
+            _push_markers(declared)
+            deadlines.cancel_assignments(ids)
+            # Incidents engagés : premier seuil anti-gel planifié.
+            deadlines.resync_incidents(declared)
+        count += len(ids)
         logger.info(
-            "auto_accept_overdue_assignments: assignation=%s acceptée tacitement "
-            "(deadline=%s) -> incident %s engagé",
-            assignment.pk, assignment.deadline, incident.pk,
+            "auto_accept_overdue_assignments: %s assignation(s) acceptée(s) tacitement, "
+            "%s incident(s) engagé(s) : %s",
+            len(ids), len(declared), ids,
         )
+        if len(ids) < size:
+            break
     return {"accepted": count}
 
 
+@shared_task
+@buffered_broadcasts
+def dispatch_due_deadlines():
+    """Traite les échéances échues de la file Redis triée (services/deadlines.py).
+
+    Lancée chaque minute : une lecture ZRANGEBYSCORE, sans scan de table. Chaque
+    type d'échéance est traité par sa tâche Beat restreinte aux objets échus ;
+    en cas d'erreur, les échéances sont réinscrites pour le passage suivant.
+    """
+    handlers = {
+        deadlines.VALIDATION: auto_validate_overdue_resolutions,
+        deadlines.ANTIGEL: revert_stale_taken_incidents,
+        deadlines.ASSIGNMENT: auto_accept_overdue_assignments,
+    }
+    try:
+        due = deadlines.pop_due()
+    except REDIS_ERRORS as exc:
+        logger.warning("dispatch_due_deadlines: file indisponible (%s)", exc)
+        return {}
+    results, pending = {}, dict(due)
+    for kind, ids in due.items():
+        handler = handlers.get(kind)
+        if handler is None:
+            logger.warning("dispatch_due_deadlines: type d'échéance inconnu %r", kind)
+        else:
+            try:
+                results[kind] = handler(ids=ids)
+            except Exception:
+                deadlines.requeue(pending)
+                raise
+        pending.pop(kind)
+    # Antigel : une entrée échue sans effet (seuil déplacé entre-temps) est replanifiée.
+    deadlines.resync_incidents(due.get(deadlines.ANTIGEL, []))
+    return results
+
+
+@shared_task
+def rebuild_deadline_schedule():
+    """Réinscrit toutes les échéances en cours dans la file Redis (réparation)."""
+    return deadlines.rebuild()
+
+
+@shared_task
+def repair_activity_counters():
+    """Réconciliation périodique des compteurs du flux d'activité.
+
+    Les totaux par périmètre et les watermarks « vu » sont maintenus par
+    incréments ; les suppressions d'actions et changements d'organisation n'y
+    sont pas répercutés en direct. Recalcule tout depuis UserAction.
+    Idempotent : une seconde exécution ne corrige plus rien.
+    """
+    fixed = repair_counters()
+    if fixed['scopes'] or fixed['watermarks']:
+        logger.info("repair_activity_counters: %s", fixed)
+    return fixed
+
+
+@shared_task
+def repair_task_counters():
+    """Réconciliation des compteurs de tâches / progression des incidents.
+
+    Maintenus par incréments F() à chaque sauvegarde ou suppression de tâche ;
+    ce recalcul complet rattrape les écritures hors modèle (``QuerySet.update``,
+    SQL manuel). Retourne le nombre d'incidents corrigés.
+    """
+    fixed = refresh_task_counters()
+    if fixed:
+        logger.info("repair_task_counters: %s incident(s) corrigé(s)", fixed)
+    return fixed
+
+
+@shared_task
+def flush_activity_log():
+    """Écrit les actions journalisées en différé (file Redis) par lots
+    d'``ACTIVITY_LOG_BATCH_SIZE``, jusqu'à vider la file."""
+    batch_size = int(getattr(settings, 'ACTIVITY_LOG_BATCH_SIZE', 500))
+    written = 0
+    try:
+        while True:
+            count = flush_pending_activity(batch_size)
+            written += count
+            if count < batch_size:
+                break
+    except REDIS_ERRORS as exc:
+        logger.warning("flush_activity_log: file Redis indisponible (%s)", exc)
+    return written
+
+
+@shared_task
+def flush_email_outbox():
+    """Envoie les emails dus de l'outbox, par lots d'``EMAIL_BATCH_SIZE``.
+
+    Chaque lot réutilise une seule connexion SMTP ; la boucle s'arrête dès
+    qu'un lot est incomplet (file vide). Les échecs sont replanifiés avec
+    backoff et repris par l'exécution périodique de cette tâche.
+    """
+    batch_size = int(getattr(settings, 'EMAIL_BATCH_SIZE', 200))
+    totals = {'sent': 0, 'failed': 0, 'retrying': 0}
+    while True:
+        result = deliver_pending(batch_size)
+        for key in totals:
+            totals[key] += result[key]
+        if sum(result.values()) < batch_size or result['sent'] == 0:
+            break
+    if any(totals.values()):
+        logger.info("flush_email_outbox: %s", totals)
+    return totals
+
+
+@shared_task
+def send_email_digests(frequency):
+    """Résumés périodiques (``hourly`` / ``daily``) : un email par destinataire
+    ayant opté pour ce mode, puis envoi immédiat du lot."""
+    created = build_digests(frequency)
+    if created:
+        logger.info("send_email_digests(%s): %s résumé(s)", frequency, created)
+        flush_email_outbox()
+    return created
+
+
 # --- Legacy code, kept for reference -----------------------------------------
 # from celery import shared_task
 # from django_http_exceptions import HTTPExceptions
@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from Mapapi.models import ActivityFeedCounter, ActivityFeedWatermark, Organisation, UserAction
+from Mapapi.services.activity_counts import feed_counts, mark_seen, repair_counters
+from Mapapi.tasks import repair_activity_counters
+
+User = get_user_model()
+
+
+@patch('Mapapi.signals.relay_activity')
+class ActivityFeedCounterTests(TestCase):
+    def setUp(self):
+        self.org_a = Organisation.objects.create(name='Org A', subdomain='orga')
+        self.org_b = Organisation.objects.create(name='Org B', subdomain='orgb')
+        self.viewer = User.objects.create_user(email='viewer@test.com', password='testpass123',
+                                               organisation_member=self.org_a)
+        self.colleague = User.objects.create_user(email='colleague@test.com', password='testpass123',
+                                                  organisation_member=self.org_a)
+        self.other = User.objects.create_user(email='other@test.com', password='testpass123',
+                                              organisation_member=self.org_b)
+
+    def _act(self, user, n=1):
+        for i in range(n):
+            UserAction.objects.create(user=user, action=f'action {i}')
+
+    def test_counts_exclude_own_organisation(self, _):
+        self._act(self.other, 2)
+        self._act(self.colleague)
+        self.assertEqual(feed_counts(self.viewer),
+                         {'total_count': 2, 'unseen_count': 2, 'seen_count': 0})
+        # Les lignes de compteurs existent : les actions suivantes sont incrémentales.
+        self._act(self.other)
+        self._act(self.colleague)
+        self.assertEqual(feed_counts(self.viewer)['total_count'], 3)
+
+    def test_mark_seen_resets_unseen(self, _):
+        self._act(self.other, 2)
+        mark_seen(self.viewer)
+        self.assertEqual(feed_counts(self.viewer)['unseen_count'], 0)
+        self._act(self.other)
+        self._act(self.colleague)
+        self.assertEqual(feed_counts(self.viewer),
+                         {'total_count': 3, 'unseen_count': 1, 'seen_count': 2})
+
+    def test_repair_fixes_drift(self, _):
+        self._act(self.other, 2)
+        feed_counts(self.viewer)
+        ActivityFeedCounter.objects.filter(scope='all').update(total=99)
+        self.assertEqual(repair_counters()['scopes'], 1)
+        self.assertEqual(feed_counts(self.viewer)['total_count'], 2)
+        self.assertEqual(repair_activity_counters(), {'scopes': 0, 'watermarks': 0})
+
+    def test_repair_recomputes_watermarks_in_one_pass(self, _):
+        self._act(self.other, 2)
+        mark_seen(self.viewer)
+        self._act(self.colleague)
+        mark_seen(self.other)
+        self._act(self.other)  # postérieure aux deux consultations
+        ActivityFeedWatermark.objects.update(seen_total=0, seen_org_total=0)
+        self.assertEqual(repair_counters()['watermarks'], 2)
+        self.assertEqual(
+            sorted(ActivityFeedWatermark.objects.values_list('user_id', 'seen_total', 'seen_org_total')),
+            sorted([(self.viewer.pk, 2, 0), (self.other.pk, 3, 2)]))
+        self.assertEqual(feed_counts(self.other)['unseen_count'], 0)
+        self.assertEqual(repair_counters(), {'scopes': 0, 'watermarks': 0})
+
+    def test_activity_feed_endpoints(self, _):
+        self._act(self.other)
+        client = APIClient()
+        client.force_authenticate(user=self.viewer)
+        response = client.get(reverse('activity-feed'))
+        self.assertEqual(response.data['unseen_count'], 1)
+        client.post(reverse('activity-feed-mark-seen'))
+        response = client.get(reverse('activity-feed'))
+        self.assertEqual(response.data['unseen_count'], 0)
+        self.assertEqual(response.data['seen_count'], 1)
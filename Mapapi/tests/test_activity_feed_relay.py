@@ -0,0 +1,43 @@
+from unittest.mock import MagicMock, patch
+
+import redis
+from django.test import TestCase
+
+from Mapapi.models import Organisation
+from Mapapi.services.activity_feed import ALL_GROUP, relay_activity, viewer_group
+
+
+class ActivityFeedRelayTests(TestCase):
+    def setUp(self):
+        self.org1 = Organisation.objects.create(name='Org 1', subdomain='org1')
+        self.org2 = Organisation.objects.create(name='Org 2', subdomain='org2')
+
+    def _relayed_groups(self, payload):
+        with patch('Mapapi.services.activity_feed.ws_broadcast') as mock_broadcast:
+            relay_activity(payload)
+        return [c.args[0] for c in mock_broadcast.call_args_list]
+
+    @patch('Mapapi.services.activity_feed.get_redis')
+    def test_relay_skips_origin_organisation(self, mock_get_redis):
+        mock_get_redis.return_value.hgetall.return_value = {
+            str(self.org1.pk).encode(): b'2',
+            str(self.org2.pk).encode(): b'1',
+        }
+        groups = self._relayed_groups({'event': 'activity', 'organisation_id': str(self.org1.pk)})
+        self.assertEqual(set(groups), {ALL_GROUP, viewer_group(self.org2.pk)})
+
+    @patch('Mapapi.services.activity_feed.get_redis')
+    def test_relay_only_targets_connected_organisations(self, mock_get_redis):
+        mock_get_redis.return_value.hgetall.return_value = {}
+        groups = self._relayed_groups({'event': 'activity', 'organisation_id': None})
+        self.assertEqual(groups, [ALL_GROUP])
+
+    @patch('Mapapi.services.activity_feed.get_redis')
+    def test_relay_falls_back_to_all_organisations_without_redis(self, mock_get_redis):
+        mock_get_redis.return_value = MagicMock(hgetall=MagicMock(side_effect=redis.ConnectionError()))
+        groups = self._relayed_groups({'event': 'activity', 'organisation_id': str(self.org2.pk)})
+        self.assertEqual(set(groups), {ALL_GROUP, viewer_group(self.org1.pk)})
+
+    def test_viewer_group(self):
+        self.assertEqual(viewer_group(None), ALL_GROUP)
+        self.assertEqual(viewer_group(self.org1.pk), f"activity_feed_org_{self.org1.pk}")
@@ -0,0 +1,141 @@
+import json
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import redis
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from Mapapi.models import Organisation, UserAction
+from Mapapi.services.activity_counts import feed_counts
+from Mapapi.services.activity_log import PROCESSING_KEY, QUEUE_KEY, flush_pending, log_activity
+
+User = get_user_model()
+
+
+class FakeRedis:
+    """Listes et SET NX en mémoire (pipeline = exécution différée)."""
+
+    def __init__(self):
+        self.data, self.queued = {}, []
+
+    def rpush(self, key, *values):
+        self.data.setdefault(key, []).extend(v.encode() for v in values)
+
+    def lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    def lmove(self, source, destination, src_side, dest_side):
+        self.queued.append(('lmove', source, destination))
+
+    def _lmove(self, source, destination):
+        if not self.data.get(source):
+            return None
+        item = self.data[source].pop(0)
+        if not self.data[source]:
+            del self.data[source]  # Redis supprime une liste vide
+        self.data.setdefault(destination, []).append(item)
+        return item
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        queued, self.queued = self.queued, []
+        return [self._lmove(source, destination) for _, source, destination in queued]
+
+
+class ActivityLogTests(TestCase):
+    def setUp(self):
+        self.org = Organisation.objects.create(name='Org A', subdomain='orga')
+        self.actor = User.objects.create_user(email='actor@test.com', password='testpass123',
+                                              organisation_member=self.org)
+        self.viewer = User.objects.create_user(email='viewer@test.com', password='testpass123')
+
+    @patch('Mapapi.services.activity_log.schedule_flush')
+    @patch('Mapapi.services.activity_log.get_redis')
+    def test_log_is_queued_after_commit(self, mock_get_redis, mock_schedule):
+        with self.captureOnCommitCallbacks(execute=True):
+            action = log_activity(self.actor, "a pris en charge l'incident «X».")
+            mock_get_redis.return_value.rpush.assert_not_called()
+        key, entry = mock_get_redis.return_value.rpush.call_args.args
+        self.assertEqual(key, QUEUE_KEY)
+        self.assertEqual(json.loads(entry)['id'], str(action.id))
+        self.assertFalse(UserAction.objects.exists())
+        mock_schedule.assert_called_once()
+
+    @patch('Mapapi.signals.relay_activity')
+    @patch('Mapapi.services.activity_log.get_redis')
+    def test_sync_fallback_without_redis(self, mock_get_redis, _):
+        mock_get_redis.return_value = MagicMock(rpush=MagicMock(side_effect=redis.ConnectionError()))
+        with self.captureOnCommitCallbacks(execute=True):
+            action = log_activity(self.actor, 'action')
+        self.assertTrue(UserAction.objects.filter(pk=action.id).exists())
+
+    def _entries(self, count, logged_at):
+        return [
+            json.dumps({'id': f'00000000-0000-0000-0000-00000000000{i}', 'user': str(self.actor.pk),
+                        'action': f'action {i}', 'created_at': logged_at.isoformat()})
+            for i in range(count)
+        ]
+
+    @patch('Mapapi.services.activity_log.active_organisations', return_value=set())
+    @patch('Mapapi.services.activity_log.relay_activity')
+    @patch('Mapapi.services.activity_log.get_redis')
+    def test_flush_writes_batch_with_original_timestamps(self, mock_get_redis, mock_relay, _):
+        fake = mock_get_redis.return_value = FakeRedis()
+        feed_counts(self.viewer)  # crée les compteurs : le flush les incrémente
+        logged_at = timezone.now() - timedelta(minutes=5)
+        fake.rpush(QUEUE_KEY, *self._entries(3, logged_at))
+        # SELECT acteurs + SELECT déjà écrites + INSERT + UPDATE horodatages
+        # + UPDATE compteurs (+ savepoint).
+        with self.assertNumQueries(7):
+            self.assertEqual(flush_pending(), 3)
+        self.assertEqual(UserAction.objects.filter(created_at=logged_at).count(), 3)
+        self.assertEqual(feed_counts(self.viewer)['total_count'], 3)
+        payloads = [c.args[0] for c in mock_relay.call_args_list]
+        self.assertEqual({p['organisation_name'] for p in payloads}, {'Org A'})
+        self.assertEqual(fake.data, {})  # file, liste en cours et verrou vidés
+
+    @patch('Mapapi.services.activity_log.active_organisations', return_value=set())
+    @patch('Mapapi.services.activity_log.relay_activity')
+    @patch('Mapapi.services.activity_log.get_redis')
+    def test_interrupted_batch_is_resumed_without_double_counting(self, mock_get_redis, mock_relay, _):
+        fake = mock_get_redis.return_value = FakeRedis()
+        feed_counts(self.viewer)
+        logged_at = timezone.now() - timedelta(minutes=5)
+        fake.rpush(QUEUE_KEY, *self._entries(3, logged_at))
+        with patch('Mapapi.services.activity_log.record_actions', side_effect=RuntimeError('worker tué')):
+            with self.assertRaises(RuntimeError):
+                flush_pending()
+        self.assertEqual(len(fake.data[PROCESSING_KEY]), 3)
+        self.assertFalse(UserAction.objects.exists())
+
+        # Une des actions a déjà été écrite (ex. commit juste avant l'arrêt).
+        first = json.loads(fake.data[PROCESSING_KEY][0])
+        UserAction.objects.bulk_create([UserAction(id=first['id'], user=self.actor, action=first['action'])])
+        fake.rpush(QUEUE_KEY, *self._entries(1, logged_at))  # arrivée suivante, non concernée
+        self.assertEqual(flush_pending(), 2)
+        self.assertEqual(UserAction.objects.count(), 3)
+        self.assertEqual(mock_relay.call_count, 2)
+        self.assertNotIn(PROCESSING_KEY, fake.data)
+        self.assertEqual(len(fake.data[QUEUE_KEY]), 1)
+
+    @patch('Mapapi.services.activity_log.get_redis')
+    def test_concurrent_flush_is_skipped(self, mock_get_redis):
+        fake = mock_get_redis.return_value = FakeRedis()
+        fake.set('activity:flush:running', 1)
+        fake.rpush(QUEUE_KEY, *self._entries(1, timezone.now()))
+        self.assertEqual(flush_pending(), 0)
+        self.assertEqual(len(fake.data[QUEUE_KEY]), 1)
@@ -9,7 +9,8 @@ from django.conf import settings
 
 from Mapapi.models import (
     User, Zone, Category, Incident, Indicateur, 
-    Evenement, Communaute, Collaboration, PasswordReset, Message, ResponseMessage, Rapport
+    Evenement, Communaute, Collaboration, PasswordReset, Message, ResponseMessage, Rapport,
+    OutboundEmail,
 )
 from django.core.mail import send_mail
 from unittest.mock import patch
@@ -1067,8 +1068,10 @@ class IncidentAPIViewTests(APITestCase):
         self.assertEqual(self.incident.etat, 'resolved')
         self.assertEqual(self.incident.title, 'Updated Incident Title')
         
-        # Check email was sent
-        mock_send.assert_called_once()
+        # Email mis en file (outbox), pas d'envoi SMTP pendant la requête
+        mock_send.assert_not_called()
+        self.assertTrue(OutboundEmail.objects.filter(
+            to_email=self.user.email, template_name='mail_incident_resolu.html').exists())
     
     @patch('Mapapi.views.EmailMultiAlternatives.send')
     def test_update_incident_status_to_in_progress(self, mock_send):
@@ -1092,8 +1095,10 @@ class IncidentAPIViewTests(APITestCase):
         self.assertEqual(self.incident.etat, 'in_progress')
         self.assertEqual(self.incident.description, 'Updated description')
         
-        # Check email was sent
-        mock_send.assert_called_once()
+        # Email mis en file (outbox), pas d'envoi SMTP pendant la requête
+        mock_send.assert_not_called()
+        self.assertTrue(OutboundEmail.objects.filter(
+            to_email=self.user.email, template_name='mail_incident_trait.html').exists())
     
     def test_update_incident_invalid_data(self):
         """Test updating an incident with invalid data"""
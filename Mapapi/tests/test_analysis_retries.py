@@ -0,0 +1,81 @@
+from io import BytesIO
+from unittest.mock import MagicMock, patch
+
+import requests
+from celery.exceptions import Retry
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from Mapapi.models import AnalysisDeadLetter, Incident, Prediction, PredictionStatus
+from Mapapi.services import dead_letters
+from Mapapi.tasks import analyze_incident_with_model_task
+
+User = get_user_model()
+
+
+@override_settings(ANALYSIS_MAX_RETRIES=2, MODEL_DEPLOY_ANALYZE_URL='http://model/analyze')
+class AnalysisRetryTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(email='user@test.com', password='testpass123')
+        incident = Incident.objects.create(title='A', zone='Bamako', user_id=user)
+        Incident.objects.filter(pk=incident.pk).update(photo='incidents/a.jpg')
+        self.prediction = Prediction.objects.create(incident=incident)
+        storage = Incident._meta.get_field('photo').storage
+        patcher = patch.object(storage, 'open', side_effect=lambda *args: BytesIO(b'img'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_task(self):
+        return analyze_incident_with_model_task.apply(args=[self.prediction.pk])
+
+    @patch('Mapapi.tasks.requests.post', side_effect=requests.exceptions.ConnectionError('down'))
+    def test_transient_failure_is_retrying_not_failed(self, _):
+        with patch.object(analyze_incident_with_model_task, 'retry', side_effect=Retry()) as retry:
+            self.run_task()
+        self.prediction.refresh_from_db()
+        self.assertEqual(self.prediction.status, PredictionStatus.RETRYING)
+        self.assertFalse(AnalysisDeadLetter.objects.exists())
+        self.assertLessEqual(retry.call_args.kwargs['countdown'], 30)
+
+    @patch('Mapapi.tasks.requests.post', side_effect=requests.exceptions.ConnectionError('down'))
+    def test_exhausted_retries_record_dead_letter(self, post):
+        self.run_task()
+        self.prediction.refresh_from_db()
+        self.assertEqual(self.prediction.status, PredictionStatus.FAILED)
+        self.assertEqual(post.call_count, 3)
+        letter = self.prediction.dead_letter
+        self.assertEqual(letter.attempts, 3)
+        self.assertIn('down', letter.last_error)
+        self.assertEqual(letter.payload['photo'], 'incidents/a.jpg')
+
+    @patch('Mapapi.tasks.requests.post')
+    def test_client_error_is_not_retried(self, post):
+        post.return_value.raise_for_status.side_effect = requests.exceptions.HTTPError(
+            response=MagicMock(status_code=422))
+        self.run_task()
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(AnalysisDeadLetter.objects.get().attempts, 1)
+
+    @patch('Mapapi.tasks.requests.post')
+    def test_malformed_json_is_not_retried(self, post):
+        post.return_value.json.side_effect = requests.exceptions.JSONDecodeError('Expecting value', '<html>', 0)
+        self.run_task()
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(AnalysisDeadLetter.objects.get().attempts, 1)
+
+    @patch('Mapapi.tasks.analyze_incident_with_model_task.delay')
+    def test_replay_requeues_dead_letters(self, delay):
+        dead_letters.dead_letter(self.prediction, 3, 'down')
+        with self.captureOnCommitCallbacks(execute=True):
+            count = dead_letters.replay(AnalysisDeadLetter.objects.all())
+        self.assertEqual(count, 1)
+        delay.assert_called_once_with(self.prediction.pk)
+        self.prediction.refresh_from_db()
+        self.assertEqual(self.prediction.status, PredictionStatus.PENDING)
+        self.assertEqual(AnalysisDeadLetter.objects.get().replay_count, 1)
+
+    @override_settings(ANALYSIS_RETRY_BASE_DELAY=10, ANALYSIS_RETRY_MAX_DELAY=60)
+    def test_backoff_grows_with_jitter_and_cap(self):
+        for retries, (low, high) in enumerate([(5, 10), (10, 20), (20, 40), (30, 60), (30, 60)]):
+            delay = dead_letters.retry_delay(retries)
+            self.assertTrue(low <= delay <= high, (retries, delay))
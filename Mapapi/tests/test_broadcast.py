@@ -0,0 +1,91 @@
+import uuid
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+
+from Mapapi.consumers import ActivityFeedConsumer, TaskConsumer
+from Mapapi.services.broadcast import broadcast_buffer, ws_broadcast
+
+
+class BroadcastBufferTests(TestCase):
+    def setUp(self):
+        self.layer = MagicMock()
+        self.layer.group_send = AsyncMock()
+        patcher = patch('Mapapi.services.broadcast.get_channel_layer', return_value=self.layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        replay_patcher = patch('Mapapi.services.broadcast.record_events')
+        replay_patcher.start()
+        self.addCleanup(replay_patcher.stop)
+
+    def _sent(self):
+        return [(c.args[0], c.args[1]['payload']) for c in self.layer.group_send.call_args_list]
+
+    def test_unbuffered_broadcast_is_sent_immediately(self):
+        task_id = uuid.uuid4()
+        ws_broadcast('tasks_1', {'event': 'task_updated', 'id': task_id})
+        self.assertEqual(self._sent(), [('tasks_1', {'event': 'task_updated', 'id': str(task_id)})])
+
+    def test_buffer_coalesces_events_per_group_at_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with broadcast_buffer():
+                ws_broadcast('tasks_1', {'event': 'task_updated', 'id': 'a', 'state': 'todo'})
+                ws_broadcast('tasks_1', {'event': 'task_updated', 'id': 'b', 'state': 'todo'})
+                ws_broadcast('tasks_1', {'event': 'task_updated', 'id': 'a', 'state': 'done'})
+                ws_broadcast('notifications_1', {'event': 'notification', 'id': 'n'})
+                self.layer.group_send.assert_not_called()
+
+        sent = dict(self._sent())
+        self.assertEqual(sent['tasks_1'], {'event': 'batch', 'items': [
+            {'event': 'task_updated', 'id': 'a', 'state': 'done'},
+            {'event': 'task_updated', 'id': 'b', 'state': 'todo'},
+        ]})
+        # Un seul événement pour le groupe : pas de trame groupée.
+        self.assertEqual(sent['notifications_1'], {'event': 'notification', 'id': 'n'})
+
+    def test_nested_buffers_flush_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with broadcast_buffer():
+                with broadcast_buffer():
+                    ws_broadcast('tasks_1', {'event': 'task_deleted', 'id': 'a'})
+                ws_broadcast('tasks_1', {'event': 'task_deleted', 'id': 'b'})
+        self.assertEqual(self.layer.group_send.call_count, 1)
+        self.assertEqual(len(self._sent()[0][1]['items']), 2)
+
+    @patch('Mapapi.services.broadcast.async_to_sync', side_effect=Exception('redis down'))
+    def test_broadcast_errors_are_swallowed(self, _):
+        ws_broadcast('tasks_1', {'event': 'task_deleted', 'id': 'a'})
+
+
+class BatchConsumerTests(TestCase):
+    def _consumer(self, cls, query_string=b'', org_id=None):
+        consumer = cls()
+        consumer.scope = {'query_string': query_string,
+                          'user': MagicMock(organisation_member_id=org_id)}
+        consumer.send_json = AsyncMock()
+        return consumer
+
+    def test_batch_is_unpacked_by_default(self):
+        consumer = self._consumer(TaskConsumer)
+        payload = {'event': 'batch', 'items': [{'event': 'task_deleted', 'id': 'a'},
+                                               {'event': 'task_deleted', 'id': 'b'}]}
+        async_to_sync(consumer.broadcast)({'type': 'broadcast', 'payload': payload})
+        self.assertEqual(consumer.send_json.await_count, 2)
+
+    def test_batch_is_forwarded_when_client_opts_in(self):
+        consumer = self._consumer(TaskConsumer, query_string=b'batch=1')
+        payload = {'event': 'batch', 'items': [{'event': 'task_deleted', 'id': 'a'},
+                                               {'event': 'task_deleted', 'id': 'b'}]}
+        async_to_sync(consumer.broadcast)({'type': 'broadcast', 'payload': payload})
+        consumer.send_json.assert_awaited_once_with(payload)
+
+    def test_activity_batch_is_filtered_per_item(self):
+        consumer = self._consumer(ActivityFeedConsumer, org_id='org-1')
+        payload = {'event': 'batch', 'items': [
+            {'event': 'activity', 'id': 'a', 'organisation_id': 'org-1'},
+            {'event': 'activity', 'id': 'b', 'organisation_id': 'org-2'},
+        ]}
+        async_to_sync(consumer.broadcast)({'type': 'broadcast', 'payload': payload})
+        consumer.send_json.assert_awaited_once_with(
+            {'event': 'activity', 'id': 'b', 'organisation_id': 'org-2'})
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from backend.celery import DEFAULT_QUEUE, QUEUES, TASK_ROUTES, app
+
+
+class CeleryRoutingTests(SimpleTestCase):
+    def route(self, name):
+        return app.amqp.router.route({}, name)
+
+    def test_workloads_use_dedicated_queues(self):
+        self.assertEqual(self.route('Mapapi.tasks.analyze_incident_with_model_task')['queue'].name, 'analysis')
+        self.assertEqual(self.route('Mapapi.Send_mails.send_email')['queue'].name, 'notifications')
+        self.assertEqual(self.route('Mapapi.tasks.dispatch_due_deadlines')['queue'].name, 'lifecycle')
+        self.assertEqual(self.route('Mapapi.tasks.purge_expired_trash')['queue'].name, 'media')
+
+    def test_transactional_email_outranks_digests(self):
+        # Redis : 0 = la plus urgente.
+        self.assertLess(self.route('Mapapi.Send_mails.send_email')['priority'],
+                        self.route('Mapapi.tasks.send_email_digests')['priority'])
+
+    def test_unrouted_task_uses_default_queue(self):
+        self.assertEqual(self.route('backend.celery.debug_task')['queue'].name, DEFAULT_QUEUE)
+
+    def test_every_beat_task_is_routed(self):
+        for entry in settings.CELERY_BEAT_SCHEDULE.values():
+            self.assertIn(TASK_ROUTES.get(entry['task'], {}).get('queue'), QUEUES, entry['task'])
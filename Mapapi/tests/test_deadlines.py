@@ -0,0 +1,81 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from Mapapi.models import DECLARED, IN_VALIDATION, RESOLVED_DEFINITIVE, SEVERITY_HIGH, TAKEN, Incident
+from Mapapi.services import deadlines
+from Mapapi.tasks import dispatch_due_deadlines
+
+User = get_user_model()
+
+
+@patch('Mapapi.signals.push_marker')
+@patch('Mapapi.services.deadlines.get_redis')
+class DeadlineSchedulerTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.leader = User.objects.create_user(email='leader@test.com', password='testpass123')
+
+    def _incident(self, **kwargs):
+        return Incident.objects.create(title='Inondation', zone='Bamako', user_id=self.leader, **kwargs)
+
+    def _pipe(self, mock_get_redis):
+        return mock_get_redis.return_value.pipeline.return_value
+
+    def test_validation_deadline_scheduled_then_cancelled(self, mock_get_redis, _):
+        deadline = self.now + timedelta(hours=72)
+        with self.captureOnCommitCallbacks(execute=True):
+            incident = self._incident(etat=IN_VALIDATION, validation_deadline=deadline)
+        pipe = self._pipe(mock_get_redis)
+        pipe.zadd.assert_called_once_with(deadlines.QUEUE_KEY, {f'validation:{incident.pk}': deadline.timestamp()})
+
+        pipe.reset_mock()
+        incident = Incident.objects.get(pk=incident.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            incident.title = 'Renommé'
+            incident.save()
+        pipe.zrem.assert_not_called()  # aucun champ d'échéance modifié
+
+        with self.captureOnCommitCallbacks(execute=True):
+            incident.etat = RESOLVED_DEFINITIVE
+            incident.save()
+        pipe.zrem.assert_any_call(deadlines.QUEUE_KEY, f'validation:{incident.pk}')
+
+    def test_antigel_eta_follows_warning_flags(self, *_):
+        taken_at = self.now - timedelta(days=1)
+        incident = Incident(severity=SEVERITY_HIGH, taken_in_charge_at=taken_at)
+        self.assertEqual(deadlines.antigel_eta(incident), taken_at + timedelta(days=22.5))
+        incident.antigel_warned_75 = True
+        self.assertEqual(deadlines.antigel_eta(incident), taken_at + timedelta(days=27))
+        incident.antigel_warned_90 = True
+        self.assertEqual(deadlines.antigel_eta(incident), taken_at + timedelta(days=30))
+
+    def test_pop_due_only_returns_removed_members(self, mock_get_redis, _):
+        redis = mock_get_redis.return_value
+        redis.zrangebyscore.return_value = [b'validation:a', b'antigel:b']
+        self._pipe(mock_get_redis).execute.return_value = [1, 0]  # b pris par un autre worker
+        self.assertEqual(deadlines.pop_due(), {'validation': ['a']})
+
+    @patch('Mapapi.tasks.push_marker')
+    def test_dispatch_processes_only_due_objects(self, _, mock_get_redis, __):
+        due = self._incident(etat=IN_VALIDATION, validation_deadline=self.now - timedelta(minutes=1))
+        other = self._incident(etat=IN_VALIDATION, validation_deadline=self.now - timedelta(minutes=1))
+        stale = self._incident(etat=DECLARED)
+        with patch('Mapapi.tasks.deadlines.pop_due',
+                   return_value={'validation': [str(due.pk), str(stale.pk)]}):
+            results = dispatch_due_deadlines()
+        self.assertEqual(results, {'validation': {'validated': 1}})
+        self.assertEqual(Incident.objects.get(pk=due.pk).etat, RESOLVED_DEFINITIVE)
+        self.assertEqual(Incident.objects.get(pk=other.pk).etat, IN_VALIDATION)  # filet de sécurité
+
+    def test_dispatch_requeues_on_failure(self, mock_get_redis, _):
+        incident = self._incident(etat=TAKEN, taken_in_charge_at=self.now)
+        with patch('Mapapi.tasks.deadlines.pop_due', return_value={'antigel': [str(incident.pk)]}), \
+                patch('Mapapi.tasks.revert_stale_taken_incidents', side_effect=RuntimeError), \
+                patch('Mapapi.tasks.deadlines.requeue') as mock_requeue:
+            with self.assertRaises(RuntimeError):
+                dispatch_due_deadlines()
+        mock_requeue.assert_called_once_with({'antigel': [str(incident.pk)]})
@@ -0,0 +1,104 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from Mapapi.models import TASK_DONE, Incident, IncidentTask, Notification, SyncTombstone
+from Mapapi.services import delta_sync
+
+User = get_user_model()
+
+
+@override_settings(SYNC_WATERMARK_LAG=0)
+@patch('Mapapi.signals._ws_broadcast')
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='sync@test.com', password='testpass123')
+        self.other = User.objects.create_user(email='other@test.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.existing = Incident.objects.create(title='Ancien', zone='Bamako', user_id=self.user)
+        self.trashed = Incident.objects.create(title='Corbeille', zone='Bamako', user_id=self.user)
+        self.purged = Incident.objects.create(title='Purgé', zone='Bamako', user_id=self.user)
+
+    def changes(self, since=None):
+        params = {'since': since} if since else {}
+        return self.client.get(reverse('sync-changes'), params)
+
+    def test_without_since_returns_initial_watermark(self, _):
+        response = self.changes()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['reset'])
+        self.assertTrue(response.data['watermark'].endswith('Z'))
+        self.assertNotIn('incidents', response.data)
+
+    def test_only_changes_since_watermark_are_returned(self, _):
+        since = self.changes().data['watermark']
+        created = Incident.objects.create(title='Nouveau', zone='Kayes', user_id=self.other)
+        # UPDATE en masse : horodaté par ChangeTrackedQuerySet.
+        Incident.objects.filter(pk=self.existing.pk).update(etat='in_progress')
+        self.trashed.is_deleted = True
+        self.trashed.save(update_fields=['is_deleted'])
+        purged_pk = self.purged.pk  # delete() remet pk à None
+        self.purged.delete()
+        mine = Notification.objects.create(user=self.user, message='pour moi')
+        theirs = Notification.objects.create(user=self.other, message='pas pour moi')
+        theirs.delete()
+
+        response = self.changes(since)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['reset'])
+        incidents = response.data['incidents']
+        self.assertEqual([row['id'] for row in incidents['created']], [str(created.pk)])
+        self.assertEqual([row['id'] for row in incidents['updated']], [str(self.existing.pk)])
+        self.assertEqual(incidents['updated'][0]['etat'], 'in_progress')
+        self.assertEqual(incidents['deleted'], sorted([str(self.trashed.pk), str(purged_pk)]))
+        notifications = response.data['notifications']
+        self.assertEqual([row['id'] for row in notifications['created']], [str(mine.pk)])
+        self.assertEqual(notifications['deleted'], [])
+
+        again = self.changes(response.data['watermark']).data
+        self.assertEqual(again['incidents'], {'created': [], 'updated': [], 'deleted': []})
+
+    def test_save_with_update_fields_bumps_updated_at(self, _):
+        before = Incident.objects.get(pk=self.existing.pk).updated_at
+        self.existing.severity = 'high'
+        self.existing.save(update_fields=['severity'])
+        self.assertGreater(Incident.objects.get(pk=self.existing.pk).updated_at, before)
+
+    def test_progress_from_bulk_task_operations_is_a_change(self, _):
+        Incident.objects.filter(pk=self.existing.pk).update(taken_by=self.user)
+        task = IncidentTask.objects.create(incident=self.existing, title='Curage', created_by=self.other,
+                                           state=TASK_DONE, start_date=date.today(), end_date=date.today())
+        since = self.changes().data['watermark']
+        with patch('Mapapi.services.task_bulk.ws_broadcast'):
+            response = self.client.post(reverse('incident-task-bulk', args=[self.existing.pk]),
+                                        {'confirm': [str(task.pk)]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        updated = self.changes(since).data['incidents']['updated']
+        self.assertEqual([row['id'] for row in updated], [str(self.existing.pk)])
+        self.assertEqual(updated[0]['progress'], 100)
+
+    def test_stale_watermark_or_large_backlog_requires_reset(self, _):
+        stale = delta_sync.format_watermark(timezone.now() - timedelta(days=31))
+        self.assertTrue(self.changes(stale).data['reset'])
+        since = delta_sync.format_watermark(timezone.now() - timedelta(hours=1))
+        with override_settings(SYNC_CHANGES_MAX=2):
+            self.assertTrue(self.changes(since).data['reset'])
+        self.assertFalse(self.changes(since).data['reset'])
+
+    def test_invalid_watermark_is_rejected(self, _):
+        self.assertEqual(self.changes('hier').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_old_tombstones_are_pruned(self, _):
+        self.purged.delete()
+        SyncTombstone.objects.update(deleted_at=timezone.now() - timedelta(days=31))
+        existing_pk = self.existing.pk
+        self.existing.delete()
+        self.assertEqual(delta_sync.prune_tombstones(), 1)
+        self.assertEqual(list(SyncTombstone.objects.values_list('object_id', flat=True)), [existing_pk])
@@ -0,0 +1,122 @@
+import hashlib
+import io
+import json
+import zipfile
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from Mapapi.models import ASSIGNMENT_IN_PROGRESS, ORG_ROLE_FIELD, Incident, IncidentAssignment, IncidentTask
+from Mapapi.services import field_bundle
+
+User = get_user_model()
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes = {}
+
+    def hmget(self, key, *fields):
+        values = self.hashes.get(key, {})
+        return [values.get(field) for field in fields]
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(
+            {field: value if isinstance(value, bytes) else value.encode() for field, value in mapping.items()})
+
+    def expire(self, key, ttl):
+        pass
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+
+    def pipeline(self):
+        return self
+
+    def execute(self):
+        pass
+
+
+@patch('Mapapi.signals._ws_broadcast')
+@patch('backend.supabase_storage.SupabaseStorage.open', side_effect=lambda name, mode='rb': ContentFile(b'jpeg'))
+class FieldBundleTests(TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = patch('Mapapi.services.field_bundle.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.agent = User.objects.create_user(email='terrain@test.com', password='testpass123')
+        User.objects.filter(pk=self.agent.pk).update(org_role=ORG_ROLE_FIELD)
+        self.agent.refresh_from_db()
+        self.incident = Incident.objects.create(title='Dépôt', zone='Kayes', user_id=self.agent,
+                                                thumbnail='incidents/thumbnails/thumb.jpg')
+        self.assignment = IncidentAssignment.objects.create(
+            incident=self.incident, agent=self.agent, deadline=timezone.now() + timedelta(days=2))
+        IncidentTask.objects.create(incident=self.incident, title='Nettoyer', created_by=self.agent,
+                                    start_date=date.today(), end_date=date.today())
+        self.client = APIClient()
+        self.client.force_authenticate(self.agent)
+
+    def download(self, **headers):
+        return self.client.get(reverse('field-bundle'), **headers)
+
+    def test_bundle_contains_assignments_tasks_and_thumbnails(self, *_):
+        response = self.download()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        archive = zipfile.ZipFile(io.BytesIO(response.content))
+        manifest = json.loads(archive.read('bundle.json'))
+        self.assertEqual([row['id'] for row in manifest['assignments']], [str(self.assignment.pk)])
+        thumbnail = f"thumbnails/{self.incident.pk}.jpg"
+        self.assertEqual(manifest['incidents'][0]['thumbnail'], thumbnail)
+        self.assertEqual(archive.read(thumbnail), b'jpeg')
+        self.assertEqual([task['title'] for task in manifest['tasks']], ['Nettoyer'])
+        self.assertEqual(response['ETag'], f'"{hashlib.sha1(response.content).hexdigest()}"')
+
+    def test_cached_bundle_is_reused_until_assignment_changes(self, *_):
+        etag = self.download()['ETag']
+        with patch('Mapapi.services.field_bundle.build', wraps=field_bundle.build) as build:
+            self.assertEqual(self.download(HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+            build.assert_not_called()
+            self.assignment.status = ASSIGNMENT_IN_PROGRESS
+            self.assignment.save()
+            self.assertEqual(self.redis.hashes, {})
+            response = self.download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        build.assert_called_once()
+
+    def test_interrupted_download_can_resume(self, *_):
+        full = self.download()
+        etag, content = full['ETag'], full.content
+        self.redis.hashes.clear()  # reconstruit à l'identique (zip déterministe)
+        response = self.download(HTTP_RANGE='bytes=10-', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response.content, content[10:])
+        self.assertEqual(response['Content-Range'], f"bytes 10-{len(content) - 1}/{len(content)}")
+        stale = self.download(HTTP_RANGE='bytes=10-', HTTP_IF_RANGE='"ancienne"')
+        self.assertEqual(stale.status_code, status.HTTP_200_OK)
+        self.assertEqual(stale.content, content)
+        beyond = self.download(HTTP_RANGE=f'bytes={len(content)}-')
+        self.assertEqual(beyond.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_rebuild_without_thumbnail_does_not_resume_old_bundle(self, storage_open, _):
+        full = self.download()
+        self.redis.hashes.clear()
+        storage_open.side_effect = OSError('stockage injoignable')
+        response = self.download(HTTP_RANGE='bytes=10-', HTTP_IF_RANGE=full['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], full['ETag'])
+        manifest = json.loads(zipfile.ZipFile(io.BytesIO(response.content)).read('bundle.json'))
+        self.assertIsNone(manifest['incidents'][0]['thumbnail'])
+
+    def test_reserved_to_field_agents(self, *_):
+        self.client.force_authenticate(User.objects.create_user(email='citoyen@test.com', password='x'))
+        self.assertEqual(self.download().status_code, status.HTTP_403_FORBIDDEN)
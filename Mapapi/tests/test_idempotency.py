@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+import redis
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from Mapapi.models import Incident
+from Mapapi.services.idempotency import IN_PROGRESS
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.redis = FakeRedis()
+        patcher = patch('Mapapi.services.idempotency.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def declare(self, key=None, **data):
+        payload = {'title': 'Inondation', 'zone': 'Bamako', **data}
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post(reverse('incident'), payload, format='json', **headers)
+
+    def test_retry_returns_original_response(self):
+        first = self.declare('c0ffee')
+        second = self.declare('c0ffee')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.json()['id'], str(first.data['id']))
+        self.assertEqual(Incident.objects.count(), 1)
+
+    def test_requests_without_key_are_not_deduplicated(self):
+        self.declare()
+        self.declare()
+        self.assertEqual(Incident.objects.count(), 2)
+
+    def test_concurrent_request_gets_conflict(self):
+        self.redis.data[f"idempotency:anon:{reverse('incident')}:k1"] = IN_PROGRESS
+        response = self.declare('k1')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Incident.objects.exists())
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.assertEqual(self.declare('k4').status_code, status.HTTP_201_CREATED)
+        response = self.declare('k4', title='Incendie')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Incident.objects.count(), 1)
+        self.redis.data[f"idempotency:anon:{reverse('incident')}:k5"] = f"{IN_PROGRESS}:autre"
+        self.assertEqual(self.declare('k5').status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_error_response_releases_key(self):
+        self.assertEqual(self.declare('k2', zone='').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.declare('k2').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Incident.objects.count(), 1)
+
+    def test_redis_outage_executes_request(self):
+        with patch('Mapapi.services.idempotency.get_redis', side_effect=redis.ConnectionError):
+            self.assertEqual(self.declare('k3').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Incident.objects.count(), 1)
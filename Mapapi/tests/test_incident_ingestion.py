@@ -0,0 +1,79 @@
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from Mapapi.models import Incident, IncidentIngestion, Prediction, PredictionStatus, Zone
+from Mapapi.services import ingestion
+
+User = get_user_model()
+
+
+class IncidentIngestionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@test.com', password='testpass123')
+        self.client = APIClient()
+
+    def declare(self):
+        with patch('Mapapi.services.ingestion.launch') as launch, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('incident'), {
+                'title': 'Dépôt sauvage', 'zone': 'Sikasso', 'user_id': self.user.id,
+                'lattitude': '11.3', 'longitude': '-5.6',
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        incident = Incident.objects.get(title='Dépôt sauvage')
+        launch.assert_called_once_with(incident.pk)
+        return incident
+
+    def test_post_only_persists_incident(self):
+        incident = self.declare()
+        self.assertEqual(set(incident.ingestion.stages.values()), {ingestion.PENDING})
+        self.assertFalse(Zone.objects.filter(name='Sikasso').exists())
+        self.assertFalse(Prediction.objects.filter(incident=incident).exists())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.points, 0)
+
+    def test_stages_run_once(self):
+        incident = self.declare()
+        for stage in ingestion.STAGES:
+            ingestion.run_stage(incident.pk, stage)
+        ingestion.run_stage(incident.pk, ingestion.POINTS)  # chaîne relancée : sans effet
+
+        self.assertTrue(Zone.objects.filter(name='Sikasso').exists())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.points, 1)
+        self.assertEqual(incident.prediction.status, PredictionStatus.FAILED)  # pas de photo
+        state = IncidentIngestion.objects.get(incident=incident)
+        self.assertEqual(state.stages, {
+            'zone': 'done', 'points': 'done', 'analysis': 'skipped',
+            'thumbnail': 'skipped', 'video': 'skipped',
+        })
+        self.assertIsNotNone(state.completed_at)
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('incident-ingestion', args=[incident.pk]))
+        self.assertEqual(response.data['stages']['points'], 'done')
+
+    def test_failed_stage_is_recorded_and_chain_continues(self):
+        incident = self.declare()
+        with patch.dict(ingestion.HANDLERS, {ingestion.ZONE: MagicMock(side_effect=ValueError('boom'))}):
+            self.assertEqual(ingestion.run_stage(incident.pk, ingestion.ZONE), ingestion.FAILED)
+        self.assertEqual(ingestion.run_stage(incident.pk, ingestion.POINTS), ingestion.DONE)
+        state = IncidentIngestion.objects.get(incident=incident)
+        self.assertEqual(state.errors, {'zone': 'boom'})
+        self.assertIsNone(state.completed_at)
+
+    @patch('Mapapi.services.ingestion.launch')
+    def test_stalled_ingestions_are_resumed(self, launch):
+        incident = self.declare()
+        ingestion.run_stage(incident.pk, ingestion.ZONE)
+        IncidentIngestion.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(ingestion.resume_stalled(), 1)
+        launch.assert_called_once_with(incident.pk, ['points', 'analysis', 'thumbnail', 'video'])
+        self.assertEqual(ingestion.resume_stalled(), 0)  # relancée : pas deux fois de suite
@@ -0,0 +1,92 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from Mapapi.models import (
+    Collaboration, Incident, IncidentOrgAssignment, Notification, Organisation, OutboundEmail,
+    COLLAB_STATUS_ACCEPTED, COLLAB_STATUS_TERMINATED, DECLARED, IN_VALIDATION,
+    ORG_ASSIGNMENT_ACCEPTED, ORG_ROLE_ADMIN, RESOLVED_DEFINITIVE, SEVERITY_HIGH, SEVERITY_LOW, TAKEN,
+)
+from Mapapi.tasks import (
+    auto_accept_overdue_assignments, auto_validate_overdue_resolutions, revert_stale_taken_incidents,
+)
+
+User = get_user_model()
+
+
+@patch('Mapapi.services.notifications.ws_broadcast')
+@patch('Mapapi.tasks.push_marker')
+class LifecycleTaskTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.leader = User.objects.create_user(email='leader@test.com', password='testpass123')
+
+    def _incident(self, **kwargs):
+        return Incident.objects.create(title='Inondation', zone='Bamako', user_id=self.leader, **kwargs)
+
+    def _taken(self, days_ago, severity=SEVERITY_HIGH, **kwargs):
+        return self._incident(etat=TAKEN, taken_by=self.leader, severity=severity,
+                              taken_in_charge_at=self.now - timedelta(days=days_ago), **kwargs)
+
+    @patch('Mapapi.tasks._lifecycle_batch_size', return_value=2)
+    def test_auto_validate_in_chunks(self, _, mock_marker, __):
+        # Incidents pris en charge par un leader joignable : sinon le signal de
+        # collaboration annule (supprime) la demande de l'organisation partenaire.
+        overdue = [self._incident(etat=IN_VALIDATION, taken_by=self.leader,
+                                  validation_deadline=self.now - timedelta(hours=1))
+                   for _ in range(3)]
+        pending = self._incident(etat=IN_VALIDATION, validation_deadline=self.now + timedelta(hours=1))
+        partner = Organisation.objects.create(name='Partenaire', subdomain='partenaire')
+        collaborator = User.objects.create_user(email='collab@test.com', password='testpass123',
+                                                organisation_member=partner, org_role=ORG_ROLE_ADMIN)
+        Collaboration.objects.create(incident=overdue[0], user=collaborator, status=COLLAB_STATUS_ACCEPTED)
+        self.assertTrue(Collaboration.objects.exists())
+
+        self.assertEqual(auto_validate_overdue_resolutions(), {"validated": 3})
+        self.assertEqual(auto_validate_overdue_resolutions(), {"validated": 0})
+        self.assertEqual(
+            set(Incident.objects.filter(etat=RESOLVED_DEFINITIVE, progress=100).values_list('pk', flat=True)),
+            {incident.pk for incident in overdue})
+        self.assertEqual(Incident.objects.get(pk=pending.pk).etat, IN_VALIDATION)
+        self.assertEqual(Collaboration.objects.get().status, COLLAB_STATUS_TERMINATED)
+        self.assertEqual(mock_marker.call_count, 3)
+
+    def test_antigel_thresholds_follow_severity(self, *_):
+        stale = self._taken(31)                          # Élevée : 30 j -> retour 'declared'
+        warn_90 = self._taken(28)                        # 28/30 > 90 %
+        warn_75 = self._taken(70, severity=SEVERITY_LOW)  # 70/90 > 75 %
+        default = self._taken(50, severity=None)          # 50/60 > 75 % (repli 60 j)
+        quiet = self._taken(10)
+        already = self._taken(28, antigel_warned_90=True, antigel_warned_75=True)
+
+        self.assertEqual(revert_stale_taken_incidents(), {"reverted": 1, "warned_75": 2, "warned_90": 1})
+        self.assertEqual(revert_stale_taken_incidents(), {"reverted": 0, "warned_75": 0, "warned_90": 0})
+        stale.refresh_from_db()
+        self.assertEqual((stale.etat, stale.taken_by, stale.taken_in_charge_at), (DECLARED, None, None))
+        self.assertTrue(Incident.objects.get(pk=warn_90.pk).antigel_warned_75)
+        warned = Notification.objects.filter(notif_type='deadline_warning')
+        self.assertEqual(set(warned.values_list('incident_id', flat=True)),
+                         {warn_90.pk, warn_75.pk, default.pk})
+        self.assertFalse(warned.filter(incident__in=[quiet, already]).exists())
+        self.assertEqual(OutboundEmail.objects.filter(category='deadline_warning').count(), 3)
+
+    def test_auto_accept_engages_declared_incidents(self, mock_marker, _):
+        org = Organisation.objects.create(name='Org', subdomain='org')
+        admin = User.objects.create_user(email='admin@org.com', password='testpass123',
+                                         organisation_member=org, org_role=ORG_ROLE_ADMIN)
+        declared = self._incident(etat=DECLARED)
+        engaged = self._taken(1)
+        for incident in (declared, engaged):
+            IncidentOrgAssignment.objects.create(incident=incident, organisation=org,
+                                                 deadline=self.now - timedelta(hours=1))
+
+        self.assertEqual(auto_accept_overdue_assignments(), {"accepted": 2})
+        self.assertEqual(auto_accept_overdue_assignments(), {"accepted": 0})
+        self.assertEqual(IncidentOrgAssignment.objects.filter(status=ORG_ASSIGNMENT_ACCEPTED).count(), 2)
+        declared.refresh_from_db()
+        self.assertEqual((declared.etat, declared.taken_by_id), (TAKEN, admin.pk))
+        self.assertEqual(Incident.objects.get(pk=engaged.pk).taken_by_id, self.leader.pk)
+        mock_marker.assert_called_once()
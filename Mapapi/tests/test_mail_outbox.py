@@ -0,0 +1,82 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from Mapapi.models import (
+    OutboundEmail, EMAIL_DIGEST, EMAIL_DIGESTED, EMAIL_FAILED, EMAIL_PENDING, EMAIL_SENT,
+)
+from Mapapi.services.mail import build_digests, deliver_pending, queue_emails, retry_failed
+from Mapapi.tasks import send_email_digests
+
+User = get_user_model()
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+@patch('Mapapi.services.mail.schedule_flush')
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.instant = User.objects.create_user(email='instant@test.com', password='testpass123')
+        self.hourly = User.objects.create_user(email='hourly@test.com', password='testpass123',
+                                               email_digest='hourly')
+
+    def test_dates_are_stored_as_rendered(self, _):
+        moment = timezone.now()
+        queue_emails('Sujet', 'emails/collaboration_request.html',
+                     {'incident_creation_date': moment, 'dates': [moment.date()]}, ['a@test.com'])
+        context = OutboundEmail.objects.get().context
+        self.assertEqual(context['incident_creation_date'], Template('{{ d }}').render(Context({'d': moment})))
+        self.assertEqual(context['dates'], [Template('{{ d }}').render(Context({'d': moment.date()}))])
+
+    def test_batch_renders_once_per_context(self, _):
+        recipients = [f'user{i}@test.com' for i in range(4)]
+        with self.captureOnCommitCallbacks(execute=True):
+            queue_emails('Sujet', 'emails/decline_email.html', {'incident_title': 'A'}, recipients)
+        with patch('Mapapi.services.mail.render_to_string', return_value='<p>x</p>') as mock_render:
+            result = deliver_pending()
+        self.assertEqual(result, {'sent': 4, 'failed': 0, 'retrying': 0})
+        mock_render.assert_called_once()
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertEqual(OutboundEmail.objects.filter(status=EMAIL_SENT).count(), 4)
+        self.assertEqual(deliver_pending(), {'sent': 0, 'failed': 0, 'retrying': 0})
+
+    @override_settings(EMAIL_MAX_ATTEMPTS=2)
+    def test_failures_are_retried_then_abandoned(self, _):
+        queue_emails('Sujet', 'emails/decline_email.html', {}, ['retry@test.com'])
+        with patch('Mapapi.services.mail.EmailMultiAlternatives.send', side_effect=OSError('smtp down')):
+            self.assertEqual(deliver_pending()['retrying'], 1)
+            email = OutboundEmail.objects.get()
+            self.assertEqual((email.status, email.attempts, email.last_error),
+                             (EMAIL_PENDING, 1, 'smtp down'))
+            # Pas encore dû (backoff).
+            self.assertEqual(deliver_pending()['retrying'], 0)
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(deliver_pending()['failed'], 1)
+        self.assertEqual(OutboundEmail.objects.get().status, EMAIL_FAILED)
+        self.assertEqual(retry_failed(OutboundEmail.objects.all()), 1)
+        self.assertEqual(deliver_pending()['sent'], 1)
+
+    def test_digest_preference_only_for_digest_categories(self, _):
+        queue_emails('Demande', 'emails/collaboration_request.html', {}, [self.instant, self.hourly],
+                     category='collaboration_request', summary='Org A souhaite collaborer')
+        queue_emails('Assignation', 'emails/agent_assignment_email.html', {}, [self.hourly],
+                     category='incident_assignment')
+        statuses = dict(OutboundEmail.objects.filter(category='collaboration_request')
+                        .values_list('to_email', 'status'))
+        self.assertEqual(statuses, {'instant@test.com': EMAIL_PENDING, 'hourly@test.com': EMAIL_DIGEST})
+        self.assertEqual(OutboundEmail.objects.get(category='incident_assignment').status, EMAIL_PENDING)
+
+    def test_digest_groups_per_recipient(self, _):
+        for i in range(3):
+            queue_emails(f'Demande {i}', 'emails/collaboration_request.html', {}, [self.hourly],
+                         category='collaboration_request', summary=f'Demande {i}')
+        self.assertEqual(build_digests('daily'), 0)
+        with patch('Mapapi.tasks.deliver_pending', return_value={'sent': 1, 'failed': 0, 'retrying': 0}):
+            self.assertEqual(send_email_digests('hourly'), 1)
+        digest = OutboundEmail.objects.get(category='digest')
+        self.assertEqual(digest.to_email, 'hourly@test.com')
+        self.assertEqual(len(digest.context['items']), 3)
+        self.assertEqual(OutboundEmail.objects.filter(status=EMAIL_DIGESTED).count(), 3)
@@ -0,0 +1,74 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from Mapapi.models import Incident
+from Mapapi.services.map_stream import (
+    MAP_GROUP, MARKER_CREATED, MARKER_DELETED, MARKER_UPDATED, MarkerFilter,
+)
+
+User = get_user_model()
+
+
+@patch('Mapapi.services.map_stream.ws_broadcast')
+class MapMarkerSignalTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='map@test.com', password='testpass123')
+
+    def _create(self):
+        return Incident.objects.create(
+            title='Dépôt sauvage', description='desc', zone='Bamako',
+            lattitude='12.63', longitude='-8.0', user_id=self.user,
+        )
+
+    def _events(self, mock_broadcast):
+        return [c.args[1]['event'] for c in mock_broadcast.call_args_list if c.args[0] == MAP_GROUP]
+
+    def test_create_update_and_delete_push_marker_diffs(self, mock_broadcast):
+        incident = self._create()
+        incident.etat = 'taken_into_account'
+        incident.save()
+        incident.delete()
+        self.assertEqual(self._events(mock_broadcast), [MARKER_CREATED, MARKER_UPDATED, MARKER_DELETED])
+        created = mock_broadcast.call_args_list[0].args[1]
+        self.assertEqual(created['lattitude'], '12.63')
+        self.assertIn('severity', created)
+
+    def test_save_without_marker_fields_is_silent(self, mock_broadcast):
+        incident = self._create()
+        mock_broadcast.reset_mock()
+        incident.save(update_fields=['progress'])
+        self.assertEqual(self._events(mock_broadcast), [])
+
+    def test_trash_is_a_deletion(self, mock_broadcast):
+        incident = self._create()
+        incident.is_deleted = True
+        incident.save(update_fields=['is_deleted'])
+        self.assertEqual(self._events(mock_broadcast)[-1], MARKER_DELETED)
+
+
+class MarkerFilterTests(TestCase):
+    def _payload(self, event=MARKER_UPDATED, etat='declared', lat='12.6', lng='-8.0'):
+        return {'event': event, 'id': 'x', 'etat': etat, 'lattitude': lat, 'longitude': lng}
+
+    def test_bbox_filters_created_markers(self):
+        marker_filter = MarkerFilter(bbox=[-9, 12, -7, 13])
+        self.assertIsNotNone(marker_filter.apply(self._payload(MARKER_CREATED)))
+        self.assertIsNone(marker_filter.apply(self._payload(MARKER_CREATED, lat='14.7', lng='-17.4')))
+
+    def test_update_leaving_scope_becomes_deletion(self):
+        marker_filter = MarkerFilter(scope='unresolved')
+        diff = marker_filter.apply(self._payload(etat='resolved'))
+        self.assertEqual(diff['event'], MARKER_DELETED)
+
+    def test_deletions_always_pass(self):
+        marker_filter = MarkerFilter(bbox=[0, 0, 1, 1], scope='resolved')
+        payload = {'event': MARKER_DELETED, 'id': 'x'}
+        self.assertEqual(marker_filter.apply(payload), payload)
+
+    def test_invalid_subscription(self):
+        with self.assertRaises(ValueError):
+            MarkerFilter(scope='nowhere')
+        with self.assertRaises(ValueError):
+            MarkerFilter(bbox=[1, 2, 3])
@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from Mapapi.models import Notification, NotificationCounter
+from Mapapi.services.notification_counts import apply_delta, get_counts
+from Mapapi.views.notification import NotificationViewSet
+
+User = get_user_model()
+
+
+@patch('Mapapi.services.notification_counts.ws_broadcast')
+class NotificationCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='badge@test.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _notify(self, read=False):
+        return Notification.objects.create(user=self.user, message='msg', read=read)
+
+    def test_counter_is_computed_lazily_then_incremented(self, _):
+        self._notify()
+        self._notify(read=True)
+        self.assertFalse(NotificationCounter.objects.filter(user=self.user).exists())
+        self.assertEqual(get_counts(self.user.id),
+                         {'unread_count': 1, 'read_count': 1, 'total_count': 2})
+        self._notify()
+        self.assertEqual(get_counts(self.user.id)['unread_count'], 2)
+
+    def test_counts_endpoint_and_push(self, mock_broadcast):
+        get_counts(self.user.id)
+        self._notify()
+        response = self.client.get(reverse('notification-counts'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['unread_count'], 1)
+        pushed = [c.args[1] for c in mock_broadcast.call_args_list]
+        self.assertEqual(pushed[-1]['event'], 'notification_counts')
+        self.assertEqual(pushed[-1]['total_count'], 1)
+
+    def test_partial_update_and_mark_all_read(self, _):
+        get_counts(self.user.id)
+        first = self._notify()
+        self._notify()
+        self.client.patch(reverse('notification-detail', args=[first.pk]), {'read': True}, format='json')
+        self.assertEqual(get_counts(self.user.id)['unread_count'], 1)
+        # Re-marquer comme lue ne décrémente pas deux fois.
+        self.client.patch(reverse('notification-detail', args=[first.pk]), {'read': True}, format='json')
+        self.assertEqual(get_counts(self.user.id)['unread_count'], 1)
+        self.client.post(reverse('notification-mark-all-read'))
+        self.assertEqual(get_counts(self.user.id),
+                         {'unread_count': 0, 'read_count': 2, 'total_count': 2})
+
+    def test_concurrent_mark_read_decrements_once(self, _):
+        get_counts(self.user.id)
+        notification = self._notify()
+        stale = Notification.objects.get(pk=notification.pk)
+        # Un autre clic l'a marquée lue entre le chargement et l'UPDATE.
+        Notification.objects.filter(pk=notification.pk).update(read=True)
+        apply_delta([self.user.id], unread=-1)
+        with patch.object(NotificationViewSet, 'get_object', return_value=stale):
+            response = self.client.patch(reverse('notification-detail', args=[notification.pk]),
+                                         {'read': True}, format='json')
+        self.assertTrue(response.data['read'])
+        self.assertEqual(get_counts(self.user.id)['unread_count'], 0)
+
+    def test_delete_decrements(self, _):
+        get_counts(self.user.id)
+        self._notify().delete()
+        self.assertEqual(get_counts(self.user.id)['total_count'], 0)
+
+    def test_list_exposes_counters(self, _):
+        self._notify()
+        response = self.client.get(reverse('notification'))
+        self.assertEqual(response.data['unread_count'], 1)
+        self.assertEqual(response.data['total_count'], 1)
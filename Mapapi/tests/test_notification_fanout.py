@@ -0,0 +1,54 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from Mapapi.models import Incident, Notification
+from Mapapi.services.notification_counts import get_counts
+from Mapapi.services.notifications import notify_users
+
+User = get_user_model()
+
+
+@patch('Mapapi.services.notifications.ws_broadcast')
+class NotifyUsersTests(TestCase):
+    def setUp(self):
+        self.admins = [
+            User.objects.create_user(email=f'admin{i}@test.com', password='testpass123')
+            for i in range(5)
+        ]
+        self.incident = Incident.objects.create(
+            title='Inondation', zone='Bamako', user_id=self.admins[0])
+
+    def test_constant_number_of_queries(self, mock_broadcast):
+        for admin in self.admins:
+            get_counts(admin.pk)
+        # INSERT groupé + UPDATE des compteurs + SELECT des compteurs (push), + savepoint.
+        with self.assertNumQueries(5):
+            notifications = notify_users(self.admins, 'incident_assignment', 'msg',
+                                         incident=self.incident)
+        self.assertEqual(len(notifications), 5)
+        self.assertEqual(Notification.objects.filter(notif_type='incident_assignment').count(), 5)
+        self.assertEqual(get_counts(self.admins[3].pk)['unread_count'], 1)
+        groups = {c.args[0] for c in mock_broadcast.call_args_list}
+        self.assertEqual(groups, {f"notifications_{a.pk}" for a in self.admins})
+
+    @patch('Mapapi.services.notifications.queue_emails')
+    def test_single_email_batch(self, mock_queue, _):
+        email = {'subject': 'Sujet', 'template_name': 'emails/x.html', 'context': {}}
+        notify_users(self.admins, 'incident_report', 'msg', email=email)
+        mock_queue.assert_called_once()
+        self.assertEqual(len(mock_queue.call_args.args[3]), 5)
+        self.assertEqual(mock_queue.call_args.kwargs['category'], 'incident_report')
+
+    @patch('Mapapi.services.notifications.queue_emails', side_effect=Exception('db down'))
+    def test_email_failure_rolls_back_notifications(self, _, __):
+        email = {'subject': 'Sujet', 'template_name': 'emails/x.html', 'context': {}}
+        with self.assertRaises(Exception):
+            notify_users(self.admins, 'incident_report', 'msg', email=email)
+        self.assertFalse(Notification.objects.filter(notif_type='incident_report').exists())
+
+    def test_duplicates_and_empty_recipients(self, _):
+        self.assertEqual(notify_users([], 'x', 'msg'), [])
+        notifications = notify_users([self.admins[0], self.admins[0], None], 'x', 'msg')
+        self.assertEqual(len(notifications), 1)
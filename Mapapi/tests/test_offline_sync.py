@@ -0,0 +1,108 @@
+import io
+import json
+import uuid
+import zipfile
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from Mapapi.models import (
+    ASSIGNMENT_REPORTED, ORG_ROLE_FIELD, FieldReport, Incident, IncidentAssignment, IncidentIngestion,
+)
+from Mapapi.services import offline_sync
+
+User = get_user_model()
+
+
+def make_bundle(manifest, files=None):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('manifest.json', json.dumps(manifest))
+        for name, content in (files or {}).items():
+            archive.writestr(name, content)
+    buffer.seek(0)
+    buffer.name = 'bundle.zip'
+    return buffer
+
+
+def png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4), 'red').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@patch('backend.supabase_storage.SupabaseStorage.save', side_effect=lambda name, content, max_length=None: name)
+class OfflineSyncTests(TestCase):
+    def setUp(self):
+        self.agent = User.objects.create_user(email='agent@test.com', password='testpass123')
+        User.objects.filter(pk=self.agent.pk).update(org_role=ORG_ROLE_FIELD)
+        self.agent.refresh_from_db()
+        self.assigned = Incident.objects.create(title='Assigné', zone='Kayes', user_id=self.agent)
+        IncidentAssignment.objects.create(incident=self.assigned, agent=self.agent,
+                                          deadline=timezone.now() + timedelta(days=1))
+        self.client = APIClient()
+        self.client.force_authenticate(self.agent)
+        self.incident_id, self.report_id = str(uuid.uuid4()), str(uuid.uuid4())
+        self.manifest = {
+            'incidents': [
+                {'id': self.incident_id, 'title': 'Hors ligne', 'zone': 'Kayes', 'photo': 'media/1.png'},
+                {'id': str(uuid.uuid4()), 'title': 'Sans photo', 'zone': 'Kayes', 'photo': 'media/absent.png'},
+            ],
+            'field_reports': [
+                {'id': self.report_id, 'incident': str(self.assigned.pk), 'notes': 'Sur place'},
+            ],
+        }
+
+    def sync(self):
+        bundle = make_bundle(self.manifest, {'media/1.png': png()})
+        return self.client.post(reverse('offline-sync'), {'bundle': bundle}, format='multipart')
+
+    def test_items_are_applied_with_per_item_results(self, _):
+        response = self.sync()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['status'] for r in response.data['results']], ['created', 'error', 'created'])
+        self.assertEqual(response.data['error'], 1)
+
+        incident = Incident.objects.get(pk=self.incident_id)
+        self.assertEqual(incident.user_id, self.agent)
+        self.assertEqual(incident.photo.name, 'incidents/1.png')
+        self.assertTrue(IncidentIngestion.objects.filter(incident=incident).exists())
+        self.assertEqual(FieldReport.objects.get(pk=self.report_id).incident, self.assigned)
+        self.assertEqual(IncidentAssignment.objects.get().status, ASSIGNMENT_REPORTED)
+
+    def test_resent_bundle_is_idempotent(self, storage_save):
+        self.sync()
+        uploads = storage_save.call_count
+        response = self.sync()
+        self.assertEqual([r['status'] for r in response.data['results']], ['duplicate', 'error', 'duplicate'])
+        self.assertEqual(storage_save.call_count, uploads)
+        self.assertEqual(Incident.objects.filter(title='Hors ligne').count(), 1)
+        self.assertEqual(FieldReport.objects.count(), 1)
+
+    def test_integrity_error_is_duplicate_only_for_own_existing_item(self, _):
+        item = {'id': self.incident_id, 'title': 'Hors ligne', 'zone': 'Kayes'}
+        with patch('Mapapi.services.offline_sync.start_ingestion', side_effect=IntegrityError):
+            result = offline_sync._apply('incident', offline_sync._sync_incident, None, item, self.agent)
+        self.assertEqual(result['status'], 'error')
+        self.assertFalse(Incident.objects.filter(pk=self.incident_id).exists())
+
+        other = User.objects.create_user(email='autre@test.com', password='testpass123')
+        Incident.objects.create(id=self.incident_id, title='Autre', zone='Kayes', user_id=other)
+        handler = Mock(side_effect=IntegrityError)
+        for owner, expected in ((other, 'error'), (self.agent, 'duplicate')):
+            Incident.objects.filter(pk=self.incident_id).update(user_id=owner)
+            result = offline_sync._apply('incident', handler, None, item, self.agent)
+            self.assertEqual(result['status'], expected)
+
+    def test_invalid_bundle_is_rejected(self, _):
+        response = self.client.post(reverse('offline-sync'), {'bundle': io.BytesIO(b'not a zip')},
+                                    format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
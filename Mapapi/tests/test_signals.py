@@ -45,7 +45,7 @@ class SignalTests(TestCase):
             taken_by=self.user2
         )
 
-    @patch('Mapapi.Send_mails.send_email.delay')
+    @patch('Mapapi.services.notifications.queue_emails')
     def test_collaboration_signal_success(self, mock_send_email):
         """Test successful collaboration signal handling"""
         # Create a collaboration with end_date
@@ -58,11 +58,12 @@ class SignalTests(TestCase):
         # Check if email was called
         mock_send_email.assert_called_once()
         
-        # Verify email arguments
-        call_args = mock_send_email.call_args[1]
-        self.assertEqual(call_args['subject'], 'Nouvelle demande de collaboration')
-        self.assertEqual(call_args['template_name'], 'emails/collaboration_request.html')
-        self.assertEqual(call_args['to_email'], self.user2.email)
+        # Verify email arguments (outbox : sujet, template, contexte, destinataires)
+        subject, template_name, _, recipients = mock_send_email.call_args[0]
+        self.assertEqual(subject, 'Nouvelle demande de collaboration')
+        self.assertEqual(template_name, 'emails/collaboration_request.html')
+        self.assertEqual([r.email for r in recipients], [self.user2.email])
+        self.assertEqual(mock_send_email.call_args[1]['category'], 'collaboration_request')
         
         # Check if notification was created
         notification = Notification.objects.filter(user=self.user2).first()
@@ -71,7 +72,7 @@ class SignalTests(TestCase):
         self.assertIn(self.incident.title, notification.message)
         self.assertEqual(notification.colaboration, collaboration)
 
-    @patch('Mapapi.Send_mails.send_email.delay')
+    @patch('Mapapi.services.notifications.queue_emails')
     def test_collaboration_signal_no_email(self, mock_send_email):
         """Test collaboration signal when user has no email"""
         # Create a new user with no email
@@ -105,7 +106,7 @@ class SignalTests(TestCase):
         # Verify no notification was created
         self.assertEqual(Notification.objects.count(), 0)
 
-    @patch('Mapapi.Send_mails.send_email.delay')
+    @patch('Mapapi.services.notifications.queue_emails')
     def test_collaboration_signal_email_error(self, mock_send_email):
         """Test collaboration signal handling when email sending fails"""
         # Make send_email raise an exception
@@ -0,0 +1,77 @@
+import json
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from Mapapi.models import Incident, StorageOrphan
+from Mapapi.services.storage_sweeper import sweep
+
+User = get_user_model()
+
+
+class FakeBucket:
+    def __init__(self, tree):
+        self.tree = tree
+        self.deleted = []
+
+    def list_page(self, prefix='', offset=0, limit=1000):
+        entries = [
+            {'name': name, 'id': None if size is None else name,
+             'metadata': None if size is None else {'size': size}}
+            for name, size in sorted(self.tree.get(prefix, {}).items())
+        ]
+        return entries[offset:offset + limit]
+
+    def delete_many(self, names):
+        for name in names:
+            prefix, _, leaf = name.rpartition('/')
+            del self.tree[prefix][leaf]
+        self.deleted.extend(names)
+        return []
+
+
+@patch('Mapapi.services.storage_sweeper.get_redis', return_value=MagicMock(get=MagicMock(return_value=None)))
+class StorageSweeperTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(email='user@test.com', password='testpass123')
+        incident = Incident.objects.create(title='A', zone='Bamako', user_id=user)
+        Incident.objects.filter(pk=incident.pk).update(photo='incidents/a.jpg')
+        self.bucket = FakeBucket({
+            '': {'incidents': None, 'orphan.jpg': 100, '.placeholder': 0},
+            'incidents': {'a.jpg': 10, 'b.jpg': 20, 'c.jpg': 30},
+        })
+        columns = [(Incident, Incident._meta.get_field('photo'))]
+        patcher = patch('Mapapi.services.storage_sweeper.bucket_columns',
+                        return_value={'images': (self.bucket, columns)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_orphans_are_reclaimed_after_grace_period(self, _):
+        with self.settings(STORAGE_SWEEP_PAGE_SIZE=2):
+            stats = sweep()
+            self.assertEqual(stats, {'scanned': 4, 'orphans': 3, 'reclaimed': 0, 'bytes': 0})
+            self.assertEqual(set(StorageOrphan.objects.values_list('name', flat=True)),
+                             {'orphan.jpg', 'incidents/b.jpg', 'incidents/c.jpg'})
+
+            StorageOrphan.objects.update(first_seen_at=timezone.now() - timedelta(days=8))
+            Incident.objects.update(photo='incidents/c.jpg')  # de nouveau référencé
+            stats = sweep()
+        # a.jpg, déréférencé, n'est qu'un nouvel orphelin ; c.jpg est de nouveau utilisé.
+        self.assertEqual(stats['orphans'], 3)
+        self.assertEqual(stats['reclaimed'], 2)
+        self.assertEqual(sorted(self.bucket.deleted), ['incidents/b.jpg', 'orphan.jpg'])
+        self.assertEqual(stats['bytes'], 120)
+        self.assertEqual(list(StorageOrphan.objects.values_list('name', flat=True)), ['incidents/a.jpg'])
+
+    def test_pass_is_bounded_and_resumes(self, mock_get_redis):
+        with self.settings(STORAGE_SWEEP_PAGE_SIZE=2):
+            stats = sweep(max_objects=1)
+        # Page 1 de la racine : .placeholder (ignoré) + dossier incidents, exploré
+        # aussitôt ; page 1 d'incidents : a.jpg, b.jpg -> borne atteinte.
+        self.assertEqual(stats['scanned'], 2)
+        cursor = json.loads(mock_get_redis.return_value.set.call_args.args[1])
+        # Reprise : suite d'incidents (c.jpg), puis suite de la racine (orphan.jpg).
+        self.assertEqual(cursor['stack'], [['', 2], ['incidents', 2]])
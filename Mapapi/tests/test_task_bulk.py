@@ -0,0 +1,90 @@
+from datetime import date
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from Mapapi.models import Incident, IncidentTask
+from Mapapi.services.task_progress import deferred_progress
+
+User = get_user_model()
+
+
+@patch('Mapapi.signals._ws_broadcast')
+@patch('Mapapi.services.task_bulk.ws_broadcast')
+class IncidentTaskBulkViewTests(TestCase):
+    def setUp(self):
+        self.leader = User.objects.create_user(email='leader@test.com', password='testpass123')
+        self.contributor = User.objects.create_user(email='contrib@test.com', password='testpass123')
+        self.incident = Incident.objects.create(title='Inondation', zone='Bamako',
+                                                user_id=self.leader, taken_by=self.leader)
+        self.pending = [
+            IncidentTask.objects.create(incident=self.incident, title=f'Proposée {i}',
+                                        created_by=self.contributor,
+                                        start_date=date.today(), end_date=date.today())
+            for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.leader)
+        self.url = reverse('incident-task-bulk', args=[self.incident.pk])
+
+    def _new(self, title):
+        return {'title': title, 'start_date': '2026-11-02', 'end_date': '2026-11-05'}
+
+    def test_applies_all_operations_and_recomputes_once(self, mock_broadcast, _):
+        payload = {
+            'create': [self._new('A'), self._new('B')],
+            'update': [{'id': str(self.pending[0].pk), 'title': 'Renommée'}],
+            'confirm': [str(self.pending[0].pk), str(self.pending[1].pk)],
+            'delete': [str(self.pending[2].pk)],
+        }
+        with patch('Mapapi.services.task_bulk.deferred_progress', wraps=deferred_progress) as deferred:
+            response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        deferred.assert_called_once()
+        self.assertEqual(len(response.data['created']), 2)
+        self.assertTrue(all(task['is_confirmed'] for task in response.data['created']))
+        self.assertEqual(response.data['deleted'], [self.pending[2].pk])
+        self.assertEqual(IncidentTask.objects.get(pk=self.pending[0].pk).title, 'Renommée')
+        self.incident.refresh_from_db()
+        self.assertEqual(self.incident.tasks_confirmed_count, 4)
+        self.assertEqual(response.data['progress'], 0)
+        events = [c.args[1]['event'] for c in mock_broadcast.call_args_list]
+        self.assertEqual(sorted(events), ['task_created'] * 2 + ['task_updated'] * 2)
+
+    def test_invalid_operation_rolls_back_everything(self, mock_broadcast, _):
+        payload = {
+            'create': [self._new('A'), {'title': 'Sans dates'}],
+            'delete': [str(self.pending[0].pk)],
+        }
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['create'][0], {})
+        self.assertIn('start_date', response.data['create'][1])
+        self.assertEqual(IncidentTask.objects.filter(incident=self.incident).count(), 3)
+        mock_broadcast.assert_not_called()
+
+    def test_conflicting_and_unknown_ids(self, *_):
+        other = Incident.objects.create(title='Autre', zone='Kayes', user_id=self.leader)
+        foreign = IncidentTask.objects.create(incident=other, title='X', created_by=self.leader,
+                                              start_date=date.today(), end_date=date.today())
+        payload = {
+            'confirm': [str(self.pending[0].pk), str(foreign.pk)],
+            'delete': [str(self.pending[0].pk)],
+        }
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('id', response.data['confirm'][1])
+        self.assertIn('id', response.data['delete'][0])
+
+    @patch('Mapapi.services.task_bulk.max_operations', return_value=2)
+    def test_operation_limit_and_permission(self, *_):
+        response = self.client.post(self.url, {'create': [self._new(str(i)) for i in range(3)]},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        client = APIClient()
+        client.force_authenticate(user=self.contributor)
+        response = client.post(self.url, {'create': [self._new('A')]}, format='json')
+        self.assertEqual(response.status_code, 403)
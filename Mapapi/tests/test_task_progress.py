@@ -0,0 +1,82 @@
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from Mapapi.models import Incident, IncidentTask, RESOLVED
+from Mapapi.services.task_progress import deferred_progress, refresh_task_counters
+
+User = get_user_model()
+
+
+class TaskProgressCounterTests(TestCase):
+    def setUp(self):
+        self.leader = User.objects.create_user(email='leader@test.com', password='testpass123')
+        self.contributor = User.objects.create_user(email='contrib@test.com', password='testpass123')
+        self.incident = Incident.objects.create(title='Inondation', zone='Bamako',
+                                                user_id=self.leader, taken_by=self.leader)
+
+    def _task(self, created_by, **kwargs):
+        return IncidentTask.objects.create(incident=self.incident, title='T', created_by=created_by,
+                                           start_date=date.today(), end_date=date.today(), **kwargs)
+
+    def test_leader_tasks_are_auto_confirmed_and_counted(self):
+        task = self._task(self.leader)
+        self.assertTrue(task.is_confirmed)
+        self.assertEqual(self.incident.tasks_confirmed_count, 1)
+        self._task(self.contributor)  # non confirmée : ne compte pas
+        task.state = 'done'
+        task.save()
+        self.assertEqual((self.incident.tasks_done_count, self.incident.progress), (1, 100))
+        self._task(self.leader, state='in_progress')
+        self._task(self.leader)
+        self.incident.refresh_from_db()
+        self.assertEqual((self.incident.tasks_confirmed_count, self.incident.progress), (3, 33))
+
+    def test_half_ratio_rounds_up_like_the_repair(self):
+        # 1/8 = 12,5 % : la mise à jour incrémentale et la réparation donnent 13.
+        self._task(self.leader, state='done')
+        for _ in range(7):
+            self._task(self.leader)
+        self.incident.refresh_from_db()
+        self.assertEqual(self.incident.progress, 13)
+        self.assertEqual(refresh_task_counters([self.incident.pk]), 0)
+
+    def test_confirm_and_delete_use_a_single_update(self):
+        task = self._task(self.contributor)
+        task = IncidentTask.objects.get(pk=task.pk)
+        task.is_confirmed = True
+        # UPDATE tâche + UPDATE compteurs (F()) : ni COUNT ni save() de l'incident.
+        with self.assertNumQueries(2):
+            task.save()
+        task.delete()
+        self.incident.refresh_from_db()
+        self.assertEqual((self.incident.tasks_confirmed_count, self.incident.progress), (0, 0))
+
+    def test_unchanged_contribution_skips_counter_update(self):
+        task = IncidentTask.objects.get(pk=self._task(self.leader).pk)
+        task.title = 'Renommée'
+        with self.assertNumQueries(1):
+            task.save()
+
+    def test_deferred_progress_recomputes_once(self):
+        with deferred_progress():
+            for _ in range(5):
+                self._task(self.leader, state='done')
+            self.incident.refresh_from_db()
+            self.assertEqual(self.incident.tasks_confirmed_count, 0)
+        self.incident.refresh_from_db()
+        self.assertEqual((self.incident.tasks_done_count, self.incident.progress), (5, 100))
+
+    def test_refresh_repairs_drift_and_closed_incidents(self):
+        self._task(self.leader)
+        Incident.objects.filter(pk=self.incident.pk).update(tasks_confirmed_count=7, progress=12)
+        self.assertEqual(refresh_task_counters(), 1)
+        self.assertEqual(refresh_task_counters(), 0)
+        self.incident.refresh_from_db()
+        self.incident.etat = RESOLVED
+        self.incident.save()
+        self.assertEqual(Incident.objects.get(pk=self.incident.pk).progress, 100)
+        self.incident.etat = 'in_progress'
+        self.incident.save()
+        self.assertEqual(Incident.objects.get(pk=self.incident.pk).progress, 0)
@@ -0,0 +1,79 @@
+from datetime import date
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save
+from django.test import TestCase
+
+from Mapapi.models import Collaboration, Incident, IncidentTask
+
+User = get_user_model()
+
+
+class TrackedFieldsMixinTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='tracked@test.com', password='testpass123')
+        self.incident = Incident.objects.create(title='Inondation', zone='Bamako', user_id=self.user)
+
+    def test_changes_are_tracked_without_queries(self):
+        incident = Incident.objects.get(pk=self.incident.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(incident.changed_fields, set())
+            incident.etat = 'in_progress'
+            incident.user_id = None
+            self.assertTrue(incident.has_changed('etat'))
+            self.assertEqual(incident.changed_fields, {'etat', 'user_id'})
+            self.assertEqual(incident.previous_value('etat'), 'declared')
+        incident.save()
+        self.assertEqual(incident.changed_fields, set())
+
+    def test_save_writes_only_dirty_fields(self):
+        incident = Incident.objects.get(pk=self.incident.pk)
+        # Modification concurrente d'un autre champ : elle n'est pas écrasée.
+        Incident.objects.filter(pk=incident.pk).update(zone='Kayes')
+        incident.severity = 'high'
+        seen = {}
+
+        def receiver(sender, instance, update_fields, **kwargs):
+            seen['update_fields'] = update_fields
+
+        post_save.connect(receiver, sender=Incident)
+        try:
+            incident.save()
+        finally:
+            post_save.disconnect(receiver, sender=Incident)
+        self.assertEqual(set(seen['update_fields']), {'severity', 'updated_at'})
+        self.assertEqual(Incident.objects.get(pk=incident.pk).zone, 'Kayes')
+
+    def test_auto_now_fields_are_always_saved(self):
+        task = IncidentTask.objects.create(incident=self.incident, title='T', created_by=self.user,
+                                           start_date=date.today(), end_date=date.today())
+        task = IncidentTask.objects.get(pk=task.pk)
+        before = task.updated_at
+        task.title = 'T2'
+        task.save()
+        task.refresh_from_db()
+        self.assertEqual(task.title, 'T2')
+        self.assertGreater(task.updated_at, before)
+        self.assertFalse(task.changed_fields)
+
+    @patch('Mapapi.signals._ws_broadcast')
+    @patch('Mapapi.signals.log_activity')
+    @patch('Mapapi.signals.notify_users')
+    def test_collaboration_status_change_without_refetch(self, _, mock_log, __):
+        other = User.objects.create_user(email='other@test.com', password='testpass123')
+        self.incident.taken_by = other
+        self.incident.save()
+        collaboration = Collaboration.objects.create(incident=self.incident, user=self.user)
+        collaboration = Collaboration.objects.select_related(
+            'incident__taken_by', 'user__organisation_member').get(pk=collaboration.pk)
+        mock_log.reset_mock()
+        collaboration.status = 'accepted'
+        # Un seul UPDATE : plus de SELECT de l'ancien statut en pre_save.
+        with self.assertNumQueries(1):
+            collaboration.save()
+        mock_log.assert_called_once()
+        self.assertIn('a accepté', mock_log.call_args.args[1])
+        collaboration.motivation = 'précision'
+        collaboration.save()
+        mock_log.assert_called_once()
@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from Mapapi.models import FieldReport, Incident, IncidentTask
+from Mapapi.tasks import purge_expired_trash
+
+User = get_user_model()
+
+
+@patch('Mapapi.signals.push_marker')
+@patch('Mapapi.signals._ws_broadcast')
+class PurgeExpiredTrashTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@test.com', password='testpass123')
+        old = timezone.now() - timedelta(days=31)
+        self.expired = [
+            Incident.objects.create(title=f'Ancien {i}', zone='Bamako', user_id=self.user,
+                                    is_deleted=True, deleted_at=old)
+            for i in range(3)
+        ]
+        Incident.objects.filter(pk=self.expired[0].pk).update(
+            photo='incidents/a.jpg', thumbnail='incidents/thumbnails/a.jpg', video='incidents/a.mp4')
+        IncidentTask.objects.create(incident=self.expired[0], title='T', created_by=self.user,
+                                    start_date=date.today(), end_date=date.today(),
+                                    proof_image='tasks/proofs/p.jpg')
+        FieldReport.objects.create(incident=self.expired[1], agent=self.user,
+                                   photo='field_reports/r.jpg')
+        self.recent = Incident.objects.create(title='Récent', zone='Bamako', user_id=self.user,
+                                              is_deleted=True, deleted_at=timezone.now())
+
+    @override_settings(TRASH_PURGE_CHUNK_SIZE=2)
+    @patch('backend.supabase_storage.SupabaseStorage.delete_many', autospec=True, return_value=[])
+    def test_chunked_purge_removes_cascaded_files(self, mock_delete_many, *_):
+        result = purge_expired_trash()
+        self.assertEqual(result['purged'], 3)
+        self.assertEqual(set(result['ids']), {incident.pk for incident in self.expired})
+        self.assertEqual(list(Incident.objects.all()), [self.recent])
+        self.assertFalse(IncidentTask.objects.exists())
+        removed = {}
+        for call in mock_delete_many.call_args_list:
+            storage, names = call.args
+            removed.setdefault(storage.bucket_name, set()).update(names)
+        self.assertEqual(removed, {
+            'images': {'incidents/a.jpg', 'incidents/thumbnails/a.jpg',
+                       'tasks/proofs/p.jpg', 'field_reports/r.jpg'},
+            'videos': {'incidents/a.mp4'},
+        })
+        self.assertEqual(result['files'], 5)
+        self.assertEqual(purge_expired_trash()['purged'], 0)
+
+    @patch('backend.supabase_storage.SupabaseStorage.delete_many', side_effect=RuntimeError('down'))
+    def test_storage_failure_does_not_undo_purge(self, *_):
+        result = purge_expired_trash()
+        self.assertEqual((result['purged'], result['files']), (3, 0))
+        self.assertEqual(Incident.objects.count(), 1)
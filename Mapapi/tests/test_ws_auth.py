@@ -0,0 +1,62 @@
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import redis
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.test import TransactionTestCase
+
+from Mapapi.roles import get_web_role
+from Mapapi.ws_auth import WSUser, _get_user
+
+User = get_user_model()
+
+
+class CachedWSUserTests(TransactionTestCase):
+    # _load_identity passe par database_sync_to_async (close_old_connections) :
+    # pas de bloc atomique de TestCase, sinon la connexion est fermée sous le test.
+    def setUp(self):
+        self.user = User.objects.create_user(email='ws@test.com', password='testpass123')
+        self.client_mock = MagicMock()
+        self.client_mock.get = AsyncMock(return_value=None)
+        self.client_mock.set = AsyncMock()
+        patcher = patch('Mapapi.ws_auth.get_async_redis', return_value=self.client_mock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cache_hit_skips_database(self):
+        self.client_mock.get.return_value = json.dumps({
+            'id': str(self.user.pk), 'organisation_member_id': None,
+            'org_role': 'org_admin', 'is_superuser': False, 'is_active': True,
+        })
+        with patch('Mapapi.ws_auth._load_identity', new_callable=AsyncMock) as mock_load:
+            identity = async_to_sync(_get_user)(self.user.pk)
+        mock_load.assert_not_awaited()
+        self.assertIsInstance(identity, WSUser)
+        self.assertTrue(identity.is_authenticated)
+        self.assertEqual(get_web_role(identity), 'org_admin')
+
+    def test_cache_miss_loads_and_stores_identity(self):
+        identity = async_to_sync(_get_user)(self.user.pk)
+        self.assertEqual(identity.id, str(self.user.pk))
+        self.client_mock.set.assert_awaited_once()
+        stored = json.loads(self.client_mock.set.await_args.args[1])
+        self.assertEqual(stored['id'], str(self.user.pk))
+
+    def test_inactive_user_is_anonymous(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsInstance(async_to_sync(_get_user)(self.user.pk), AnonymousUser)
+
+    def test_redis_unavailable_falls_back_to_database(self):
+        self.client_mock.get.side_effect = redis.ConnectionError()
+        identity = async_to_sync(_get_user)(self.user.pk)
+        self.assertEqual(identity.id, str(self.user.pk))
+        self.client_mock.set.assert_not_awaited()
+
+    @patch('Mapapi.signals.invalidate_cached_user')
+    def test_user_save_invalidates_cache(self, mock_invalidate):
+        self.user.first_name = 'Awa'
+        self.user.save()
+        mock_invalidate.assert_called_once_with(self.user.pk)
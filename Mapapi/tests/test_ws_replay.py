@@ -0,0 +1,82 @@
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import redis
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+
+from Mapapi.consumers import NotificationConsumer
+from Mapapi.services.replay import events_since, is_replayable, record_events
+
+
+class RecordEventsTests(TestCase):
+    @patch('Mapapi.services.replay.get_redis')
+    def test_replayable_events_get_an_event_id(self, mock_get_redis):
+        pipe = mock_get_redis.return_value.pipeline.return_value
+        pipe.execute.return_value = [b'1-0', b'1-1', True]
+        first, second = {'event': 'notification', 'id': 'a'}, {'event': 'notification', 'id': 'b'}
+        discussion = {'event': 'discussion_message', 'id': 'c'}
+        record_events([
+            ('notifications_1', {'event': 'batch', 'items': [first, second]}),
+            ('discussion_1', discussion),
+        ])
+        self.assertEqual(first['event_id'], '1-0')
+        self.assertEqual(second['event_id'], '1-1')
+        self.assertNotIn('event_id', discussion)
+        self.assertEqual(pipe.xadd.call_count, 2)
+
+    @patch('Mapapi.services.replay.get_redis')
+    def test_redis_errors_leave_events_unstamped(self, mock_get_redis):
+        mock_get_redis.return_value.pipeline.return_value.execute.side_effect = redis.ConnectionError()
+        item = {'event': 'task_updated', 'id': 'a'}
+        record_events([('tasks_1', item)])
+        self.assertNotIn('event_id', item)
+
+    def test_is_replayable(self):
+        self.assertTrue(is_replayable('tasks_42'))
+        self.assertFalse(is_replayable('activity_feed_all'))
+
+
+class EventsSinceTests(TestCase):
+    def _xrange(self, entries):
+        client = MagicMock()
+        client.xrange = AsyncMock(return_value=entries)
+        return patch('Mapapi.services.replay.get_async_redis', return_value=client)
+
+    def test_returns_events_after_last_seen(self):
+        entries = [(b'1-0', {b'data': json.dumps({'id': 'a'})}),
+                   (b'1-1', {b'data': json.dumps({'id': 'b'})})]
+        with self._xrange(entries):
+            events = async_to_sync(events_since)('tasks_1', '1-0')
+        self.assertEqual(events, [{'id': 'b', 'event_id': '1-1'}])
+
+    def test_gap_beyond_retention_requires_resync(self):
+        entries = [(b'5-0', {b'data': json.dumps({'id': 'e'})})]
+        with self._xrange(entries):
+            self.assertIsNone(async_to_sync(events_since)('tasks_1', '1-0'))
+
+    def test_unknown_stream_requires_resync(self):
+        with self._xrange([]):
+            self.assertIsNone(async_to_sync(events_since)('tasks_1', '1-0'))
+
+
+class ReplayConsumerTests(TestCase):
+    def _consumer(self, query_string):
+        consumer = NotificationConsumer()
+        consumer.scope = {'query_string': query_string, 'user': MagicMock(id='u1')}
+        consumer.group_name = 'notifications_u1'
+        consumer.send_json = AsyncMock()
+        return consumer
+
+    @patch('Mapapi.consumers.events_since', new_callable=AsyncMock, return_value=None)
+    def test_resync_signal_when_replay_impossible(self, _):
+        consumer = self._consumer(b'last_event_id=1-0')
+        async_to_sync(consumer.replay_missed)()
+        consumer.send_json.assert_awaited_once_with({'event': 'resync_required', 'last_event_id': '1-0'})
+
+    @patch('Mapapi.consumers.events_since', new_callable=AsyncMock)
+    def test_no_replay_without_last_event_id(self, mock_events_since):
+        consumer = self._consumer(b'')
+        async_to_sync(consumer.replay_missed)()
+        mock_events_since.assert_not_awaited()
+        consumer.send_json.assert_not_awaited()
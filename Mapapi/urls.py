@@ -3,7 +3,7 @@ from .views import *
 from .views.task import (
     IncidentTaskListCreateView, IncidentTaskDetailView,
     IncidentTaskCompleteView, IncidentTaskFailView, IncidentTaskConfirmView,
-    IncidentTaskRelaunchView,
+    IncidentTaskRelaunchView, IncidentTaskBulkView,
 )
 from .views.partner_suggestion import (
     PartnerSuggestionListCreateView, PartnerSuggestionDetailView,
@@ -18,7 +18,7 @@ from .views.incident import (
     AgentAssignedIncidentsView, FieldReportListCreateView,
     BulkDeleteIncidentsView, BulkRestoreIncidentsView,
     BulkForceDeleteIncidentsView,
-    IncidentPredictionView, RetryIncidentPredictionView,
+    IncidentPredictionView, RetryIncidentPredictionView, IncidentIngestionView,
     IncidentChatView, AgentPinLoginView, AgentChangePinView,
     PrepareResolutionView, ReturnForCompletionView, DeclareResolvedView,
     DisengageIncidentView,
@@ -108,6 +108,10 @@ urlpatterns = [
     path('org-incidents/', OrgIncidentsView.as_view(), name='org-incidents'),
     path('incidents/<uuid:incident_id>/prediction/', IncidentPredictionView.as_view(), name='incident-prediction'),
     path('incidents/<uuid:incident_id>/prediction/retry/', RetryIncidentPredictionView.as_view(), name='incident-prediction-retry'),
+    path('incidents/<uuid:incident_id>/ingestion/', IncidentIngestionView.as_view(), name='incident-ingestion'),
+    path('sync/', OfflineSyncView.as_view(), name='offline-sync'),
+    path('sync/changes/', SyncChangesView.as_view(), name='sync-changes'),
+    path('sync/field-bundle/', FieldBundleView.as_view(), name='field-bundle'),
     path('incidents/<uuid:incident_id>/chat/', IncidentChatView.as_view(), name='incident-chat'),
     path('agent/assigned-incidents/', AgentAssignedIncidentsView.as_view(), name='agent-assigned-incidents'),
     path('field-reports/', FieldReportListCreateView.as_view(), name='field-reports'),
@@ -188,6 +192,7 @@ urlpatterns = [
     # Notification
     path('notifications/', NotificationViewSet.as_view({'get': 'list'}), name="notification"),
     path('notifications/mark-all-read/', NotificationViewSet.as_view({'post': 'mark_all_read'}), name="notification-mark-all-read"),
+    path('notifications/counts/', NotificationViewSet.as_view({'get': 'counts'}), name="notification-counts"),
     path('notifications/<uuid:pk>/', NotificationViewSet.as_view({'get': 'retrieve', 'patch': 'partial_update'}), name="notification-detail"),
     path('activity-feed/', ActivityFeedView.as_view(), name="activity-feed"),
     path('activity-feed/mark-seen/', ActivityFeedMarkSeenView.as_view(), name="activity-feed-mark-seen"),
@@ -213,6 +218,7 @@ urlpatterns = [
 
     # --- Tâches d'incident (CRUD + complete/fail) ---
     path('incidents/<uuid:incident_id>/tasks/', IncidentTaskListCreateView.as_view(), name='incident-task-list'),
+    path('incidents/<uuid:incident_id>/tasks/bulk/', IncidentTaskBulkView.as_view(), name='incident-task-bulk'),
     path('incidents/<uuid:incident_id>/tasks/<uuid:pk>/', IncidentTaskDetailView.as_view(), name='incident-task-detail'),
     path('incidents/<uuid:incident_id>/tasks/<uuid:pk>/complete/', IncidentTaskCompleteView.as_view(), name='incident-task-complete'),
     path('incidents/<uuid:incident_id>/tasks/<uuid:pk>/fail/', IncidentTaskFailView.as_view(), name='incident-task-fail'),
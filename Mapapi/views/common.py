@@ -11,11 +11,21 @@ import unicodedata
 
 from django.http import JsonResponse
 from django.middleware.csrf import get_token
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
 from rest_framework.pagination import PageNumberPagination
 
 
 logger = logging.getLogger(__name__)
 
+# En-tête des POST rejouables (cf. services/idempotency.py), pour le schéma OpenAPI.
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    'Idempotency-Key', OpenApiTypes.STR, OpenApiParameter.HEADER, required=False,
+    description="Clé unique générée par le client (UUID). Une requête rejouée avec la "
+                "même clé renvoie la réponse d'origine sans être réexécutée "
+                "(en-tête de réponse `Idempotent-Replayed: true`).",
+)
+
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size = 100
@@ -1,14 +1,10 @@
 """Incident endpoints: CRUD, filters, search, reporting windows (monthly/weekly), handling actions."""
-import subprocess
 from datetime import timedelta
 
-from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
 from django.db.models import Q, Prefetch, Count
-from django.template.loader import render_to_string
 from django.utils import timezone
-from django.utils.html import strip_tags
 
 from rest_framework import status, generics
 from rest_framework.permissions import IsAuthenticated
@@ -31,7 +27,7 @@ from ..models import (
     ORG_ROLE_FIELD, ORG_ROLE_ADMIN, ORG_ROLE_BUREAU,
     Organisation, IncidentOrgAssignment,
     ORG_ASSIGNMENT_PENDING, ORG_ASSIGNMENT_ACCEPTED, ORG_ASSIGNMENT_DECLINED,
-    Prediction, PredictionStatus, Notification,
+    Prediction, PredictionStatus, IncidentIngestion,
     ChatHistory, CHAT_ROLE_USER, CHAT_ROLE_ASSISTANT,
     Rapport, IncidentAssignment,
 )
@@ -41,12 +37,19 @@ from ..permissions import (
 )
 from ..roles import is_org_admin
 from ..tasks import analyze_incident_with_model_task
-from ..Send_mails import send_email
 import logging
 
 logger = logging.getLogger(__name__)
 from ..services.model_chat_client import ask_model_chat
-from .common import CustomPageNumberPagination, IncidentPagination, FieldReportPagination, deaccent
+from ..services.activity_log import log_activity
+from ..services.idempotency import idempotent
+from ..services.ingestion import deferred_thumbnails, start as start_ingestion
+from ..services.mail import queue_emails
+from ..services.notifications import notify_users
+from .common import (
+    CustomPageNumberPagination, IncidentPagination, FieldReportPagination, deaccent,
+    IDEMPOTENCY_KEY_PARAMETER,
+)
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.hashers import check_password
 from .. import roles as web_roles
@@ -291,28 +294,16 @@ class IncidentAPIView(generics.CreateAPIView):
         serializer = IncidentSerializer(item, data=request.data)
         if serializer.is_valid():
             serializer.save()
-            if request.data['etat'] and request.data['etat'] == 'resolved':
-                 if serializer.data['user_id']:
-                    user = User.objects.get(id=serializer.data['user_id'])
-                    subject, from_email, to = "[MAP ACTION] - Changement de statut d'incident", settings.EMAIL_HOST_USER, user.email
-                    html_content = render_to_string('mail_incident_resolu.html', {
-                        'incident': serializer.data['title']})
-                    text_content = strip_tags(
-                        html_content)
-                    msg = EmailMultiAlternatives(subject, text_content, from_email, [to])
-                    msg.attach_alternative(html_content, "text/html")
-                    msg.send()
-            if request.data['etat'] and request.data['etat'] == 'in_progress':
-                  if serializer.data['user_id']:
-                    user = User.objects.get(id=serializer.data['user_id'])
-                    subject, from_email, to = "[MAP ACTION] - Changement de statut d'incident", settings.EMAIL_HOST_USER, user.email
-                    html_content = render_to_string('mail_incident_trait.html', {
-                        'incident': serializer.data['title']})
-                    text_content = strip_tags(
-                        html_content)
-                    msg = EmailMultiAlternatives(subject, text_content, from_email, [to])
-                    msg.attach_alternative(html_content, "text/html")
-                    msg.send()
+            status_templates = {
+                'resolved': 'mail_incident_resolu.html',
+                'in_progress': 'mail_incident_trait.html',
+            }
+            template_name = status_templates.get(request.data['etat']) if request.data['etat'] else None
+            if template_name and serializer.data['user_id']:
+                user = User.objects.get(id=serializer.data['user_id'])
+                # Envoi hors requête (outbox, réessais) : plus d'aller-retour SMTP ici.
+                queue_emails("[MAP ACTION] - Changement de statut d'incident", template_name,
+                             {'incident': serializer.data['title']}, [user], category='incident_status')
             return Response(serializer.data)
         return Response(serializer.errors, status=400)
 
@@ -351,9 +342,12 @@ class IncidentAPIView(generics.CreateAPIView):
         tags=['Incidents'],
         operation_id='incidents_create',
         summary="Déclarer un incident",
-        description="Crée un incident (déclaration citoyenne/mobile, public). Crée la zone "
-                    "si nécessaire, +1 point au reporter, déclenche l'analyse IA (Prediction) "
-                    "et la conversion vidéo éventuelle.",
+        description="Crée un incident (déclaration citoyenne/mobile, public) et répond dès "
+                    "l'enregistrement. En tâche de fond : création de la zone si nécessaire, "
+                    "+1 point au reporter, analyse IA (Prediction), miniature et conversion "
+                    "vidéo éventuelle — statut par étape sur "
+                    "`GET /incidents/<id>/ingestion/`.",
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
         request=IncidentSerializer,
         responses={
             201: IncidentSerializer,
@@ -412,71 +406,25 @@ class IncidentAPIListView(generics.CreateAPIView):
         serializer = IncidentGetSerializer(result_page, many=True, context={'request': request})
         return paginator.get_paginated_response(serializer.data)
 
+    @idempotent
     def post(self, request, format=None):
+        # Déclaration « accept-fast » : validation + enregistrement de l'incident
+        # (et de ses médias) uniquement ; zone, points, analyse IA, miniature et
+        # transcodage vidéo sont des étapes de fond (cf. services/ingestion.py,
+        # statut par étape sur GET /incidents/<id>/ingestion/).
         serializer = IncidentSerializer(data=request.data)
-        
+
         # Validate serializer
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            
-        # Process zone
-        lat = request.data.get("lattitude", "")
-        lon = request.data.get("longitude", "")
-        zone_name = request.data.get("zone")
-        
-        if not zone_name:
-            return Response({"zone": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
-            
-        zone, created = Zone.objects.get_or_create(name=zone_name, defaults={'lattitude': lat, 'longitude': lon})
-        
-        serializer.save()
-
-        image_name = serializer.data.get("photo")
-        print("Image Name:", image_name)
 
-        longitude = serializer.data.get("longitude")
-        latitude = serializer.data.get("lattitude")
-        print("Longitude:", longitude)
-
-        # Points system from dev version
-        if "user_id" in request.data:
-            try:
-                user = User.objects.get(id=request.data["user_id"])
-                user.points += 1
-                user.save()
-            except User.DoesNotExist:
-                print(f"Warning: No user found with ID {request.data['user_id']}")
-            except ValueError:
-                print(f"Warning: Invalid user ID format: {request.data['user_id']}")
+        if not request.data.get("zone"):
+            return Response({"zone": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Video conversion
-        if "video" in request.data and request.data["video"]:
-            try:
-                subprocess.check_call(['python', f"{settings.BASE_DIR}" + '/convertvideo.py'])
-            except subprocess.CalledProcessError as e:
-                print(f"Warning: Video conversion failed: {e}")
-            except Exception as e:
-                print(f"Warning: Unexpected error during video conversion: {e}")
-
-        # --- Trigger AI model-deploy analysis (async via Celery) ---
-        # We create a pending Prediction immediately so the front-end can poll
-        # GET /MapApi/incidents/<id>/prediction/ and observe status transitions.
-        incident_obj = serializer.instance
-        if incident_obj is not None:
-            prediction, _ = Prediction.objects.get_or_create(
-                incident=incident_obj,
-                defaults={'status': PredictionStatus.PENDING},
-            )
-            if incident_obj.photo:
-                try:
-                    analyze_incident_with_model_task.delay(prediction.id)
-                except Exception as e:  # broker unavailable, etc.
-                    print(f"Warning: could not enqueue analyze task: {e}")
-            else:
-                # No photo => mark prediction as failed right away.
-                prediction.status = PredictionStatus.FAILED
-                prediction.error_message = "Incident has no photo."
-                prediction.save(update_fields=['status', 'error_message', 'updated_at'])
+        with transaction.atomic():
+            with deferred_thumbnails():
+                incident = serializer.save()
+            start_ingestion(incident)
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -857,14 +805,15 @@ class IncidentAssignmentListCreateView(generics.ListCreateAPIView):
             'organisation_name': org_name or '',
         }
         try:
-            send_email.delay(
-                subject="🎯 Nouvelle mission assignée - Map Action",
-                template_name='emails/agent_assignment_email.html',
-                context=context,
-                to_email=agent.email,
+            queue_emails(
+                "🎯 Nouvelle mission assignée - Map Action",
+                'emails/agent_assignment_email.html',
+                context,
+                [agent],
+                category='agent_assignment',
             )
             logger.info(
-                f"Email d'assignation envoyé (queue Celery) à {agent.email} "
+                f"Email d'assignation mis en file à {agent.email} "
                 f"pour l'assignation {assignment.id} sur l'incident {incident.id}"
             )
         except Exception as e:
@@ -1020,6 +969,7 @@ class AgentAssignedIncidentsView(generics.ListAPIView):
         description="Crée un rapport de visite (multipart, champ `photo`). Réservé aux "
                     "agents de terrain pour un incident qui leur est assigné ; passe "
                     "l'assignation correspondante à l'état `reported`.",
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
         request=FieldReportSerializer,
         responses={
             201: FieldReportSerializer,
@@ -1054,6 +1004,7 @@ class FieldReportListCreateView(generics.ListCreateAPIView):
             qs = qs.filter(incident_id=incident_id)
         return qs
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         incident_id = request.data.get('incident') or request.data.get('incident_id')
         try:
@@ -1713,7 +1664,7 @@ class HandleIncidentView(APIView):
 
         incident.save()
 
-        user_action = UserAction.objects.create(user=user, action=action_message)
+        user_action = log_activity(user, action_message)
         user_data = UserSerializer(user).data
         action_data = UserActionSerializer(user_action).data 
         return Response({
@@ -1851,7 +1802,7 @@ class TakeInChargeView(APIView):
             )
 
             action_message = f"a pris en charge l'incident «{incident.title}» en mode interne."
-            UserAction.objects.create(user=request.user, action=action_message)
+            log_activity(request.user, action_message)
 
             return Response({
                 "status": "success",
@@ -1924,7 +1875,7 @@ class TakeInChargeView(APIView):
             ).exclude(user=request.user).update(status='pending')
 
             action_message = f"a pris en charge l'incident «{incident.title}» en tant que leader (mode collaboratif)."
-            UserAction.objects.create(user=request.user, action=action_message)
+            log_activity(request.user, action_message)
 
             return Response({
                 "status": "success",
@@ -1955,7 +1906,7 @@ class TakeInChargeView(APIView):
 
         role_fr = {'contributor': 'contributeur', 'observer': 'observateur', 'leader': 'leader'}.get(role, role)
         action_message = f"a rejoint l'incident «{incident.title}» en tant que {role_fr}."
-        UserAction.objects.create(user=request.user, action=action_message)
+        log_activity(request.user, action_message)
 
         return Response({
             "status": "success",
@@ -2418,16 +2369,7 @@ class ReportToAdminView(APIView):
         # Inclure le lien tout en respectant la limite de 255 caractères du champ.
         message = f"{base_msg} ({link})"[:255]
 
-        created = 0
-        for admin in admins:
-            Notification.objects.create(
-                user=admin,
-                notif_type='incident_report',
-                message=message,
-                colaboration=None,
-                incident=incident,
-            )
-            created += 1
+        created = len(notify_users(admins, 'incident_report', message, incident=incident))
 
         return Response(
             {
@@ -2524,9 +2466,7 @@ class AssignIncidentToOrganisationView(APIView):
             f"Le Super Admin vous a assigné l'incident "
             f"« {incident.title or incident.zone} ». À accepter ou décliner sous 72 h."
         )[:255]
-        for admin in admins:
-            Notification.objects.create(user=admin, notif_type='incident_assignment',
-                                        message=message, colaboration=None, incident=incident)
+        notify_users(admins, 'incident_assignment', message, incident=incident)
 
         return Response(
             IncidentOrgAssignmentSerializer(assignment).data,
@@ -2871,7 +2811,8 @@ class RestoreIncidentView(APIView):
     ],
     responses={
         200: PredictionSerializer,
-        404: OpenApiResponse(description="Incident non trouvé ou aucune prédiction."),
+        404: OpenApiResponse(description="Incident non trouvé ou aucune prédiction (analyse "
+                                         "pas encore planifiée, cf. /ingestion/)."),
     },
     ),
 )
@@ -2894,6 +2835,36 @@ class IncidentPredictionView(APIView):
         return Response(PredictionSerializer(prediction).data, status=status.HTTP_200_OK)
 
 
+@extend_schema_view(
+    get=extend_schema(
+    tags=['Incidents'],
+    operation_id='incident_ingestion_retrieve',
+    summary="Traitement d'un incident déclaré",
+    description="Statut des étapes de fond d'une déclaration (zone, points, analysis, "
+                "thumbnail, video) : 'pending', 'done', 'skipped' ou 'failed'. "
+                "Authentification requise.",
+    parameters=[
+        OpenApiParameter('incident_id', OpenApiTypes.UUID, OpenApiParameter.PATH,
+                         description="Identifiant de l'incident."),
+    ],
+    responses={
+        200: IncidentIngestionSerializer,
+        404: OpenApiResponse(description="Incident non trouvé ou sans suivi d'ingestion."),
+    },
+    ),
+)
+class IncidentIngestionView(APIView):
+    """GET /MapApi/incidents/<incident_id>/ingestion/ — étapes de fond de la déclaration."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, incident_id):
+        ingestion = IncidentIngestion.objects.filter(incident_id=incident_id).first()
+        if ingestion is None:
+            return Response({"error": "Aucun suivi d'ingestion pour cet incident."},
+                            status=status.HTTP_404_NOT_FOUND)
+        return Response(IncidentIngestionSerializer(ingestion).data, status=status.HTTP_200_OK)
+
+
 @extend_schema_view(
     post=extend_schema(
     tags=['Prédiction & IA'],
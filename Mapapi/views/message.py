@@ -24,7 +24,8 @@ from drf_spectacular.types import OpenApiTypes
 from ..serializer import *
 from ..models import Collaboration, Incident, COLLAB_ROLE_LEADER
 from ..roles import is_super_admin
-from .common import CustomPageNumberPagination
+from .common import CustomPageNumberPagination, IDEMPOTENCY_KEY_PARAMETER
+from ..services.idempotency import idempotent
 
 
 @extend_schema_view(
@@ -405,7 +406,10 @@ class MessageByUserAPIView(generics.CreateAPIView):
         operation_id='messages_discussion_create',
         summary="Envoyer un message de discussion",
         description="Publie un message dans le chat de groupe d'un incident (texte, audio et/ou pièce jointe en multipart). Réservé aux collaborateurs acceptés ; bloqué si l'incident est résolu. `recipient` est optionnel.",
-        parameters=[OpenApiParameter('incident_id', OpenApiTypes.UUID, OpenApiParameter.PATH, description="Identifiant UUID de l'incident.")],
+        parameters=[
+            OpenApiParameter('incident_id', OpenApiTypes.UUID, OpenApiParameter.PATH, description="Identifiant UUID de l'incident."),
+            IDEMPOTENCY_KEY_PARAMETER,
+        ],
         request=DiscussionMessageSerializer,
         responses={
             201: DiscussionMessageSerializer,
@@ -554,6 +558,10 @@ class DiscussionMessageView(generics.ListCreateAPIView):
             "next_before": next_before,
         })
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         incident_id = self.kwargs.get('incident_id')
         user = self.request.user
@@ -10,6 +10,8 @@ from drf_spectacular.utils import OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
 from ..serializer import *
+from ..services.activity_counts import feed_counts, mark_seen
+from ..services.notification_counts import apply_delta, get_counts
 from .common import CustomPageNumberPagination, NotificationPagination
 
 
@@ -53,15 +55,25 @@ class NotificationViewSet(viewsets.ModelViewSet):
         alimenter un badge sans second appel.
         """
         response = super().list(request, *args, **kwargs)
-        base = Notification.objects.filter(user=request.user)
-        unread = base.filter(read=False).count()
-        read = base.filter(read=True).count()
         if isinstance(response.data, dict):
-            response.data['unread_count'] = unread
-            response.data['read_count'] = read
-            response.data['total_count'] = unread + read
+            # Compteurs dénormalisés (NotificationCounter) : plus de COUNT par page.
+            response.data.update(get_counts(request.user.id))
         return response
 
+    @extend_schema(
+        tags=['Notifications'],
+        operation_id='notifications_counts',
+        summary='Compteurs de notifications',
+        description="Compteurs `unread_count`, `read_count` et `total_count` de "
+                    "l'utilisateur connecté (badge), sans charger de page. Les mêmes "
+                    "compteurs sont poussés sur `/ws/notifications/` (événement "
+                    "`notification_counts`) à chaque variation.",
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    def counts(self, request, *args, **kwargs):
+        """GET /notifications/counts/ — compteurs lu/non-lu (lecture O(1))."""
+        return Response(get_counts(request.user.id), status=status.HTTP_200_OK)
+
     @staticmethod
     def _as_bool(val, default=True):
         if isinstance(val, bool):
@@ -84,11 +96,16 @@ class NotificationViewSet(viewsets.ModelViewSet):
         """PATCH /notifications/<pk>/ — bascule `read` (true par défaut).
 
         ``get_object`` s'appuie sur ``get_queryset`` (filtré par utilisateur) :
-        impossible de toucher la notification d'un autre (→ 404).
+        impossible de toucher la notification d'un autre (→ 404). La bascule est
+        un UPDATE conditionnel : sur deux clics concurrents, un seul change la
+        ligne et ajuste le compteur de non lues.
         """
         instance = self.get_object()
-        instance.read = self._as_bool(request.data.get('read', True))
-        instance.save(update_fields=['read'])
+        read = self._as_bool(request.data.get('read', True))
+        updated = Notification.objects.filter(pk=instance.pk, read=not read).update(read=read)
+        if updated == 1:
+            apply_delta([instance.user_id], unread=-1 if read else 1)
+        instance.refresh_from_db(fields=['read', 'updated_at'])
         return Response(self.get_serializer(instance).data, status=status.HTTP_200_OK)
 
     @extend_schema(
@@ -103,6 +120,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
     def mark_all_read(self, request, *args, **kwargs):
         """POST /notifications/mark-all-read/ — marque toutes mes notifs comme lues."""
         updated = Notification.objects.filter(user=request.user, read=False).update(read=True)
+        apply_delta([request.user.id], unread=-updated)
         return Response({'marked_read': updated}, status=status.HTTP_200_OK)
 
 
@@ -159,13 +177,8 @@ class ActivityFeedView(generics.ListAPIView):
         """
         response = super().list(request, *args, **kwargs)
         if isinstance(response.data, dict):
-            qs = self.get_queryset()
-            total = qs.count()
-            seen_at = getattr(request.user, 'activity_seen_at', None)
-            unseen = qs.filter(created_at__gt=seen_at).count() if seen_at else total
-            response.data['total_count'] = total
-            response.data['unseen_count'] = unseen
-            response.data['seen_count'] = total - unseen
+            # Compteurs maintenus (ActivityFeedCounter / Watermark) : O(1).
+            response.data.update(feed_counts(request.user))
         return response
 
 
@@ -183,8 +196,7 @@ class ActivityFeedMarkSeenView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
-        from django.utils import timezone
-        request.user.activity_seen_at = timezone.now()
+        request.user.activity_seen_at = mark_seen(request.user)
         request.user.save(update_fields=['activity_seen_at'])
         return Response({'activity_seen_at': request.user.activity_seen_at},
                         status=status.HTTP_200_OK)
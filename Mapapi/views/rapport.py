@@ -16,6 +16,7 @@ from drf_spectacular.types import OpenApiTypes
 from rest_framework import serializers
 
 from ..serializer import *
+from ..services.mail import queue_emails
 from .common import CustomPageNumberPagination
 
 
@@ -147,15 +148,10 @@ class RapportAPIListView(generics.CreateAPIView):
         if serializer.is_valid():
             serializer.save()
             admins = User.objects.filter(user_type="admin").values_list('email', flat=True)
-            # print("admins: ",list(admins))
             incident = Incident.objects.get(id=request.data['incident'])
-            subject, from_email, to = '[MAP ACTION] - Nouvelle commande de rapport', settings.EMAIL_HOST_USER, user.email
-            html_content = render_to_string('mail_rapport_admin.html',
-                                            {'details': incident.title})  # render with dynamic value#
-            text_content = strip_tags(html_content)  # Strip the html tag. So people can see the pure text at least.
-            msg = EmailMultiAlternatives(subject, text_content, from_email, list(admins))
-            msg.attach_alternative(html_content, "text/html")
-            msg.send()
+            # Envoi hors requête (outbox, réessais) : un email par administrateur.
+            queue_emails('[MAP ACTION] - Nouvelle commande de rapport', 'mail_rapport_admin.html',
+                         {'details': incident.title}, list(admins), category='rapport_request')
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
 
@@ -247,12 +243,8 @@ class RapportOnZoneAPIView(generics.CreateAPIView):
                 data = RapportSerializer(rapport).data
 
                 admins = User.objects.filter(user_type="admin").values_list('email', flat=True)
-                subject, from_email = '[MAP ACTION] - Nouveau Rapport', settings.EMAIL_HOST_USER
-                html_content = render_to_string('mail_new_rapport.html')  # render with dynamic value#
-                text_content = strip_tags(html_content)  # Strip the html tag. So people can see the pure text at least.
-                msg = EmailMultiAlternatives(subject, text_content, from_email, list(admins))
-                msg.attach_alternative(html_content, "text/html")
-                msg.send()
+                queue_emails('[MAP ACTION] - Nouveau Rapport', 'mail_new_rapport.html', {},
+                             list(admins), category='rapport_zone')
 
                 return Response({
                     "status": "success",
@@ -0,0 +1,222 @@
+"""Synchronisation mobile : envoi groupé des saisies hors ligne (incidents, rapports
+de terrain), flux des changements depuis un filigrane et paquet hors ligne des
+agents de terrain."""
+from collections import Counter
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import serializers, status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import (
+    extend_schema, extend_schema_view, OpenApiParameter, OpenApiResponse, inline_serializer,
+)
+
+from ..models import ORG_ROLE_FIELD, Collaboration, Incident, Notification
+from ..serializer import CollaborationChangeSerializer, IncidentChangeSerializer, NotificationSerializer
+from ..services import delta_sync, field_bundle
+from ..services.offline_sync import sync_bundle
+from .collaboration import collaboration_scope_q
+from .incident import visible_incidents_qs
+
+
+@extend_schema_view(post=extend_schema(
+    tags=['Incidents'],
+    operation_id='offline_sync',
+    summary="Synchroniser des saisies hors ligne",
+    description=(
+        "Envoie en une requête les incidents et rapports de terrain saisis hors ligne. "
+        "Multipart, champ `bundle` : archive zip contenant `manifest.json` "
+        "(`{\"incidents\": [...], \"field_reports\": [...]}`) et les fichiers médias, "
+        "référencés par leur chemin dans l'archive (`photo`, `video`, `audio`). Chaque "
+        "élément porte un `id` UUID généré par le client : un élément déjà synchronisé est "
+        "renvoyé `duplicate` sans être réappliqué (le paquet peut être renvoyé sans risque). "
+        "Chaque élément est appliqué dans sa propre transaction ; résultat par élément."
+    ),
+    request={'multipart/form-data': inline_serializer(
+        name='OfflineSyncRequest', fields={'bundle': serializers.FileField()},
+    )},
+    responses={
+        200: inline_serializer(
+            name='OfflineSyncResponse',
+            fields={
+                'results': serializers.ListField(child=serializers.DictField(),
+                                                 help_text="{type, id, status, errors?} par élément."),
+                'created': serializers.IntegerField(),
+                'duplicate': serializers.IntegerField(),
+                'error': serializers.IntegerField(),
+            },
+        ),
+        400: OpenApiResponse(description="Paquet absent, trop volumineux ou invalide."),
+    },
+))
+class OfflineSyncView(APIView):
+    """POST /MapApi/sync/"""
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        bundle = request.FILES.get('bundle')
+        if bundle is None:
+            return Response({'bundle': ["Ce champ est obligatoire."]}, status=status.HTTP_400_BAD_REQUEST)
+        max_bytes = int(getattr(settings, 'SYNC_BUNDLE_MAX_BYTES', 50 * 1024 * 1024))
+        if bundle.size > max_bytes:
+            return Response({'bundle': [f"Paquet limité à {max_bytes} octets."]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        results = sync_bundle(bundle, request.user)
+        counts = Counter(result['status'] for result in results)
+        return Response({
+            'results': results,
+            'created': counts['created'],
+            'duplicate': counts['duplicate'],
+            'error': counts['error'],
+        }, status=status.HTTP_200_OK)
+
+
+@extend_schema_view(get=extend_schema(
+    tags=['Incidents'],
+    operation_id='sync_changes',
+    summary="Changements depuis un filigrane",
+    description=(
+        "Rafraîchissement incrémental des listes incidents / mes incidents / notifications / "
+        "collaborations : ne renvoie que les lignes créées ou modifiées depuis `since` "
+        "(charge utile compacte) et les identifiants supprimés. Chaque section vaut "
+        "`{created, updated, deleted}`. La réponse donne le `watermark` à renvoyer au "
+        "prochain appel. `reset: true` (pas de `since`, filigrane trop ancien ou trop de "
+        "changements) : recharger les listes complètes, puis repartir du `watermark` reçu."
+    ),
+    parameters=[
+        OpenApiParameter('since', OpenApiTypes.STR, OpenApiParameter.QUERY, required=False,
+                         description="Filigrane (`watermark`) de la synchronisation précédente."),
+    ],
+    responses={
+        200: inline_serializer(
+            name='SyncChangesResponse',
+            fields={
+                'watermark': serializers.CharField(),
+                'reset': serializers.BooleanField(),
+                'incidents': serializers.DictField(),
+                'collaborations': serializers.DictField(),
+                'notifications': serializers.DictField(),
+            },
+        ),
+        400: OpenApiResponse(description="Filigrane invalide."),
+    },
+))
+class SyncChangesView(APIView):
+    """GET /MapApi/sync/changes/?since=<watermark>"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        until = delta_sync.upper_bound()
+        payload = {'watermark': delta_sync.format_watermark(until), 'reset': True}
+        since = request.query_params.get('since')
+        if not since:
+            return Response(payload, status=status.HTTP_200_OK)
+        since = delta_sync.parse_watermark(since)
+        if delta_sync.expired(since):
+            return Response(payload, status=status.HTTP_200_OK)
+
+        context = {'request': request}
+        try:
+            payload.update(
+                incidents=delta_sync.section(
+                    visible_incidents_qs(Incident.objects.all(), user), delta_sync.INCIDENT,
+                    since, until, user, IncidentChangeSerializer, context,
+                    trashed=Incident.objects.filter(is_deleted=True),
+                ),
+                collaborations=delta_sync.section(
+                    Collaboration.objects.filter(collaboration_scope_q(user, 'all')),
+                    delta_sync.COLLABORATION, since, until, user, CollaborationChangeSerializer, context,
+                ),
+                notifications=delta_sync.section(
+                    Notification.objects.filter(user=user).select_related('incident', 'colaboration'),
+                    delta_sync.NOTIFICATION, since, until, user, NotificationSerializer, context,
+                ),
+            )
+        except delta_sync.TooManyChanges:
+            return Response(payload, status=status.HTTP_200_OK)
+        payload['reset'] = False
+        return Response(payload, status=status.HTTP_200_OK)
+
+
+def _byte_range(header, size):
+    """Plage ``(début, fin)`` incluse d'un en-tête ``Range`` à plage unique ;
+    None si l'en-tête est absent ou non géré (réponse complète) ; ``False`` si la
+    plage est hors du contenu (416)."""
+    unit, _, spec = (header or '').partition('=')
+    if unit.strip() != 'bytes' or not spec or ',' in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                return False
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+@extend_schema_view(get=extend_schema(
+    tags=['Prise en charge & Collaboration'],
+    operation_id='field_bundle_download',
+    summary="Paquet hors ligne de l'agent de terrain",
+    description=(
+        "Zip à télécharger avant une mission sans réseau : `bundle.json` (assignations, "
+        "incidents assignés, leurs tâches) et `thumbnails/<incident>.jpg` (chemin donné "
+        "par le champ `thumbnail` de chaque incident). Réservé aux agents de terrain. "
+        "`ETag` = empreinte du contenu du zip : `If-None-Match` → 304 si rien n'a changé. "
+        "Téléchargement reprenable : `Range: bytes=<début>-` avec `If-Range: <ETag>` → 206 "
+        "(ou 200 complet si le paquet a changé entre-temps)."
+    ),
+    responses={
+        (200, 'application/zip'): OpenApiTypes.BINARY,
+        (206, 'application/zip'): OpenApiTypes.BINARY,
+        304: OpenApiResponse(description="Paquet inchangé (If-None-Match)."),
+        403: OpenApiResponse(description="Réservé aux agents de terrain."),
+        416: OpenApiResponse(description="Plage hors du paquet."),
+    },
+))
+class FieldBundleView(APIView):
+    """GET /MapApi/sync/field-bundle/"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.org_role != ORG_ROLE_FIELD:
+            return Response({"error": "Réservé aux agents de terrain."}, status=status.HTTP_403_FORBIDDEN)
+        etag, data = field_bundle.get_bundle(request.user)
+        etag = f'"{etag}"'
+        if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            response['ETag'] = etag
+            return response
+
+        size = len(data)
+        byte_range = None
+        if request.headers.get('If-Range', etag) == etag:
+            byte_range = _byte_range(request.headers.get('Range'), size)
+        if byte_range is False:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f"bytes */{size}"
+        elif byte_range:
+            start, end = byte_range
+            response = HttpResponse(data[start:end + 1], content_type='application/zip',
+                                    status=status.HTTP_206_PARTIAL_CONTENT)
+            response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        else:
+            response = HttpResponse(data, content_type='application/zip')
+        response['ETag'] = etag
+        response['Accept-Ranges'] = 'bytes'
+        response['Content-Disposition'] = 'attachment; filename="mapaction-offline.zip"'
+        return response
@@ -1,4 +1,4 @@
-"""IncidentTask endpoints: CRUD + actions complete / fail."""
+"""IncidentTask endpoints: CRUD + actions complete / fail + opérations groupées."""
 from rest_framework import status, generics
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -14,6 +14,7 @@ from rest_framework import serializers
 from ..models import Incident, IncidentTask, TASK_PENDING, TASK_DONE, TASK_FAILED, Collaboration
 from ..serializer import IncidentTaskSerializer
 from ..permissions import IsIncidentLeader, IsIncidentLeaderOrContributor
+from ..services.task_bulk import apply_bulk_operations
 
 
 @extend_schema_view(
@@ -111,7 +112,7 @@ class IncidentTaskConfirmView(APIView):
             return Response({"error": "Tâche non trouvée."}, status=status.HTTP_404_NOT_FOUND)
 
         task.is_confirmed = True
-        task.save()  # le save() déclenche incident.update_progress()
+        task.save()  # le save() met à jour les compteurs / la progression de l'incident
 
         serializer = IncidentTaskSerializer(task)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -273,7 +274,7 @@ class IncidentTaskCompleteView(APIView):
             task.proof_image = proof_image
         if proof_video:
             task.proof_video = proof_video
-        task.save()  # le save() déclenche incident.update_progress()
+        task.save()  # le save() met à jour les compteurs / la progression de l'incident
 
         serializer = IncidentTaskSerializer(task)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -329,7 +330,7 @@ class IncidentTaskFailView(APIView):
 
         task.state = TASK_FAILED
         task.failure_reason = failure_reason
-        task.save()  # le save() déclenche incident.update_progress()
+        task.save()  # le save() met à jour les compteurs / la progression de l'incident
 
         serializer = IncidentTaskSerializer(task)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -375,7 +376,76 @@ class IncidentTaskRelaunchView(APIView):
 
         # Repasse en 'pending' ; le motif d'échec est volontairement CONSERVÉ (spec D11).
         task.state = TASK_PENDING
-        task.save()  # le save() déclenche incident.update_progress()
+        task.save()  # le save() met à jour les compteurs / la progression de l'incident
 
         serializer = IncidentTaskSerializer(task)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@extend_schema_view(post=extend_schema(
+    tags=['Tâches'],
+    operation_id='tasks_bulk',
+    summary="Opérations groupées sur les tâches (leader)",
+    description=(
+        "Crée, modifie, confirme et supprime plusieurs tâches en une requête "
+        "(`TASK_BULK_MAX_OPERATIONS` opérations au plus). Tout ou rien : toutes les "
+        "opérations sont validées avant la moindre écriture ; en cas d'erreur, rien "
+        "n'est appliqué et le détail est renvoyé par section et par élément. La "
+        "progression de l'incident est recalculée une seule fois et les membres "
+        "reçoivent une seule trame WebSocket groupée. Réservé au leader (`IsIncidentLeader`)."
+    ),
+    parameters=[
+        OpenApiParameter('incident_id', OpenApiTypes.UUID, OpenApiParameter.PATH,
+                         description="Identifiant de l'incident."),
+    ],
+    request=inline_serializer(
+        name='TaskBulkRequest',
+        fields={
+            'create': IncidentTaskSerializer(many=True, required=False),
+            'update': serializers.ListField(child=serializers.DictField(), required=False,
+                                            help_text="Champs à modifier, avec l'`id` de la tâche."),
+            'confirm': serializers.ListField(child=serializers.UUIDField(), required=False),
+            'delete': serializers.ListField(child=serializers.UUIDField(), required=False),
+        },
+    ),
+    responses={
+        200: inline_serializer(
+            name='TaskBulkResponse',
+            fields={
+                'created': IncidentTaskSerializer(many=True),
+                'updated': IncidentTaskSerializer(many=True),
+                'deleted': serializers.ListField(child=serializers.UUIDField()),
+                'progress': serializers.IntegerField(),
+            },
+        ),
+        400: OpenApiResponse(description="Opérations invalides (détail par section/élément) ou incident clôturé."),
+        403: OpenApiResponse(description="Réservé au leader de l'incident."),
+        404: OpenApiResponse(description="Incident non trouvé."),
+    },
+    examples=[
+        OpenApiExample('Planification', value={
+            'create': [{'title': 'Évacuer les déchets', 'start_date': '2026-11-02', 'end_date': '2026-11-05'}],
+            'update': [{'id': '3fa85f64-5717-4562-b3fc-2c963f66afa6', 'assigned_to': None}],
+            'confirm': ['5fa85f64-5717-4562-b3fc-2c963f66afa6'],
+            'delete': [],
+        }, request_only=True),
+    ],
+))
+class IncidentTaskBulkView(APIView):
+    """POST /incidents/<incident_id>/tasks/bulk/"""
+    permission_classes = [IsAuthenticated, IsIncidentLeader]
+
+    def post(self, request, incident_id):
+        try:
+            incident = Incident.objects.get(pk=incident_id)
+        except Incident.DoesNotExist:
+            return Response({"error": "Incident non trouvé."}, status=status.HTTP_404_NOT_FOUND)
+
+        result = apply_bulk_operations(incident, request.user, request.data)
+        incident.refresh_from_db(fields=['progress'])
+        return Response({
+            'created': IncidentTaskSerializer(result['created'], many=True).data,
+            'updated': IncidentTaskSerializer(result['updated'], many=True).data,
+            'deleted': result['deleted'],
+            'progress': incident.progress,
+        }, status=status.HTTP_200_OK)
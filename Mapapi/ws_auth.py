@@ -2,7 +2,15 @@
 
 Le navigateur envoie automatiquement le cookie d'accès lors du handshake WS vers
 le domaine backend ; on le valide pour peupler scope['user']. Repli possible sur
-un paramètre de requête ``?token=`` (utile pour le mobile/Bearer)."""
+un paramètre de requête ``?token=`` (utile pour le mobile/Bearer).
+
+Les clients mobiles se reconnectent souvent : l'identité minimale dont les
+consumers ont besoin (id, organisation, rôle, is_active) est mise en cache dans
+Redis (``ws:user:<id>``), invalidée à chaque sauvegarde/suppression du User
+(cf. signals). Sur cache chaud, le handshake ne passe plus par le pool de
+threads DB."""
+import json
+import logging
 from urllib.parse import parse_qs
 
 from channels.db import database_sync_to_async
@@ -12,14 +20,90 @@ from django.contrib.auth.models import AnonymousUser
 from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import AccessToken
 
+from .services.redis_client import REDIS_ERRORS, get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_PREFIX = 'ws:user:'
+IDENTITY_FIELDS = ('organisation_member_id', 'org_role', 'is_superuser', 'is_active')
+
+
+class WSUser:
+    """Identité minimale d'un utilisateur WebSocket (scope['user']).
+
+    Expose ce que lisent les consumers et ``roles.get_web_role`` ; ce n'est pas
+    une instance ``User`` : charger le modèle explicitement si besoin d'autre chose.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, id, organisation_member_id=None, org_role=None,
+                 is_superuser=False, is_active=True):
+        self.id = self.pk = id
+        self.organisation_member_id = organisation_member_id
+        self.org_role = org_role
+        self.is_superuser = is_superuser
+        self.is_active = is_active
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(str(user.pk), **{f: getattr(user, f) for f in IDENTITY_FIELDS})
+
+    def as_dict(self):
+        data = {f: getattr(self, f) for f in IDENTITY_FIELDS}
+        data['id'] = self.id
+        if data['organisation_member_id'] is not None:
+            data['organisation_member_id'] = str(data['organisation_member_id'])
+        return data
+
+
+def _cache_key(user_id):
+    return f"{USER_CACHE_PREFIX}{user_id}"
+
+
+def _cache_ttl():
+    return int(getattr(settings, 'WS_USER_CACHE_TTL', 3600))
+
+
+def invalidate_cached_user(user_id):
+    """Supprime l'identité en cache (appelé sur post_save / post_delete de User)."""
+    try:
+        get_redis().delete(_cache_key(user_id))
+    except REDIS_ERRORS as exc:
+        logger.warning("invalidation cache WS user %s échouée: %s", user_id, exc)
+
 
 @database_sync_to_async
-def _get_user(user_id):
+def _load_identity(user_id):
     from .models import User
+    user = User.objects.filter(pk=user_id).only(
+        'id', 'organisation_member', 'org_role', 'is_superuser', 'is_active').first()
+    return WSUser.from_user(user) if user else None
+
+
+async def _get_user(user_id):
+    key = _cache_key(user_id)
+    identity = None
+    cache_available = True
     try:
-        return User.objects.get(pk=user_id)
-    except User.DoesNotExist:
+        cached = await get_async_redis().get(key)
+        if cached:
+            identity = WSUser(**json.loads(cached))
+    except REDIS_ERRORS as exc:
+        logger.warning("cache WS user indisponible: %s", exc)
+        cache_available = False
+    if identity is None:
+        identity = await _load_identity(user_id)
+        if identity is None:
+            return AnonymousUser()
+        if cache_available:
+            try:
+                await get_async_redis().set(key, json.dumps(identity.as_dict()), ex=_cache_ttl())
+            except REDIS_ERRORS as exc:
+                logger.warning("cache WS user indisponible: %s", exc)
+    if not identity.is_active:
         return AnonymousUser()
+    return identity
 
 
 def _token_from_scope(scope):
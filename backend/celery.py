@@ -2,6 +2,7 @@ from __future__ import absolute_import, unicode_literals
 import os
 from celery import Celery
 from django.conf import settings
+from kombu import Queue
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
@@ -11,6 +12,50 @@ app = Celery('backend')
 # the configuration object to child processes.
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
+# Files par charge de travail : une rafale d'analyses photo (jusqu'à 180 s
+# d'appel HTTP chacune) ne retarde plus les emails ni les échéances du cycle
+# de vie. Chaque file est consommée par son propre worker (concurrence et
+# prefetch adaptés, cf. services/celery/worker.sh) ; 'celery' reste la file
+# par défaut des tâches non routées.
+DEFAULT_QUEUE = 'celery'
+QUEUES = ('analysis', 'notifications', 'lifecycle', 'media')
+
+# Priorités (broker Redis, cf. CELERY_BROKER_TRANSPORT_OPTIONS) : 0 = la plus
+# urgente, 9 = la moins urgente ; sans priorité de route, CELERY_TASK_DEFAULT_PRIORITY.
+TASK_ROUTES = {
+    # Analyse IA des photos : longue, dépend d'un service externe.
+    'Mapapi.tasks.analyze_incident_with_model_task': {'queue': 'analysis'},
+    # Ingestion des déclarations : la file est choisie par étape (services/ingestion.py,
+    # médias sur 'media') ; la reprise des ingestions interrompues est du cycle de vie.
+    'Mapapi.tasks.run_ingestion_stage': {'queue': 'media'},
+    'Mapapi.tasks.resume_stalled_ingestions': {'queue': 'lifecycle', 'priority': 5},
+    # Emails : transactionnels (vérification, création de compte) d'abord,
+    # résumés périodiques en dernier.
+    'Mapapi.Send_mails.send_email': {'queue': 'notifications', 'priority': 0},
+    'Mapapi.tasks.flush_email_outbox': {'queue': 'notifications', 'priority': 3},
+    'Mapapi.tasks.send_email_digests': {'queue': 'notifications', 'priority': 9},
+    # Cycle de vie : les échéances à l'heure dite passent avant les scans de
+    # rattrapage et les réparations quotidiennes.
+    'Mapapi.tasks.dispatch_due_deadlines': {'queue': 'lifecycle', 'priority': 0},
+    'Mapapi.tasks.auto_validate_overdue_resolutions': {'queue': 'lifecycle', 'priority': 3},
+    'Mapapi.tasks.revert_stale_taken_incidents': {'queue': 'lifecycle', 'priority': 3},
+    'Mapapi.tasks.auto_accept_overdue_assignments': {'queue': 'lifecycle', 'priority': 3},
+    'Mapapi.tasks.flush_activity_log': {'queue': 'lifecycle', 'priority': 5},
+    'Mapapi.tasks.rebuild_deadline_schedule': {'queue': 'lifecycle', 'priority': 9},
+    'Mapapi.tasks.repair_activity_counters': {'queue': 'lifecycle', 'priority': 9},
+    'Mapapi.tasks.repair_task_counters': {'queue': 'lifecycle', 'priority': 9},
+    'Mapapi.tasks.prune_sync_tombstones': {'queue': 'lifecycle', 'priority': 9},
+    # Stockage : purge de la corbeille et balayage des buckets.
+    'Mapapi.tasks.purge_expired_trash': {'queue': 'media'},
+    'Mapapi.tasks.sweep_orphaned_storage': {'queue': 'media'},
+}
+
+app.conf.update(
+    task_queues=[Queue(DEFAULT_QUEUE)] + [Queue(name) for name in QUEUES],
+    task_default_queue=DEFAULT_QUEUE,
+    task_routes=TASK_ROUTES,
+)
+
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
 
@@ -4,6 +4,7 @@ import sys
 import logging
 from pathlib import Path
 from datetime import timedelta
+from celery.schedules import crontab
 # from dotenv import load_dotenv
 import ast
 
@@ -235,6 +236,8 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django_http_exceptions.middleware.ExceptionHandlerMiddleware',
     'django_http_exceptions.middleware.ThreadLocalRequestMiddleware',
+    # Coalesce les broadcasts WebSocket de la requête en trames groupées.
+    'Mapapi.middleware.BroadcastBufferMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -375,8 +378,15 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
+    'range',
+    'if-range',
+    'if-none-match',
     '*'
 ]
+# Réponses rejouées (clé d'idempotence) et téléchargement reprenable du paquet
+# hors ligne (ETag / plages) lisibles par les clients web.
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed', 'Retry-After', 'ETag', 'Accept-Ranges', 'Content-Range']
 
 CORS_ALLOW_METHODS = [
     'GET',
@@ -407,6 +417,12 @@ CHANNELS_REDIS_URL = os.environ.get(
     'CHANNELS_REDIS_URL',
     os.environ.get('CELERY_BROKER_URL', 'redis://redis-server:6379/0'),
 )
+# Redis applicatif (registres temps réel, caches, files) — même instance que
+# Channels par défaut. Timeout court : Redis n'est qu'un accélérateur.
+REDIS_URL = os.environ.get('REDIS_URL', CHANNELS_REDIS_URL)
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', '0.5'))
+# Après une erreur de connexion, Redis est ignoré pendant ce délai (s).
+REDIS_RETRY_AFTER = float(os.environ.get('REDIS_RETRY_AFTER', '5'))
 CHANNEL_LAYERS = {
     'default': {
         # Couche pub/sub Redis : fan-out fiable des broadcasts entre processus
@@ -425,6 +441,16 @@ WS_ALLOWED_ORIGINS = os.environ.get(
     'CHANNELS_ALLOWED_ORIGINS',
     '*',
 ).split(',')
+# Taille maximale d'une trame WebSocket groupée ({"event": "batch", "items": [...]})
+# émise par le tampon de diffusion (cf. Mapapi.services.broadcast).
+WS_BROADCAST_BATCH_SIZE = int(os.environ.get('WS_BROADCAST_BATCH_SIZE', '100'))
+# Journal de rejeu des WebSockets (reconnexion avec ?last_event_id=) : groupes
+# journalisés, nombre d'événements conservés par groupe et rétention (s).
+WS_REPLAY_GROUP_PREFIXES = ('notifications_', 'tasks_')
+WS_REPLAY_MAXLEN = int(os.environ.get('WS_REPLAY_MAXLEN', '200'))
+WS_REPLAY_TTL = int(os.environ.get('WS_REPLAY_TTL', str(24 * 3600)))
+# Durée de vie (s) de l'identité WebSocket en cache (invalidée à la sauvegarde du User).
+WS_USER_CACHE_TTL = int(os.environ.get('WS_USER_CACHE_TTL', '3600'))
 
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://redis-server:6379/0')
 CELERY_RESULT_BACKEND = os.environ.get(
@@ -437,26 +463,145 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
+# Files et routage par charge de travail : cf. backend/celery.py. Redis n'a pas de
+# priorités natives : une liste par niveau (0 = la plus urgente … 9), vidées dans
+# l'ordre. Sans priorité explicite un message irait au niveau 0 : défaut à 5.
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+CELERY_TASK_DEFAULT_PRIORITY = 5
+# Analyses IA (model-deploy) : nouveaux essais avec backoff exponentiel + jitter
+# (délai de base et plafond en s), puis lettre morte (cf. Mapapi/services/dead_letters.py).
+ANALYSIS_MAX_RETRIES = int(os.environ.get('ANALYSIS_MAX_RETRIES', 5))
+ANALYSIS_RETRY_BASE_DELAY = int(os.environ.get('ANALYSIS_RETRY_BASE_DELAY', 30))
+ANALYSIS_RETRY_MAX_DELAY = int(os.environ.get('ANALYSIS_RETRY_MAX_DELAY', 30 * 60))
+
+# Journal d'actions (UserAction) en écriture différée : délai de regroupement (s)
+# avant insertion et taille max d'un lot (cf. Mapapi/services/activity_log.py).
+ACTIVITY_LOG_FLUSH_WINDOW = int(os.environ.get('ACTIVITY_LOG_FLUSH_WINDOW', 2))
+ACTIVITY_LOG_BATCH_SIZE = int(os.environ.get('ACTIVITY_LOG_BATCH_SIZE', 500))
+# Purge de la corbeille : incidents supprimés par transaction (cascade + fichiers).
+TRASH_PURGE_CHUNK_SIZE = int(os.environ.get('TRASH_PURGE_CHUNK_SIZE', 50))
+# Balayage des buckets (objets non référencés, Mapapi/services/storage_sweeper.py) :
+# délai de grâce avant récupération, action ('delete' ou 'quarantine') et nombre
+# maximal d'objets parcourus par passage (reprise au passage suivant).
+STORAGE_SWEEP_GRACE_DAYS = int(os.environ.get('STORAGE_SWEEP_GRACE_DAYS', 7))
+STORAGE_SWEEP_ACTION = os.environ.get('STORAGE_SWEEP_ACTION', 'delete')
+STORAGE_SWEEP_MAX_OBJECTS = int(os.environ.get('STORAGE_SWEEP_MAX_OBJECTS', 20000))
+STORAGE_SWEEP_PAGE_SIZE = int(os.environ.get('STORAGE_SWEEP_PAGE_SIZE', 1000))
+# Ingestion des incidents déclarés (Mapapi/services/ingestion.py) : délai (s) avant
+# relance d'une ingestion restée en attente, durée max (s) d'un transcodage vidéo.
+INGESTION_RESUME_AFTER = int(os.environ.get('INGESTION_RESUME_AFTER', 30 * 60))
+VIDEO_TRANSCODE_TIMEOUT = int(os.environ.get('VIDEO_TRANSCODE_TIMEOUT', 600))
+# Clés d'idempotence des POST mobiles (Mapapi/services/idempotency.py) : durée (s)
+# de conservation de la première réponse et de la réservation pendant l'exécution.
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 24 * 3600))
+IDEMPOTENCY_LOCK_TTL = int(os.environ.get('IDEMPOTENCY_LOCK_TTL', 60))
+# Synchronisation hors ligne (Mapapi/services/offline_sync.py) : taille max du paquet
+# zip envoyé, de son contenu décompressé, et nombre max d'éléments par paquet.
+SYNC_BUNDLE_MAX_BYTES = int(os.environ.get('SYNC_BUNDLE_MAX_BYTES', 50 * 1024 * 1024))
+SYNC_BUNDLE_MAX_UNCOMPRESSED = int(os.environ.get('SYNC_BUNDLE_MAX_UNCOMPRESSED', 200 * 1024 * 1024))
+SYNC_MAX_ITEMS = int(os.environ.get('SYNC_MAX_ITEMS', 100))
+# Flux des changements (GET /sync/changes/, Mapapi/services/delta_sync.py) : retrait
+# du filigrane sur l'heure courante (transactions en cours), nombre max de changements
+# par section avant rechargement complet, et rétention des traces de suppression.
+SYNC_WATERMARK_LAG = int(os.environ.get('SYNC_WATERMARK_LAG', 5))
+SYNC_CHANGES_MAX = int(os.environ.get('SYNC_CHANGES_MAX', 1000))
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+# Paquet hors ligne des agents de terrain (GET /sync/field-bundle/,
+# Mapapi/services/field_bundle.py) : taille max d'une miniature incluse, taille max
+# d'un paquet gardé en cache Redis et durée de ce cache.
+FIELD_BUNDLE_MAX_THUMBNAIL_BYTES = int(os.environ.get('FIELD_BUNDLE_MAX_THUMBNAIL_BYTES', 200 * 1024))
+FIELD_BUNDLE_CACHE_MAX_BYTES = int(os.environ.get('FIELD_BUNDLE_CACHE_MAX_BYTES', 10 * 1024 * 1024))
+FIELD_BUNDLE_CACHE_TTL = int(os.environ.get('FIELD_BUNDLE_CACHE_TTL', 6 * 3600))
+# Nombre maximal d'échéances échues traitées par passage de dispatch_due_deadlines.
+DEADLINE_DISPATCH_BATCH_SIZE = int(os.environ.get('DEADLINE_DISPATCH_BATCH_SIZE', 500))
+# Taille des lots (réservés puis modifiés par un seul UPDATE) des tâches Beat du
+# cycle de vie : validation tacite, anti-gel, acceptation tacite (Mapapi/tasks.py).
+LIFECYCLE_BATCH_SIZE = int(os.environ.get('LIFECYCLE_BATCH_SIZE', 500))
+# Nombre maximal d'opérations par requête sur l'endpoint groupé des tâches
+# (POST /incidents/<id>/tasks/bulk/, cf. Mapapi/services/task_bulk.py).
+TASK_BULK_MAX_OPERATIONS = int(os.environ.get('TASK_BULK_MAX_OPERATIONS', 200))
 
 # Phase 4 — mécanismes temporels du cycle de vie de l'incident (Celery Beat).
 # Validation tacite 72 h (D1) + anti-gel (T3) : horaires. Purge corbeille 30 j (D10) : quotidien.
 CELERY_BEAT_SCHEDULE = {
+    # Échéances du cycle de vie (validation tacite, anti-gel, acceptation tacite) :
+    # traitées à l'heure dite depuis la file Redis triée (Mapapi/services/deadlines.py).
+    # Les scans complets ci-dessous ne sont plus qu'un filet de sécurité.
+    'dispatch-due-deadlines': {
+        'task': 'Mapapi.tasks.dispatch_due_deadlines',
+        'schedule': timedelta(minutes=1),
+    },
+    'rebuild-deadline-schedule': {
+        'task': 'Mapapi.tasks.rebuild_deadline_schedule',
+        'schedule': timedelta(days=1),
+    },
     'auto-validate-overdue-resolutions': {
         'task': 'Mapapi.tasks.auto_validate_overdue_resolutions',
-        'schedule': timedelta(hours=1),
+        'schedule': timedelta(hours=6),
     },
     'revert-stale-taken-incidents': {
         'task': 'Mapapi.tasks.revert_stale_taken_incidents',
-        'schedule': timedelta(hours=1),
+        'schedule': timedelta(hours=6),
     },
     'purge-expired-trash': {
         'task': 'Mapapi.tasks.purge_expired_trash',
         'schedule': timedelta(days=1),
     },
-    # Acceptation tacite des assignations Super Admin → organisation à 72 h (D4) : horaire.
+    # Objets de stockage orphelins : de nuit, passage borné repris le lendemain.
+    'sweep-orphaned-storage': {
+        'task': 'Mapapi.tasks.sweep_orphaned_storage',
+        'schedule': crontab(minute=30, hour=3),
+    },
+    # Traces de suppression du flux des changements au-delà de leur rétention.
+    'prune-sync-tombstones': {
+        'task': 'Mapapi.tasks.prune_sync_tombstones',
+        'schedule': crontab(minute=0, hour=4),
+    },
+    # Reprise des ingestions de déclarations interrompues (broker indisponible…).
+    'resume-stalled-ingestions': {
+        'task': 'Mapapi.tasks.resume_stalled_ingestions',
+        'schedule': timedelta(minutes=10),
+    },
+    # Acceptation tacite des assignations Super Admin → organisation à 72 h (D4).
     'auto-accept-overdue-assignments': {
         'task': 'Mapapi.tasks.auto_accept_overdue_assignments',
-        'schedule': timedelta(hours=1),
+        'schedule': timedelta(hours=6),
+    },
+    # Réconciliation des compteurs du flux d'activité (totaux + watermarks « vu »).
+    'repair-activity-counters': {
+        'task': 'Mapapi.tasks.repair_activity_counters',
+        'schedule': timedelta(hours=6),
+    },
+    # Réconciliation des compteurs de tâches (progression des incidents).
+    'repair-task-counters': {
+        'task': 'Mapapi.tasks.repair_task_counters',
+        'schedule': timedelta(days=1),
+    },
+    # Journal d'actions différé : filet de sécurité (le flush est déclenché à l'écriture).
+    'flush-activity-log': {
+        'task': 'Mapapi.tasks.flush_activity_log',
+        'schedule': timedelta(seconds=30),
+    },
+    # Outbox email : reprise des envois replanifiés (backoff) et filet de sécurité
+    # (le flush est normalement déclenché au commit).
+    'flush-email-outbox': {
+        'task': 'Mapapi.tasks.flush_email_outbox',
+        'schedule': timedelta(minutes=1),
+    },
+    # Résumés d'emails (préférence User.email_digest).
+    'send-hourly-email-digests': {
+        'task': 'Mapapi.tasks.send_email_digests',
+        'schedule': crontab(minute=0),
+        'args': ('hourly',),
+    },
+    'send-daily-email-digests': {
+        'task': 'Mapapi.tasks.send_email_digests',
+        'schedule': crontab(minute=0, hour=7),
+        'args': ('daily',),
     },
 }
 
@@ -541,6 +686,16 @@ EMAIL_USE_SSL = os.environ.get("EMAIL_USE_SSL", "False").lower() == "true"
 EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "Map Action <contact@map-action.com>")
+# Outbox : fenêtre de regroupement (s) avant envoi d'un lot, taille max d'un lot
+# (une connexion SMTP par lot) et catégories éligibles aux résumés horaires/quotidiens.
+EMAIL_BATCH_WINDOW = int(os.environ.get("EMAIL_BATCH_WINDOW", 10))
+EMAIL_BATCH_SIZE = int(os.environ.get("EMAIL_BATCH_SIZE", 200))
+EMAIL_DIGEST_CATEGORIES = ('collaboration_request', 'deadline_warning')
+# Réessais : nombre max de tentatives, délai de base du backoff exponentiel (s)
+# et bail d'un worker sur un lot réservé (s) avant reprise par un autre.
+EMAIL_MAX_ATTEMPTS = int(os.environ.get("EMAIL_MAX_ATTEMPTS", 5))
+EMAIL_RETRY_BASE_DELAY = int(os.environ.get("EMAIL_RETRY_BASE_DELAY", 60))
+EMAIL_SENDING_LEASE = int(os.environ.get("EMAIL_SENDING_LEASE", 600))
 
 # Supabase storage configuration
 USE_SUPABASE_STORAGE = os.environ.get('USE_SUPABASE_STORAGE', 'False').lower() in ('true', '1', 't')
@@ -96,6 +96,34 @@ class SupabaseStorage(Storage):
         except StorageException:
             pass
 
+    # Nombre maximal d'objets par appel ``remove`` de l'API Storage.
+    remove_batch_size = 1000
+
+    def delete_many(self, names):
+        """Supprime plusieurs objets du bucket, par lots (un appel ``remove`` par lot).
+
+        Retourne la liste des noms dont la suppression a échoué (lot en erreur).
+        """
+        names = [name for name in dict.fromkeys(names) if name]
+        failed = []
+        for start in range(0, len(names), self.remove_batch_size):
+            batch = names[start:start + self.remove_batch_size]
+            try:
+                self._get_storage().remove(batch)
+            except StorageException:
+                failed.extend(batch)
+        return failed
+
+    def list_page(self, prefix="", offset=0, limit=1000):
+        """Une page du contenu direct de ``prefix`` (fichiers et sous-dossiers,
+        triés par nom). Un sous-dossier a ``id`` nul."""
+        return self._get_storage().list(prefix, {
+            "limit": limit, "offset": offset, "sortBy": {"column": "name", "order": "asc"},
+        }) or []
+
+    def move(self, name, new_name):
+        self._get_storage().move(name, new_name)
+
     def exists(self, name):
         try:
             if "/" in name:
@@ -0,0 +1,59 @@
+#!/bin/sh
+# Worker Celery dédié à une charge de travail (files définies dans backend/celery.py).
+#
+#   sh services/celery/worker.sh analysis|notifications|lifecycle|media|all
+#
+# Concurrence et prefetch par file, surchargeables par variables d'environnement
+# (CELERY_<FILE>_CONCURRENCY, CELERY_<FILE>_PREFETCH) :
+# - analysis : appels HTTP longs (jusqu'à 180 s) ; prefetch 1 pour qu'un worker
+#   occupé ne garde pas d'analyses en réserve pendant qu'un autre est libre ;
+# - notifications : tâches courtes et nombreuses, prefetch plus large ;
+# - lifecycle / media : tâches de fond par lots, faible concurrence.
+# 'all' consomme toutes les files (développement local, petit déploiement).
+set -e
+
+QUEUE="${1:-all}"
+
+case "$QUEUE" in
+    analysis)
+        QUEUES=analysis
+        CONCURRENCY="${CELERY_ANALYSIS_CONCURRENCY:-4}"
+        PREFETCH="${CELERY_ANALYSIS_PREFETCH:-1}"
+        ;;
+    notifications)
+        QUEUES=notifications
+        CONCURRENCY="${CELERY_NOTIFICATIONS_CONCURRENCY:-4}"
+        PREFETCH="${CELERY_NOTIFICATIONS_PREFETCH:-8}"
+        ;;
+    lifecycle)
+        QUEUES=lifecycle
+        CONCURRENCY="${CELERY_LIFECYCLE_CONCURRENCY:-2}"
+        PREFETCH="${CELERY_LIFECYCLE_PREFETCH:-1}"
+        ;;
+    media)
+        QUEUES=media
+        CONCURRENCY="${CELERY_MEDIA_CONCURRENCY:-1}"
+        PREFETCH="${CELERY_MEDIA_PREFETCH:-1}"
+        ;;
+    all)
+        QUEUES=celery,analysis,notifications,lifecycle,media
+        CONCURRENCY="${CELERY_CONCURRENCY:-4}"
+        PREFETCH="${CELERY_PREFETCH:-1}"
+        ;;
+    *)
+        echo "usage: $0 analysis|notifications|lifecycle|media|all" >&2
+        exit 64
+        ;;
+esac
+
+# Les tâches non routées ('celery') sont prises par le worker notifications.
+if [ "$QUEUE" = notifications ]; then
+    QUEUES="celery,$QUEUES"
+fi
+
+exec celery -A backend worker \
+    -Q "$QUEUES" \
+    -n "$QUEUE@%h" \
+    --concurrency "$CONCURRENCY" \
+    --prefetch-multiplier "$PREFETCH" \
+    -l "${CELERY_LOG_LEVEL:-info}"